@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.route.sentiment_routes import router as sentiment_router
 from app.route.user_routes import router as user_router
@@ -10,13 +13,35 @@ from app.route.full_report_routes import router as full_report_router
 from app.route.news_routes import router as news_router
 from app.route.session_routes import router as session_router
 from app.route.trending_routes import router as trending_router
+from app.route.stats_routes import router as stats_router
+from app.utils.executors import shutdown_executors
+from app.utils.http_pool import http_pool
+from app.utils.client_registry import client_registry
+from app.utils.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS
+from app.services.persistence import post_queue
+from app.services.trending import trending_refresher
+from app.services.jobs import report_jobs
 
 # Set up logging
 import logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(client_registry.startup)
+    post_queue.start()
+    trending_refresher.start()
+    report_jobs.start()
+    yield
+    await report_jobs.stop()
+    await trending_refresher.stop()
+    await asyncio.to_thread(post_queue.stop)
+    client_registry.shutdown()
+    await http_pool.aclose()
+    shutdown_executors()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS settings — allow all origins, methods, headers
 app.add_middleware(
@@ -28,6 +53,24 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(request.method)
+    in_progress.inc()
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        in_progress.dec()
+        # Label by route template, not the raw path, so /jobs/{job_id} is one series
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method, route.path if route is not None else "unmatched", status
+        ).observe(time.perf_counter() - started)
+
 app.include_router(sentiment_router)
 app.include_router(user_router)
 app.include_router(twitter_router)
@@ -38,6 +81,7 @@ app.include_router(full_report_router)
 app.include_router(news_router)
 app.include_router(session_router)
 app.include_router(trending_router)
+app.include_router(stats_router)
 
 @app.get("/")
 async def root():
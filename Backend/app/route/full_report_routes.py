@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from app.services.full_report import generate_full_report
+from app.services.full_report import generate_full_report, stream_full_report
+from app.services.jobs import report_jobs, QueueFull
+import json
 from app.utils.credit_manager import credit_manager
+from app.utils.request_coalescer import request_coalescer
+from app.utils.executors import run_blocking
 
 router = APIRouter()
 
@@ -13,14 +18,18 @@ class FullReportRequest(BaseModel):
     youtube_max_videos: Optional[int] = 2
     youtube_max_comments_per_video: Optional[int] = 5
     twitter_max_results: Optional[int] = 10
+    # Only fetch and analyze posts newer than the previous run for this topic
+    incremental: Optional[bool] = False
 
-@router.post("/generate-full-report")
-def generate_full_report_route(
-    request: FullReportRequest,
-    x_session_id: Optional[str] = Header(None),
-    authorization: Optional[str] = Header(None),
-    x_credit_already_used: Optional[str] = Header(None),
-):
+async def _charge_credit(
+    x_session_id: Optional[str],
+    authorization: Optional[str],
+    x_credit_already_used: Optional[str],
+) -> bool:
+    """
+    Enforce guest credits for a report request. Returns True if the caller is authenticated.
+    The credit store is SQLite with a busy timeout, so it is queried on the sqlite executor.
+    """
     # Check if user is authenticated (has authorization header)
     is_authenticated = authorization is not None
     
@@ -36,9 +45,9 @@ def generate_full_report_route(
         should_spend_here = (x_credit_already_used or "").lower() != "true"
         success = True
         if should_spend_here:
-            success = credit_manager.use_credit(x_session_id)
+            success = await run_blocking("sqlite", credit_manager.use_credit, x_session_id)
         if not success:
-            credits = credit_manager.get_credits(x_session_id)
+            credits = await run_blocking("sqlite", credit_manager.get_credits, x_session_id)
             if credits is None:
                 raise HTTPException(status_code=404, detail="Session not found or expired")
             else:
@@ -46,20 +55,115 @@ def generate_full_report_route(
                     status_code=402, 
                     detail="No credits remaining. Please sign up to continue using the service."
                 )
-    
-    # Generate the report
-    result = generate_full_report(
-        topic=request.topic,
-        reddit_subreddit=request.reddit_subreddit,
-        reddit_limit=request.reddit_limit,
-        youtube_max_videos=request.youtube_max_videos,
-        youtube_max_comments_per_video=request.youtube_max_comments_per_video,
-        twitter_max_results=request.twitter_max_results
-    )
+    return is_authenticated
+
+async def _remaining_credits(x_session_id: str) -> int:
+    return await run_blocking("sqlite", credit_manager.get_credits, x_session_id) or 0
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/generate-full-report")
+async def generate_full_report_route(
+    request: FullReportRequest,
+    x_session_id: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+    x_credit_already_used: Optional[str] = Header(None),
+):
+    # Every caller pays, including those that share an in-flight run
+    is_authenticated = await _charge_credit(x_session_id, authorization, x_credit_already_used)
+
+    # Generate the report, or join an identical one already running
+    params = {
+        "topic": request.topic,
+        "reddit_subreddit": request.reddit_subreddit,
+        "reddit_limit": request.reddit_limit,
+        "youtube_max_videos": request.youtube_max_videos,
+        "youtube_max_comments_per_video": request.youtube_max_comments_per_video,
+        "twitter_max_results": request.twitter_max_results,
+        "incremental": request.incremental,
+    }
+    result = await request_coalescer.run("full_report", params, lambda: generate_full_report(**params))
     
     # Add credits info for anonymous users
     if not is_authenticated and x_session_id:
-        remaining_credits = credit_manager.get_credits(x_session_id) or 0
-        result["credits_remaining"] = remaining_credits
+        result["credits_remaining"] = await _remaining_credits(x_session_id)
     
-    return result 
\ No newline at end of file
+    return result
+
+@router.post("/generate-full-report/stream")
+async def stream_full_report_route(
+    request: FullReportRequest,
+    x_session_id: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+    x_credit_already_used: Optional[str] = Header(None),
+):
+    """Server-sent events: per-source results as they finish, then the report token by token"""
+    is_authenticated = await _charge_credit(x_session_id, authorization, x_credit_already_used)
+
+    async def events():
+        async for event, data in stream_full_report(
+            topic=request.topic,
+            reddit_subreddit=request.reddit_subreddit,
+            reddit_limit=request.reddit_limit,
+            youtube_max_videos=request.youtube_max_videos,
+            youtube_max_comments_per_video=request.youtube_max_comments_per_video,
+            twitter_max_results=request.twitter_max_results,
+            incremental=request.incremental
+        ):
+            if event == "done" and not is_authenticated and x_session_id:
+                data["credits_remaining"] = await _remaining_credits(x_session_id)
+            yield _sse_event(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/generate-full-report/jobs", status_code=202)
+async def submit_full_report_job(
+    request: FullReportRequest,
+    x_session_id: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+    x_credit_already_used: Optional[str] = Header(None),
+):
+    """Queue a full report and return its job id at once; poll GET /jobs/{job_id} for progress"""
+    is_authenticated = await _charge_credit(x_session_id, authorization, x_credit_already_used)
+    params = {
+        "topic": request.topic,
+        "reddit_subreddit": request.reddit_subreddit,
+        "reddit_limit": request.reddit_limit,
+        "youtube_max_videos": request.youtube_max_videos,
+        "youtube_max_comments_per_video": request.youtube_max_comments_per_video,
+        "twitter_max_results": request.twitter_max_results,
+        "incremental": request.incremental,
+    }
+    try:
+        job = await report_jobs.submit(params, authenticated=is_authenticated)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Report queue is full, try again shortly ({e})", headers={"Retry-After": "30"})
+
+    if not is_authenticated and x_session_id:
+        job["credits_remaining"] = await _remaining_credits(x_session_id)
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_full_report_job(job_id: str):
+    """Job status, per-source results and report text so far, and the final result once done"""
+    job = await report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@router.get("/jobs/{job_id}/result")
+async def get_full_report_job_result(job_id: str):
+    """The finished report, in the same shape as /generate-full-report"""
+    job = await report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job.get("error", "Report job failed"))
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
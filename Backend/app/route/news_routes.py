@@ -9,9 +9,9 @@ class NewsRequest(BaseModel):
     topic: str
 
 @router.post("/analyze-news-info")
-def analyze_news_info_route(request: NewsRequest):
+async def analyze_news_info_route(request: NewsRequest):
     try:
-        result = fetch_and_process_news(request.topic)
+        result = await fetch_and_process_news(request.topic)
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
         return result
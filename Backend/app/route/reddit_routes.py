@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
+from app.utils.cursor_store import delta_counts
+from app.utils.request_coalescer import request_coalescer
 from app.services.reddit import analyze_comments_sentiment
 
 router = APIRouter()
@@ -9,8 +11,21 @@ class RedditSentimentRequest(BaseModel):
     subreddit: str
     query: str
     limit: Optional[int] = 10
+    incremental: Optional[bool] = False
 
 @router.post("/analyze-reddit-sentiment")
-def analyze_reddit_sentiment_route(request: RedditSentimentRequest):
-    results = analyze_comments_sentiment(request.subreddit, request.query, request.limit)
+async def analyze_reddit_sentiment_route(request: RedditSentimentRequest):
+    params = {
+        "subreddit": request.subreddit,
+        "query": request.query,
+        "limit": request.limit,
+        "incremental": request.incremental,
+    }
+    results = await request_coalescer.run(
+        "reddit",
+        params,
+        lambda: analyze_comments_sentiment(request.subreddit, request.query, request.limit, request.incremental),
+    )
+    if request.incremental and isinstance(results, list):
+        return {"results": results, "delta": delta_counts(results)}
     return {"results": results} 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Literal
 from app.services.report import generate_report_from_sentiments
 
 router = APIRouter()
@@ -8,8 +8,10 @@ router = APIRouter()
 class ReportRequest(BaseModel):
     topic: str
     comments_with_sentiment: List[Dict]
+    mode: Literal["auto", "single", "map_reduce"] = "auto"
 
 @router.post("/generate-report")
-def generate_report_route(request: ReportRequest):
-    report = generate_report_from_sentiments(request.topic, request.comments_with_sentiment)
-    return {"report": report} 
\ No newline at end of file
+async def generate_report_route(request: ReportRequest):
+    return await generate_report_from_sentiments(
+        request.topic, request.comments_with_sentiment, mode=request.mode
+    ) 
\ No newline at end of file
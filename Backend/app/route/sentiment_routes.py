@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from app.services.sentiment import analyze_sentiment
+from app.services.sentiment import analyze_sentiment_async
 
 router = APIRouter()
 
@@ -8,6 +8,6 @@ class SentimentRequest(BaseModel):
     text: str
 
 @router.post("/analyze-sentiment")
-def analyze_sentiment_route(request: SentimentRequest):
-    result = analyze_sentiment(request.text)
+async def analyze_sentiment_route(request: SentimentRequest):
+    result = await analyze_sentiment_async(request.text)
     return result
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.utils.sentiment_cache import sentiment_cache
+from app.utils.llm_cache import llm_cache
+from app.utils.http_pool import http_pool
+from app.utils.client_registry import client_registry
+from app.utils.model_health import model_health
+from app.utils.rate_limiter import rate_limiter
+from app.utils.request_coalescer import request_coalescer
+from app.utils.text_preprocess import text_preprocessor
+from app.utils.metrics import cache_collector
+from app.utils.gemini_client import GEMINI_MODELS, hedge_budget
+from app.services.persistence import post_queue
+from app.services.reddit import reddit_fetch_stats
+from app.services.trending import trending_refresher
+from app.services.jobs import report_jobs
+
+router = APIRouter()
+
+cache_collector.add("sentiment", sentiment_cache.stats)
+cache_collector.add("llm", llm_cache.stats)
+
+@router.get("/stats")
+def stats():
+    """Runtime counters for caches and background components"""
+    return {
+        "sentiment_cache": sentiment_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "http_pool": http_pool.stats(),
+        "clients": client_registry.stats(),
+        "post_queue": post_queue.stats(),
+        "models": model_health.snapshot(GEMINI_MODELS),
+        "gemini_hedging": hedge_budget.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "reddit_fetch": reddit_fetch_stats.stats(),
+        "trending": trending_refresher.stats(),
+        "request_coalescing": request_coalescer.stats(),
+        "report_jobs": report_jobs.stats(),
+        "text_preprocess": text_preprocessor.stats(),
+    }
+
+@router.get("/models/health")
+def models_health():
+    """Circuit-breaker state, cooldowns and latency of each Gemini model, in the order they would be tried"""
+    return model_health.snapshot(GEMINI_MODELS)
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-stage latency histograms, upstream and Gemini counters, cache hit ratios"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -4,5 +4,5 @@ from app.services.trending import get_trending_topics
 router = APIRouter()
 
 @router.get("/trending")
-def trending():
-    return get_trending_topics()
+async def trending():
+    return await get_trending_topics()
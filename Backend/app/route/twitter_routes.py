@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
+from app.utils.cursor_store import delta_counts
+from app.utils.request_coalescer import request_coalescer
 from app.services.twitter import analyze_tweets_sentiment
 
 router = APIRouter()
@@ -8,8 +10,16 @@ router = APIRouter()
 class TweetSentimentRequest(BaseModel):
     query: str
     max_results: Optional[int] = 10
+    incremental: Optional[bool] = False
 
 @router.post("/analyze-tweets-sentiment")
-def analyze_tweets_sentiment_route(request: TweetSentimentRequest):
-    results = analyze_tweets_sentiment(request.query, request.max_results)
+async def analyze_tweets_sentiment_route(request: TweetSentimentRequest):
+    params = {"query": request.query, "max_results": request.max_results, "incremental": request.incremental}
+    results = await request_coalescer.run(
+        "twitter",
+        params,
+        lambda: analyze_tweets_sentiment(request.query, request.max_results, request.incremental),
+    )
+    if request.incremental and isinstance(results, list):
+        return {"results": results, "delta": delta_counts(results)}
     return {"results": results} 
\ No newline at end of file
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
+from app.utils.cursor_store import delta_counts
+from app.utils.request_coalescer import request_coalescer
 from app.services.youtube import analyze_comments_sentiment
 
 router = APIRouter()
@@ -9,8 +11,21 @@ class YouTubeSentimentRequest(BaseModel):
     query: str
     max_videos: Optional[int] = 3
     max_comments_per_video: Optional[int] = 10
+    incremental: Optional[bool] = False
 
 @router.post("/analyze-youtube-sentiment")
-def analyze_youtube_sentiment_route(request: YouTubeSentimentRequest):
-    results = analyze_comments_sentiment(request.query, request.max_videos, request.max_comments_per_video)
+async def analyze_youtube_sentiment_route(request: YouTubeSentimentRequest):
+    params = {
+        "query": request.query,
+        "max_videos": request.max_videos,
+        "max_comments_per_video": request.max_comments_per_video,
+        "incremental": request.incremental,
+    }
+    results = await request_coalescer.run(
+        "youtube",
+        params,
+        lambda: analyze_comments_sentiment(request.query, request.max_videos, request.max_comments_per_video, request.incremental),
+    )
+    if request.incremental and isinstance(results, list):
+        return {"results": results, "delta": delta_counts(results)}
     return {"results": results} 
\ No newline at end of file
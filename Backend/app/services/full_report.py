@@ -2,44 +2,101 @@ from app.services.reddit import analyze_comments_sentiment as analyze_reddit
 from app.services.youtube import analyze_comments_sentiment as analyze_youtube
 from app.services.twitter import analyze_tweets_sentiment as analyze_twitter
 from app.services.news import fetch_and_process_news
-from app.services.report import generate_report_from_sentiments
-from app.utils.gemini_client import gemini_chat_generate
-from typing import List, Dict
+from app.services.report import REPORT_CACHE_TTL, REPORT_STALE_TTL
+from app.services.prompt_builder import build_comment_prompt
+from app.utils.gemini_client import gemini_chat_generate_async, gemini_chat_stream_async
+from app.utils.cursor_store import delta_counts
+from app.utils.near_dedup import NearDuplicateIndex
+from app.utils.metrics import REPORT_SOURCE_DURATION
+from typing import List, Dict, Awaitable, AsyncIterator, Tuple, Any, Optional
+import asyncio
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
-def generate_full_report(
-    topic: str,
-    reddit_subreddit: str = "all",
-    reddit_limit: int = 10,
-    youtube_max_videos: int = 2,
-    youtube_max_comments_per_video: int = 5,
-    twitter_max_results: int = 10
-) -> Dict:
-    # Fetch and analyze Reddit comments
-    reddit_results = analyze_reddit(reddit_subreddit, topic, reddit_limit)
-    reddit_comments = [] if isinstance(reddit_results, dict) and "error" in reddit_results else reddit_results
+# Per-source time budgets in seconds, measured from the start of the fan-out.
+# News includes its own Gemini summary call, so it gets the largest budget.
+SOURCE_TIMEOUTS = {
+    "reddit": float(os.environ.get("REDDIT_SOURCE_TIMEOUT", 20)),
+    "youtube": float(os.environ.get("YOUTUBE_SOURCE_TIMEOUT", 20)),
+    "twitter": float(os.environ.get("TWITTER_SOURCE_TIMEOUT", 15)),
+    "news": float(os.environ.get("NEWS_SOURCE_TIMEOUT", 60)),
+}
 
-    # Fetch and analyze YouTube comments
-    youtube_results = analyze_youtube(topic, youtube_max_videos, youtube_max_comments_per_video)
-    youtube_comments = [] if isinstance(youtube_results, dict) and "error" in youtube_results else youtube_results
 
-    # Fetch and analyze Twitter comments
-    twitter_results = analyze_twitter(topic, twitter_max_results)
-    twitter_comments = [] if isinstance(twitter_results, dict) and "error" in twitter_results else twitter_results
+async def _run_source(source: str, stage: Awaitable) -> Tuple[Any, Dict]:
+    """
+    Await one source stage within its budget and describe the outcome.
+    Returns the stage result (None when unavailable) and its status entry.
+    """
+    budget = SOURCE_TIMEOUTS.get(source, 30)
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(stage, timeout=budget)
+    except asyncio.TimeoutError:
+        logger.warning(f"Source '{source}' exceeded its {budget:.0f}s budget")
+        REPORT_SOURCE_DURATION.labels(source, "timeout").observe(budget)
+        return None, {"status": "timeout", "elapsed_ms": int(budget * 1000)}
+    except Exception as e:
+        logger.error(f"Source '{source}' failed: {str(e)}")
+        REPORT_SOURCE_DURATION.labels(source, "error").observe(time.monotonic() - started)
+        return None, {"status": "error", "error": str(e), "elapsed_ms": int((time.monotonic() - started) * 1000)}
 
-    # Combine all social comments with sentiment
-    all_comments = reddit_comments + youtube_comments + twitter_comments
+    elapsed = time.monotonic() - started
+    elapsed_ms = int(elapsed * 1000)
+    failed = isinstance(result, dict) and "error" in result
+    REPORT_SOURCE_DURATION.labels(source, "error" if failed else "ok").observe(elapsed)
+    if failed:
+        status = {"status": "error", "error": result["error"], "elapsed_ms": elapsed_ms}
+        if "retry_after" in result:
+            status["retry_after"] = result["retry_after"]
+        return None, status
+    status = {"status": "ok", "elapsed_ms": elapsed_ms}
+    if isinstance(result, list):
+        status["count"] = len(result)
+        if any("new" in item for item in result):
+            status.update(delta_counts(result))
+    return result, status
 
-    # Fetch and process news (for Gemini)
-    news_info = fetch_and_process_news(topic)
-    news_summary = news_info.get("summary", "")
-    news_articles = news_info.get("articles", [])
 
-    # Generate the report using Gemini (social + news)
+async def _fan_out_sources(stages: Dict[str, Awaitable]) -> Tuple[Dict[str, Any], Dict[str, Dict]]:
+    """
+    Run every source stage concurrently, each within its own budget.
+    Returns the per-source results (None when unavailable) and a sources_status map.
+    """
+    outcomes = await asyncio.gather(*(_run_source(source, stage) for source, stage in stages.items()))
+    results = {source: result for source, (result, _) in zip(stages, outcomes)}
+    sources_status = {source: status for source, (_, status) in zip(stages, outcomes)}
+    return results, sources_status
+
+
+def _source_stages(
+    topic: str,
+    reddit_subreddit: str,
+    reddit_limit: int,
+    youtube_max_videos: int,
+    youtube_max_comments_per_video: int,
+    twitter_max_results: int,
+    incremental: bool = False,
+    dedup: Optional[NearDuplicateIndex] = None,
+) -> Dict[str, Awaitable]:
+    return {
+        "reddit": analyze_reddit(reddit_subreddit, topic, reddit_limit, incremental, dedup),
+        "youtube": analyze_youtube(topic, youtube_max_videos, youtube_max_comments_per_video, incremental, dedup),
+        "twitter": analyze_twitter(topic, twitter_max_results, incremental, dedup),
+        "news": fetch_and_process_news(topic),
+    }
+
+
+def _build_report_messages(
+    topic: str, all_comments: List[Dict], news_summary: str, dedup: NearDuplicateIndex
+) -> Tuple[List[Dict], Dict]:
+    # Near-duplicates appear once, with how many comments they stand for
+    representatives, dedup_stats = dedup.collapse(all_comments)
     # Pass both social comments and news summary to Gemini
-    user_message = (
+    header = (
         f"You are an expert analyst. Given the following social media comments and news articles about '{topic}', "
         "generate a detailed summary and report. The report should include:\n"
         "- An overall sentiment summary (positive/negative/neutral)\n"
@@ -48,24 +105,45 @@ def generate_full_report(
         "- A concise summary for an executive\n\n"
         "Social Media Comments and Sentiments:\n"
     )
-    for item in all_comments:
-        comment = item.get("text")
-        sentiment = item.get("sentiment")
-        if isinstance(sentiment, dict):
-            label = sentiment.get("label")
-            score = sentiment.get("score")
-        else:
-            label = sentiment
-            score = None
-        user_message += f"\n- Comment: {comment}\n  Sentiment: {label} (score: {score})"
-    user_message += "\n\nNews Summary and Insights:\n" + news_summary
-    user_message += "\n\nSummary and Report:"
-
-    messages = [
+    footer = "\n\nNews Summary and Insights:\n" + news_summary + "\n\nSummary and Report:"
+    user_message, prompt_stats = build_comment_prompt(header, representatives, footer)
+    prompt_stats.update(dedup_stats)
+    prompt_stats["dedup"] = dedup.stats()
+
+    return [
         {"role": "user", "content": user_message}
-    ]
+    ], prompt_stats
+
+
+async def generate_full_report(
+    topic: str,
+    reddit_subreddit: str = "all",
+    reddit_limit: int = 10,
+    youtube_max_videos: int = 2,
+    youtube_max_comments_per_video: int = 5,
+    twitter_max_results: int = 10,
+    incremental: bool = False
+) -> Dict:
+    # Fetch and analyze every source concurrently; a slow or failing source
+    # comes back empty and is reported in sources_status instead of blocking.
+    # Sources share one dedup index, so a text repeated across them is classified once.
+    dedup = NearDuplicateIndex()
+    results, sources_status = await _fan_out_sources(_source_stages(
+        topic, reddit_subreddit, reddit_limit, youtube_max_videos, youtube_max_comments_per_video, twitter_max_results,
+        incremental, dedup
+    ))
+
+    # Combine all social comments with sentiment
+    all_comments = (results["reddit"] or []) + (results["youtube"] or []) + (results["twitter"] or [])
+
+    news_info = results["news"] or {}
+    news_summary = news_info.get("summary", "")
+    news_articles = news_info.get("articles", [])
+
+    # Generate the report using Gemini (social + news)
+    messages, prompt_stats = _build_report_messages(topic, all_comments, news_summary, dedup)
     try:
-        final_report = gemini_chat_generate(messages)
+        final_report = await gemini_chat_generate_async(messages, cache_ttl=REPORT_CACHE_TTL, stale_ttl=REPORT_STALE_TTL)
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
         final_report = "Report unavailable due to upstream error."
@@ -74,5 +152,67 @@ def generate_full_report(
         "report": final_report,
         "analyzed_comments": all_comments,
         "news_summary": news_summary,
-        "news_articles": news_articles
-    } 
\ No newline at end of file
+        "news_articles": news_articles,
+        "sources_status": sources_status,
+        "prompt_stats": prompt_stats
+    }
+
+
+async def stream_full_report(
+    topic: str,
+    reddit_subreddit: str = "all",
+    reddit_limit: int = 10,
+    youtube_max_videos: int = 2,
+    youtube_max_comments_per_video: int = 5,
+    twitter_max_results: int = 10,
+    incremental: bool = False
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Streaming variant of generate_full_report. Yields (event, data) pairs:
+    one 'source' event per platform (or 'news') as soon as it finishes,
+    then 'report' events carrying Gemini output chunks, then 'done'.
+    """
+    dedup = NearDuplicateIndex()
+    stages = _source_stages(
+        topic, reddit_subreddit, reddit_limit, youtube_max_videos, youtube_max_comments_per_video, twitter_max_results,
+        incremental, dedup
+    )
+    tasks = {asyncio.ensure_future(_run_source(source, stage)): source for source, stage in stages.items()}
+    results: Dict[str, Any] = {}
+    sources_status: Dict[str, Dict] = {}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                source = tasks[task]
+                result, status = task.result()
+                results[source] = result
+                sources_status[source] = status
+                if source == "news":
+                    news_info = result or {}
+                    yield "news", {
+                        "status": status,
+                        "news_summary": news_info.get("summary", ""),
+                        "news_articles": news_info.get("articles", []),
+                    }
+                else:
+                    yield "source", {"source": source, "status": status, "analyzed_comments": result or []}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    all_comments = (results.get("reddit") or []) + (results.get("youtube") or []) + (results.get("twitter") or [])
+    news_summary = (results.get("news") or {}).get("summary", "")
+
+    messages, prompt_stats = _build_report_messages(topic, all_comments, news_summary, dedup)
+    report_status = "ok"
+    try:
+        async for chunk in gemini_chat_stream_async(messages):
+            yield "report", {"text": chunk}
+    except Exception as e:
+        logger.error(f"Error streaming report: {str(e)}")
+        report_status = "error"
+        yield "report", {"text": "Report unavailable due to upstream error.", "error": str(e)}
+
+    yield "done", {"sources_status": sources_status, "report_status": report_status, "prompt_stats": prompt_stats}
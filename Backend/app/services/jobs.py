@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+from app.services.full_report import stream_full_report
+from app.utils.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Durable queue of full-report jobs, so queued and interrupted jobs survive a restart
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", "report_jobs.sqlite3")
+# Reports run at the same time
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Queued jobs accepted before new submissions are refused
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", 500))
+# A guest job is scheduled as if submitted this many seconds later, so
+# authenticated users go first without guests ever starving
+JOB_GUEST_DELAY = float(os.environ.get("JOB_GUEST_DELAY", 30))
+# A running job is failed after this many seconds
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", 300))
+# Finished jobs are kept (and readable) for this long
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", 24 * 3600))
+# Attempts per job, counting runs interrupted by a restart
+JOB_MAX_ATTEMPTS = 3
+# A running job's partial results are persisted at most this often (seconds)
+JOB_PARTIAL_INTERVAL = float(os.environ.get("JOB_PARTIAL_INTERVAL", 2))
+# A running job whose owner has not renewed its lease for this long is queued again;
+# owners renew (and look for abandoned jobs) every quarter lease
+JOB_LEASE = float(os.environ.get("JOB_LEASE", 60))
+
+WAIT_WINDOW = 256
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ReportJobQueue:
+    """
+    Runs full reports as background jobs on a fixed pool of asyncio workers.
+
+    Jobs are written to SQLite on submission and on every state change;
+    workers pick them from an in-memory priority queue ordered by
+    scheduled time (submission time, plus JOB_GUEST_DELAY for guests).
+    Each job runs through stream_full_report, so per-source results and the
+    report text are visible while it runs.
+
+    Several processes can share one database: a job is claimed with a
+    single conditional UPDATE, so only one of them runs it, and the claim
+    is a lease its owner renews while the job runs. Every process also
+    picks up queued jobs submitted elsewhere and queues again running jobs
+    whose lease expired, i.e. whose owner stopped or crashed.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX):
+        self.path = path
+        self.workers = workers
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, params TEXT NOT NULL, authenticated INTEGER NOT NULL, "
+            "status TEXT NOT NULL, scheduled_at REAL NOT NULL, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "partial TEXT, result TEXT, error TEXT, owner TEXT, heartbeat_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, scheduled_at)")
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._lease_task: Optional[asyncio.Task] = None
+        # Identifies this process's claims in the shared database
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Jobs in the in-memory queue, so polling does not add them twice
+        self._enqueued: Set[str] = set()
+        # Live state of running jobs; GET reads this instead of the last persisted partial
+        self._running: Dict[str, Dict] = {}
+        self._waits = deque(maxlen=WAIT_WINDOW)
+        # Submissions between the queue-size check and put_nowait
+        self._submitting = 0
+        self._counters = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "recovered": 0}
+
+    def _execute(self, sql: str, args: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    async def _execute_async(self, sql: str, args: tuple = ()) -> List[tuple]:
+        return await run_blocking("sqlite", self._execute, sql, args)
+
+    def _update(self, sql: str, args: tuple = ()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, args).rowcount
+
+    async def _update_async(self, sql: str, args: tuple = ()) -> int:
+        return await run_blocking("sqlite", self._update, sql, args)
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - JOB_RESULT_TTL,))
+        recovered = self._enqueue(*self._poll())
+        if recovered:
+            logger.info(f"Recovered {recovered} interrupted report jobs from {self.path}")
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        self._lease_task = asyncio.ensure_future(self._renew_leases())
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Jobs they were running have their lease expired,
+        so the next process to poll (this one after a restart, or another
+        worker) runs them again.
+        """
+        tasks = self._workers + ([self._lease_task] if self._lease_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._lease_task = None
+        self._running.clear()
+        self._enqueued.clear()
+        await self._update_async("UPDATE jobs SET heartbeat_at = 0 WHERE owner = ? AND status = 'running'", (self.owner,))
+
+    def _poll(self):
+        """Queue again running jobs with an expired lease; returns their count and all queued jobs."""
+        recovered = self._update(
+            "UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL, heartbeat_at = NULL, partial = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time() - JOB_LEASE,),
+        )
+        return recovered, self._execute("SELECT scheduled_at, id FROM jobs WHERE status = 'queued'")
+
+    def _enqueue(self, recovered: int, queued: List[tuple]) -> int:
+        self._counters["recovered"] += recovered
+        for scheduled_at, job_id in queued:
+            if job_id not in self._enqueued:
+                self._enqueued.add(job_id)
+                self._queue.put_nowait((scheduled_at, job_id))
+        return recovered
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE / 4)
+            try:
+                if self._running:
+                    await self._update_async(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'", (time.time(), self.owner)
+                    )
+                recovered = self._enqueue(*await run_blocking("sqlite", self._poll))
+                if recovered:
+                    logger.info(f"Recovered {recovered} report jobs abandoned by another worker")
+            except Exception as e:
+                logger.error(f"Report job lease renewal failed: {e}")
+
+    async def submit(self, params: Dict, authenticated: bool) -> Dict:
+        """Queue a report; raises QueueFull when JOB_QUEUE_MAX jobs are already waiting."""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        if self._queue.qsize() + self._submitting >= self.max_queued:
+            self._counters["rejected"] += 1
+            raise QueueFull(f"{self._queue.qsize()} report jobs are already queued")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        scheduled_at = now if authenticated else now + JOB_GUEST_DELAY
+        self._submitting += 1
+        try:
+            await self._execute_async(
+                "INSERT INTO jobs (id, params, authenticated, status, scheduled_at, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, json.dumps(params), int(authenticated), scheduled_at, now),
+            )
+        finally:
+            self._submitting -= 1
+        self._enqueued.add(job_id)
+        self._queue.put_nowait((scheduled_at, job_id))
+        self._counters["submitted"] += 1
+        return {"job_id": job_id, "status": "queued", "queue_depth": self._queue.qsize()}
+
+    async def _work(self) -> None:
+        while True:
+            _, job_id = await self._queue.get()
+            self._enqueued.discard(job_id)
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Report job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        started_at = time.time()
+        # Only one process's UPDATE matches; the others find the job no longer queued
+        claimed = await self._update_async(
+            "UPDATE jobs SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+            "WHERE id = ? AND status = 'queued'",
+            (self.owner, started_at, started_at, job_id),
+        )
+        if not claimed:
+            return
+        rows = await self._execute_async("SELECT params, created_at, attempts FROM jobs WHERE id = ?", (job_id,))
+        params, created_at, attempts = json.loads(rows[0][0]), rows[0][1], rows[0][2]
+        if attempts > JOB_MAX_ATTEMPTS:
+            await self._finish(job_id, "failed", error=f"Gave up after {attempts - 1} interrupted attempts")
+            return
+        self._waits.append(started_at - created_at)
+        state = {"sources": {}, "news": None, "report": ""}
+        self._running[job_id] = state
+        try:
+            result = await asyncio.wait_for(self._collect(job_id, params, state), JOB_TIMEOUT)
+            await self._finish(job_id, "done", result=result)
+        except asyncio.TimeoutError:
+            await self._finish(job_id, "failed", error=f"Report did not finish within {JOB_TIMEOUT:.0f} seconds", partial=state)
+        except Exception as e:
+            logger.error(f"Report job {job_id} failed: {e}")
+            await self._finish(job_id, "failed", error=str(e), partial=state)
+        finally:
+            self._running.pop(job_id, None)
+
+    async def _persist_partial(self, job_id: str, state: Dict) -> None:
+        # Serialized off the loop; entries are replaced, never mutated, so a shallow copy is a stable snapshot
+        snapshot = {**state, "sources": dict(state["sources"])}
+
+        def write():
+            self._execute(
+                "UPDATE jobs SET partial = ? WHERE id = ? AND owner = ?", (json.dumps(snapshot, default=str), job_id, self.owner)
+            )
+        await run_blocking("sqlite", write)
+
+    async def _collect(self, job_id: str, params: Dict, state: Dict) -> Dict:
+        """
+        Run the report, keeping `state` current. State is persisted after a
+        source or the news finishes, at most once per JOB_PARTIAL_INTERVAL;
+        GET reads running jobs from memory, so this only bounds what a
+        restart loses.
+        """
+        done: Dict[str, Any] = {}
+        last_persisted = float("-inf")
+        async for event, data in stream_full_report(**params):
+            if event == "source":
+                state["sources"][data["source"]] = {"status": data["status"], "analyzed_comments": data["analyzed_comments"]}
+            elif event == "news":
+                state["news"] = data
+            elif event == "report":
+                state["report"] += data["text"]
+                continue
+            elif event == "done":
+                done = data
+                continue
+            if time.monotonic() - last_persisted >= JOB_PARTIAL_INTERVAL:
+                last_persisted = time.monotonic()
+                await self._persist_partial(job_id, state)
+
+        news = state["news"] or {}
+        analyzed_comments = []
+        for source in ("reddit", "youtube", "twitter"):
+            analyzed_comments += state["sources"].get(source, {}).get("analyzed_comments", [])
+        return {
+            "report": state["report"],
+            "analyzed_comments": analyzed_comments,
+            "news_summary": news.get("news_summary", ""),
+            "news_articles": news.get("news_articles", []),
+            "sources_status": done.get("sources_status", {}),
+            "report_status": done.get("report_status"),
+            "prompt_stats": done.get("prompt_stats"),
+        }
+
+    async def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None, partial: Optional[Dict] = None) -> None:
+        def write():
+            # A job whose lease expired belongs to whichever process took it over
+            return self._update(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, partial = ? "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (
+                    status, time.time(),
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    json.dumps(partial, default=str) if partial is not None else None,
+                    job_id, self.owner,
+                ),
+            )
+        if not await run_blocking("sqlite", write):
+            logger.warning(f"Report job {job_id} was taken over by another worker; dropping its {status} result")
+            return
+        self._counters["completed" if status == "done" else "failed"] += 1
+
+    def _queue_position(self, scheduled_at: float) -> int:
+        rows = self._execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND scheduled_at < ?", (scheduled_at,))
+        return rows[0][0] + 1
+
+    async def get(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        """Status of a job with its partial results while running and its result once done."""
+        return await run_blocking("sqlite", self._get, job_id, include_result)
+
+    def _get(self, job_id: str, include_result: bool) -> Optional[Dict]:
+        rows = self._execute(
+            "SELECT status, authenticated, scheduled_at, created_at, started_at, finished_at, partial, result, error "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        status, authenticated, scheduled_at, created_at, started_at, finished_at, partial, result, error = rows[0]
+        job = {
+            "job_id": job_id,
+            "status": status,
+            "priority": "authenticated" if authenticated else "guest",
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "wait_seconds": round((started_at or time.time()) - created_at, 3),
+        }
+        if status == "queued":
+            job["queue_position"] = self._queue_position(scheduled_at)
+        if status == "running":
+            job["partial"] = self._running.get(job_id) or (json.loads(partial) if partial else None)
+        elif partial:
+            job["partial"] = json.loads(partial)
+        if error:
+            job["error"] = error
+        if include_result and result:
+            job["result"] = json.loads(result)
+        return job
+
+    def stats(self) -> Dict:
+        waits = sorted(self._waits)
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {
+            **self._counters,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "workers": len(self._workers),
+            "by_status": counts,
+            "wait_p50_ms": int(waits[int(0.5 * (len(waits) - 1))] * 1000) if waits else None,
+            "wait_p95_ms": int(waits[int(0.95 * (len(waits) - 1))] * 1000) if waits else None,
+        }
+
+
+# Global instance
+report_jobs = ReportJobQueue()
@@ -0,0 +1,297 @@
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+STOPWORDS = set(
+    "the a an and or for with from this that those these you your our us we of to in on at by is are was were it its it's as be have has had not no but if then than about into over under more most less few many new latest top breaking video watch review official ft vs vs. live full".split()
+)
+
+# Half-lives (seconds) of the recent counts and of the baseline they are compared against
+KEYWORD_FAST_HALF_LIFE = float(os.environ.get("KEYWORD_FAST_HALF_LIFE", 1800))
+KEYWORD_SLOW_HALF_LIFE = float(os.environ.get("KEYWORD_SLOW_HALF_LIFE", 86400))
+# Longest n-gram counted; 1 disables phrase detection
+KEYWORD_MAX_NGRAM = int(os.environ.get("KEYWORD_MAX_NGRAM", 3))
+# Recent (decayed) titles a term must appear in before it can be reported
+KEYWORD_MIN_COUNT = float(os.environ.get("KEYWORD_MIN_COUNT", 2))
+# A phrase replaces its words when it accounts for this share of their recent occurrences
+PHRASE_COHESION = float(os.environ.get("PHRASE_COHESION", 0.6))
+# Titles remembered so a title listed again on the next refresh is not counted twice
+SEEN_TITLES_MAX = int(os.environ.get("SEEN_TITLES_MAX", 50000))
+# Terms kept in the baseline; the weakest half is dropped when it is exceeded
+KEYWORD_MAX_TERMS = int(os.environ.get("KEYWORD_MAX_TERMS", 200000))
+
+# Decayed counts below this are dropped when counters are rescaled
+PRUNE_BELOW = 0.01
+# Rescale stored weights before exp() gets anywhere near overflowing
+MAX_EXPONENT = 50.0
+
+
+def tokenize(title: str) -> List[str]:
+    # keep alphanumerics and spaces
+    clean = re.sub(r"[^A-Za-z0-9\s#]", "", title)
+    return [w.lower() for w in clean.split()]
+
+
+def _is_content(token: str) -> bool:
+    return len(token) >= 3 and token not in STOPWORDS
+
+
+def extract_terms(title: str, max_ngram: int = KEYWORD_MAX_NGRAM) -> set:
+    """
+    Distinct terms of a title: content words plus n-grams up to max_ngram
+    that start and end with a content word ("game of thrones" but not
+    "of thrones").
+    """
+    tokens = tokenize(title)
+    terms = set()
+    for i, token in enumerate(tokens):
+        if not _is_content(token):
+            continue
+        terms.add(token)
+        for n in range(2, max_ngram + 1):
+            if i + n > len(tokens):
+                break
+            if _is_content(tokens[i + n - 1]):
+                terms.add(" ".join(tokens[i:i + n]))
+    return terms
+
+
+class DecayedCounter:
+    """
+    Exponentially decayed counts with lazy decay: an event at time t is
+    stored with weight exp(rate * (t - origin)) and read back scaled by
+    exp(-rate * (now - origin)), so decaying every count costs nothing.
+    Stored weights are rescaled (and tiny counts pruned) only when the
+    exponent grows large, roughly every MAX_EXPONENT / rate seconds.
+    """
+
+    def __init__(self, half_life: float, now: Optional[float] = None):
+        self.rate = math.log(2) / half_life
+        self.origin = time.time() if now is None else now
+        self.counts: Dict[str, float] = {}
+        self._total = 0.0
+
+    def _rescale(self, now: float) -> None:
+        factor = math.exp(-self.rate * (now - self.origin))
+        self.counts = {
+            term: weight * factor for term, weight in self.counts.items() if weight * factor >= PRUNE_BELOW
+        }
+        self._total *= factor
+        self.origin = now
+
+    def prune(self, now: float, keep: int) -> None:
+        """Keep only the `keep` largest counts."""
+        self._rescale(now)
+        if len(self.counts) > keep:
+            strongest = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:keep]
+            self.counts = dict(strongest)
+
+    def add(self, terms: Iterable[str], now: float) -> None:
+        if self.rate * (now - self.origin) > MAX_EXPONENT:
+            self._rescale(now)
+        weight = math.exp(self.rate * (now - self.origin))
+        counts = self.counts
+        for term in terms:
+            counts[term] = counts.get(term, 0.0) + weight
+            self._total += weight
+
+    def get(self, term: str, now: float) -> float:
+        weight = self.counts.get(term)
+        if weight is None:
+            return 0.0
+        return weight * math.exp(-self.rate * (now - self.origin))
+
+    def total(self, now: float) -> float:
+        return self._total * math.exp(-self.rate * (now - self.origin))
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+class KeywordEngine:
+    """
+    Streaming trending-term detector over a feed of titles.
+
+    Each title's words and phrases feed two decayed counters: a fast one
+    (recent activity) and a slow one (baseline). Terms are ranked by
+    burstiness, how far their recent count exceeds what the baseline
+    predicts, weighted by log frequency so a single odd title cannot win.
+    Until a baseline has built up the two agree and ranking falls back to
+    frequency. A refresh brings only a few dozen titles, so while too few
+    terms reach KEYWORD_MIN_COUNT the list is filled with the most frequent
+    words below it.
+
+    ingest() costs O(new titles): titles already seen are skipped, decay is
+    lazy, and top() scores only terms seen within the last few fast
+    half-lives.
+    """
+
+    def __init__(
+        self,
+        fast_half_life: float = KEYWORD_FAST_HALF_LIFE,
+        slow_half_life: float = KEYWORD_SLOW_HALF_LIFE,
+        max_ngram: int = KEYWORD_MAX_NGRAM,
+        now: Optional[float] = None,
+    ):
+        now = time.time() if now is None else now
+        self.max_ngram = max_ngram
+        self.fast = DecayedCounter(fast_half_life, now)
+        self.slow = DecayedCounter(slow_half_life, now)
+        # After three half-lives a term's recent count is at most 1/8 of what it was
+        self.candidate_window = 3 * fast_half_life
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        self._seen_titles: "OrderedDict[str, None]" = OrderedDict()
+        self._counters = {"titles": 0, "duplicate_titles": 0}
+        self._last_ingest_ms = 0.0
+
+    def ingest(self, titles: Iterable[str], now: Optional[float] = None) -> int:
+        """Count the titles not seen before; returns how many were new."""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        new = 0
+        for title in titles:
+            key = " ".join(tokenize(title))
+            if not key:
+                continue
+            if key in self._seen_titles:
+                self._seen_titles.move_to_end(key)
+                self._counters["duplicate_titles"] += 1
+                continue
+            self._seen_titles[key] = None
+            if len(self._seen_titles) > SEEN_TITLES_MAX:
+                self._seen_titles.popitem(last=False)
+
+            terms = extract_terms(title, self.max_ngram)
+            self.fast.add(terms, now)
+            self.slow.add(terms, now)
+            for term in terms:
+                self._recent[term] = now
+                self._recent.move_to_end(term)
+            new += 1
+
+        # Amortized: each prune makes room for KEYWORD_MAX_TERMS / 2 more terms
+        for counter in (self.fast, self.slow):
+            if len(counter) > KEYWORD_MAX_TERMS:
+                counter.prune(now, KEYWORD_MAX_TERMS // 2)
+
+        # Forget candidates that have gone quiet; oldest are at the front
+        cutoff = now - self.candidate_window
+        while self._recent:
+            term, last_seen = next(iter(self._recent.items()))
+            if last_seen >= cutoff:
+                break
+            self._recent.popitem(last=False)
+
+        self._counters["titles"] += new
+        self._last_ingest_ms = (time.perf_counter() - started) * 1000
+        return new
+
+    def scores(self, now: Optional[float] = None, min_count: Optional[float] = None) -> Dict[str, Tuple[float, float]]:
+        """
+        Recent candidates whose decayed count reached `min_count`
+        (KEYWORD_MIN_COUNT by default) when they were last seen, mapped to
+        (burstiness score, recent count).
+        """
+        now = time.time() if now is None else now
+        min_count = KEYWORD_MIN_COUNT if min_count is None else min_count
+        fast_total = self.fast.total(now)
+        slow_total = self.slow.total(now)
+        if fast_total <= 0 or slow_total <= 0:
+            return {}
+        # Read stored weights directly with one decay factor per counter
+        fast_counts, fast_factor = self.fast.counts, math.exp(-self.fast.rate * (now - self.fast.origin))
+        slow_counts, slow_factor = self.slow.counts, math.exp(-self.slow.rate * (now - self.slow.origin))
+        # Baseline rate rescaled to the recent window's volume
+        slow_factor *= fast_total / slow_total
+        rate, origin = self.fast.rate, self.fast.origin
+        scored = {}
+        for term, last_seen in self._recent.items():
+            weight = fast_counts.get(term, 0.0)
+            # Judged by the count when the term was last seen; otherwise a term seen exactly
+            # min_count times would drop out as soon as any time had passed
+            if weight < min_count * math.exp(rate * (last_seen - origin)):
+                continue
+            count = weight * fast_factor
+            expected = slow_counts.get(term, 0.0) * slow_factor
+            burst = (count + 1.0) / (expected + 1.0)
+            scored[term] = (burst * math.log1p(count), count)
+        return scored
+
+    def _covered(self, scored: Dict[str, Tuple[float, float]]) -> Tuple[set, set]:
+        """
+        Cohesive phrases, and the terms they cover. A phrase is cohesive when
+        it accounts for most occurrences of both its leading and trailing
+        sub-phrase ("solar eclipse tonight" vs. "solar eclipse" and "eclipse
+        tonight"); a word that merely happens to sit next to a popular
+        phrase fails on one side. A cohesive phrase covers every shorter
+        term inside it that it accounts for most of.
+        """
+        covered, cohesive = set(), set()
+        for term, (_, count) in scored.items():
+            words = term.split()
+            if len(words) < 2:
+                continue
+            # Trim stopwords so each end is itself a term ("game of" -> "game")
+            left, right = words[:-1], words[1:]
+            while not _is_content(left[-1]):
+                left.pop()
+            while not _is_content(right[0]):
+                right.pop(0)
+            if any(count < PHRASE_COHESION * scored.get(" ".join(end), (0.0, 0.0))[1] for end in (left, right)):
+                continue
+            cohesive.add(term)
+            for n in range(1, len(words)):
+                for i in range(len(words) - n + 1):
+                    part = " ".join(words[i:i + n])
+                    if part in scored and count >= PHRASE_COHESION * scored[part][1]:
+                        covered.add(part)
+        return covered, cohesive
+
+    def top(self, k: int = 12, now: Optional[float] = None) -> List[Dict]:
+        """
+        The k most bursty terms, as {"term", "score", "count"}. A word or
+        shorter phrase is left out when a longer phrase accounts for most of
+        its occurrences ("solar eclipse" instead of "eclipse"). Fewer than k
+        terms reaching KEYWORD_MIN_COUNT are followed by the most frequent
+        remaining words.
+        """
+        now = time.time() if now is None else now
+        scored = self.scores(now)
+        covered, cohesive = self._covered(scored)
+        # Phrases that cover none of their parts are incidental word pairings
+        ranked = sorted(
+            (
+                (score, count, term) for term, (score, count) in scored.items()
+                if term not in covered and (" " not in term or term in cohesive)
+            ),
+            reverse=True,
+        )[:k]
+        if len(ranked) < k:
+            # Too little data for bursts or phrases to mean much; rank single words by frequency
+            reported = {term for _, _, term in ranked}
+            rare = sorted(
+                (
+                    (count, score, term) for term, (score, count) in self.scores(now, min_count=0.0).items()
+                    if " " not in term and term not in reported and term not in covered
+                ),
+                reverse=True,
+            )
+            ranked += [(score, count, term) for count, score, term in rare[:k - len(ranked)]]
+        return [
+            {"term": term, "score": round(score, 3), "count": round(count, 2)}
+            for score, count, term in ranked
+        ]
+
+    def top_terms(self, k: int = 12, now: Optional[float] = None) -> List[str]:
+        return [entry["term"] for entry in self.top(k, now)]
+
+    def stats(self) -> Dict:
+        return {
+            **self._counters,
+            "vocabulary": len(self.slow),
+            "candidates": len(self._recent),
+            "last_ingest_ms": round(self._last_ingest_ms, 3),
+        }
@@ -1,29 +1,35 @@
-from app.utils.news_client import fetch_news
-from app.utils.gemini_client import gemini_chat_generate
+from app.utils.news_client import fetch_news_async
+from app.utils.gemini_client import gemini_chat_generate_async
 from typing import List, Dict, Union
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
-def fetch_and_process_news(query: str) -> Dict:
-    news_response = fetch_news(query)
+# News summaries change slowly; serve cached ones and refresh in the background
+NEWS_SUMMARY_CACHE_TTL = float(os.environ.get("NEWS_SUMMARY_CACHE_TTL", 1800))
+NEWS_SUMMARY_STALE_TTL = float(os.environ.get("NEWS_SUMMARY_STALE_TTL", 3600))
+
+async def fetch_and_process_news(query: str) -> Dict:
+    news_response = await fetch_news_async(query)
     articles = news_response.get("results", [])
     if not articles:
         return {"error": "No news articles found."}
     # Prepare content for Gemini
     news_texts = [f"Title: {a.get('title', '')}\nDescription: {a.get('description', '')}\nContent: {a.get('content', '')}" for a in articles]
-    user_message = (
+    user_message = "".join((
         f"You are an expert news analyst. Given the following news articles about '{query}', "
-        "analyze and summarize the key points, trends, and any notable insights.\n\n"
-    )
-    for idx, text in enumerate(news_texts, 1):
-        user_message += f"Article {idx}:\n{text}\n\n"
-    user_message += "\nSummary and Analysis:"
+        "analyze and summarize the key points, trends, and any notable insights.\n\n",
+        "".join(f"Article {idx}:\n{text}\n\n" for idx, text in enumerate(news_texts, 1)),
+        "\nSummary and Analysis:",
+    ))
     messages = [
         {"role": "user", "content": user_message}
     ]
     try:
-        summary = gemini_chat_generate(messages)
+        summary = await gemini_chat_generate_async(
+            messages, cache_ttl=NEWS_SUMMARY_CACHE_TTL, stale_ttl=NEWS_SUMMARY_STALE_TTL
+        )
     except Exception as e:
         logger.error(f"Error generating news summary: {str(e)}")
         summary = "Summary unavailable due to upstream error."
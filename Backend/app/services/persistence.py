@@ -1,7 +1,23 @@
 from app.utils.Supabase_client import get_supabase_client
-from typing import List, Optional
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, IO, Iterator, List, Optional, Tuple
 from uuid import uuid4
 from datetime import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: spill files are then only safe within one process
+    fcntl = None
+
+from app.utils.metrics import stage
+
+logger = logging.getLogger(__name__)
 
 def save_post(platform: str, content: str, user_handle: Optional[str], timestamp: datetime, sentiment_score: Optional[float], emotion: Optional[str], metadata: Optional[dict] = None) -> dict:
     max_retries = 3
@@ -25,7 +41,6 @@ def save_post(platform: str, content: str, user_handle: Optional[str], timestamp
         except Exception as e:
             if attempt == max_retries - 1:  # Last attempt
                 raise Exception(f"Failed to save post after {max_retries} attempts: {str(e)}")
-            import time
             time.sleep(retry_delay)
 
 
@@ -42,5 +57,324 @@ def save_bulk_posts(posts: List[dict]) -> dict:
         except Exception as e:
             if attempt == max_retries - 1:  # Last attempt
                 raise Exception(f"Failed to save bulk posts after {max_retries} attempts: {str(e)}")
-            import time
-            time.sleep(retry_delay)
\ No newline at end of file
+            time.sleep(retry_delay)
+
+# --- Write-behind queue -------------------------------------------------------
+
+POSTS_FLUSH_BATCH_SIZE = int(os.environ.get("POSTS_FLUSH_BATCH_SIZE", 200))
+POSTS_FLUSH_INTERVAL = float(os.environ.get("POSTS_FLUSH_INTERVAL", 2.0))  # seconds
+POSTS_BUFFER_MAX = int(os.environ.get("POSTS_BUFFER_MAX", 10000))
+POSTS_RETRY_BACKOFF = float(os.environ.get("POSTS_RETRY_BACKOFF", 30.0))  # seconds
+# Append-only file holding posts that could not be written to Supabase
+POSTS_SPILL_PATH = os.environ.get("POSTS_SPILL_PATH", "posts_spill.jsonl")
+# Posts Supabase rejected, or that ran out of attempts, are moved here instead of retried
+POSTS_DEAD_LETTER_PATH = os.environ.get("POSTS_DEAD_LETTER_PATH", "posts_dead_letter.jsonl")
+# Failed writes of a post before it is dead-lettered; an outage costs one attempt per retry backoff
+POSTS_MAX_ATTEMPTS = int(os.environ.get("POSTS_MAX_ATTEMPTS", 10))
+
+# Postgres error classes caused by the rows themselves: bad data, constraint violations, schema mismatches
+_PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+
+# A spilled post with the number of failed attempts to write it
+SpillRecord = Tuple[int, dict]
+
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Exclusive flock on `path`, shared by every worker process using the same
+    spill file. Yields False when blocking=False and another holder has it.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Whether retrying the same rows cannot succeed: Postgres/PostgREST rejected the data, or a 4xx response."""
+    code = str(getattr(error, "code", None) or "")
+    if len(code) == 5 and code[:2] in _PERMANENT_SQLSTATE_CLASSES:
+        return True
+    # PGRST0xx are connection and timeout errors; the rest reject the request
+    if code.startswith("PGRST") and not code.startswith("PGRST0"):
+        return True
+    # PostgREST reports errors without a JSON body by HTTP status
+    status = int(code) if code.isdigit() and len(code) == 3 else getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+
+def _read_chunks(f: IO[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for line in f:
+        if line.strip():
+            chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_spill_line(line: str) -> SpillRecord:
+    record = json.loads(line)
+    if isinstance(record, dict) and set(record) == {"attempts", "post"}:
+        return record["attempts"], record["post"]
+    # Spill files written before attempts were tracked hold bare posts
+    return 0, record
+
+
+@stage("persist_posts")
+def _insert_posts(posts: List[dict]) -> None:
+    """Single insert attempt; the write-behind queue handles failures itself."""
+    get_supabase_client().table("post").insert(posts).execute()
+
+
+class PostWriteBehindQueue:
+    """
+    Buffers analyzed posts from all requests and writes them to Supabase
+    from a background thread, in batches of up to `batch_size` or every
+    `flush_interval` seconds, whichever comes first.
+
+    The buffer is bounded; overflow and failed batches are appended to a
+    local spill file, and the spill file is replayed once Supabase accepts
+    writes again (including after a restart). Worker processes share the
+    spill file: appends are serialized with a file lock, and only one
+    process replays at a time.
+
+    A batch Supabase rejects outright (bad data, schema mismatch, other 4xx)
+    is split until the rejected rows are found; those rows, and rows that
+    failed POSTS_MAX_ATTEMPTS times, go to a dead-letter file instead of
+    being retried.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = POSTS_FLUSH_BATCH_SIZE,
+        flush_interval: float = POSTS_FLUSH_INTERVAL,
+        max_buffer: int = POSTS_BUFFER_MAX,
+        spill_path: str = POSTS_SPILL_PATH,
+        dead_letter_path: str = POSTS_DEAD_LETTER_PATH,
+        max_attempts: int = POSTS_MAX_ATTEMPTS,
+        retry_backoff: float = POSTS_RETRY_BACKOFF,
+        insert: Callable[[List[dict]], None] = _insert_posts,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.spill_path = spill_path
+        self.replay_path = spill_path + ".replaying"
+        self.dead_letter_path = dead_letter_path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._insert = insert
+        self._buffer: Deque[Tuple[float, dict]] = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._retry_at = 0.0  # While Supabase is failing, batches spill until this time
+        self._counters = {
+            "enqueued": 0, "flushed": 0, "flushes": 0, "flush_failures": 0,
+            "spilled": 0, "replayed": 0, "dead_lettered": 0, "last_flush_lag": 0.0, "max_flush_lag": 0.0,
+        }
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="post-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush what is buffered (spilling anything that cannot be written) and stop the worker."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            leftover = [post for _, post in self._buffer]
+            self._buffer.clear()
+        if leftover:
+            self._spill([(0, post) for post in leftover])
+
+    def enqueue(self, posts: List[dict]) -> None:
+        """Queue posts for writing. Never blocks on Supabase."""
+        if not posts:
+            return
+        now = time.monotonic()
+        with self._cond:
+            room = max(0, self.max_buffer - len(self._buffer))
+            accepted, overflow = posts[:room], posts[room:]
+            self._buffer.extend((now, post) for post in accepted)
+            self._counters["enqueued"] += len(posts)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        if overflow:
+            logger.warning(f"Post buffer full; spilling {len(overflow)} posts to {self.spill_path}")
+            self._spill([(0, post) for post in overflow])
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                stopping = self._stopping and not self._buffer
+            if batch:
+                self._flush(batch)
+            elif self._spill_pending() and time.monotonic() >= self._retry_at:
+                self._replay_spill()
+            if stopping:
+                break
+
+    def _flush(self, batch: List[Tuple[float, dict]]) -> None:
+        records = [(0, post) for _, post in batch]
+        if time.monotonic() < self._retry_at:
+            self._spill(records)
+            return
+        dead, unwritten, error = self._write(records)
+        self._counters["flushed"] += len(records) - len(dead) - len(unwritten)
+        if dead:
+            self._dead_letter(dead)
+        if error is not None:
+            logger.error(f"Write-behind flush of {len(unwritten)} posts failed: {str(error)}")
+            self._counters["flush_failures"] += 1
+            self._retry_at = time.monotonic() + self.retry_backoff
+            self._spill([(attempts + 1, post) for attempts, post in unwritten])
+            return
+        lag = time.monotonic() - batch[0][0]
+        self._counters["flushes"] += 1
+        self._counters["last_flush_lag"] = round(lag, 3)
+        self._counters["max_flush_lag"] = round(max(self._counters["max_flush_lag"], lag), 3)
+        if self._spill_pending():
+            self._replay_spill()
+
+    def _spill_pending(self) -> bool:
+        # A .replaying file left behind by a crashed replay counts too
+        return os.path.exists(self.spill_path) or os.path.exists(self.replay_path)
+
+    def _write(self, records: List[SpillRecord]) -> Tuple[List[Tuple[SpillRecord, str]], List[SpillRecord], Optional[Exception]]:
+        """
+        Insert the records' posts. A batch rejected permanently is split in
+        halves until the rejected rows are isolated. Returns the rejected
+        records with their errors, and on a transient error the records not
+        written together with that error.
+        """
+        if not records:
+            return [], [], None
+        try:
+            self._insert([post for _, post in records])
+            return [], [], None
+        except Exception as e:
+            if not _is_permanent(e):
+                return [], records, e
+            if len(records) == 1:
+                return [(records[0], str(e))], [], None
+        middle = len(records) // 2
+        dead, unwritten, error = self._write(records[:middle])
+        if error is not None:
+            return dead, unwritten + records[middle:], error
+        more_dead, unwritten, error = self._write(records[middle:])
+        return dead + more_dead, unwritten, error
+
+    def _append(self, path: str, lines: List[str]) -> None:
+        with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _spill(self, records: List[SpillRecord], respill: bool = False) -> None:
+        """Append records to the spill file; those out of attempts go to the dead-letter file."""
+        exhausted = [(record, f"Gave up after {record[0]} failed attempts") for record in records if record[0] >= self.max_attempts]
+        if exhausted:
+            self._dead_letter(exhausted)
+        lines = [
+            json.dumps({"attempts": attempts, "post": post}, default=str) + "\n"
+            for attempts, post in records if attempts < self.max_attempts
+        ]
+        if lines:
+            self._append(self.spill_path, lines)
+        if not respill:
+            self._counters["spilled"] += len(records)
+
+    def _dead_letter(self, entries: List[Tuple[SpillRecord, str]]) -> None:
+        logger.error(f"Moving {len(entries)} posts to {self.dead_letter_path}: {entries[0][1]}")
+        self._append(self.dead_letter_path, [
+            json.dumps({"attempts": attempts, "post": post, "error": error}, default=str) + "\n"
+            for (attempts, post), error in entries
+        ])
+        self._counters["dead_lettered"] += len(entries)
+
+    def _replay_spill(self) -> None:
+        """
+        Move the spill file aside and write its posts back, streaming it in
+        batches; on a transient error the failed batch is re-spilled with one
+        more attempt and the rest of the file is copied back unchanged. A
+        .replaying file already present (left by a replay that crashed) is
+        finished first. Skipped while another process is replaying.
+        """
+        with _file_lock(self.spill_path + ".replay.lock", blocking=False) as acquired:
+            if acquired:
+                self._replay_locked()
+
+    def _replay_locked(self) -> None:
+        replay_path = self.replay_path
+        with self._spill_lock, _file_lock(self.spill_path + ".lock"):
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+        replayed = 0
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for lines in _read_chunks(f, self.batch_size):
+                records, corrupt = [], []
+                for line in lines:
+                    try:
+                        records.append(_parse_spill_line(line))
+                    except ValueError as e:
+                        # A line cut short by a crash mid-append
+                        corrupt.append(((0, {"spill_line": line.rstrip("\n")}), f"Unreadable spill line: {e}"))
+                if corrupt:
+                    self._dead_letter(corrupt)
+                dead, unwritten, error = self._write(records)
+                replayed += len(records) - len(dead) - len(unwritten)
+                if dead:
+                    self._dead_letter(dead)
+                if error is not None:
+                    logger.error(f"Replay of spilled posts failed, will retry later: {str(error)}")
+                    self._retry_at = time.monotonic() + self.retry_backoff
+                    self._spill([(attempts + 1, post) for attempts, post in unwritten], respill=True)
+                    for rest in _read_chunks(f, self.batch_size):
+                        self._append(self.spill_path, rest)
+                    break
+        os.remove(replay_path)
+        self._counters["replayed"] += replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} spilled posts")
+
+    def stats(self) -> Dict:
+        with self._cond:
+            pending = len(self._buffer)
+            oldest_age = time.monotonic() - self._buffer[0][0] if self._buffer else 0.0
+        counters = dict(self._counters)
+        counters["pending"] = pending
+        counters["oldest_pending_age"] = round(oldest_age, 3)
+        counters["spill_pending"] = self._spill_pending()
+        return counters
+
+
+# Global instance
+post_queue = PostWriteBehindQueue()
@@ -0,0 +1,158 @@
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+import os
+
+# Input-token budget for comment prompts, and the per-comment cap applied before sampling
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 24000))
+MAX_COMMENT_TOKENS = int(os.environ.get("MAX_COMMENT_TOKENS", 200))
+CHARS_PER_TOKEN = 4  # Rough average for English text with Gemini's tokenizer
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """Cut text to roughly max_tokens, on a word boundary where possible."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text, False
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…", True
+
+
+def sentiment_parts(item: Dict) -> Tuple[Optional[str], Optional[float]]:
+    sentiment = item.get("sentiment")
+    if isinstance(sentiment, dict):
+        return sentiment.get("label"), sentiment.get("score")
+    return sentiment, None
+
+
+def format_comment(item: Dict, max_tokens: int = MAX_COMMENT_TOKENS) -> Tuple[str, bool]:
+    text, truncated = truncate_to_tokens(str(item.get("text") or ""), max_tokens)
+    label, score = sentiment_parts(item)
+    # Collapsed near-duplicates carry the number of comments they stand for
+    repeated = f" (posted {item['count']} times)" if item.get("count", 1) > 1 else ""
+    return f"\n- Comment{repeated}: {text}\n  Sentiment: {label} (score: {score})", truncated
+
+
+def stratified_sample(items: List[Dict], k: int) -> List[int]:
+    """
+    Indices of k items chosen so each sentiment label keeps its share of
+    the whole (largest-remainder allocation, at least one per label when
+    k allows), spread evenly through each label's items. Returned in
+    original order.
+    """
+    if k >= len(items):
+        return list(range(len(items)))
+    if k <= 0:
+        return []
+
+    strata: Dict[str, List[int]] = defaultdict(list)
+    for index, item in enumerate(items):
+        label, _ = sentiment_parts(item)
+        strata[str(label or "UNKNOWN")].append(index)
+
+    total = len(items)
+    quotas = {label: k * len(members) / total for label, members in strata.items()}
+    allocation = {label: int(quota) for label, quota in quotas.items()}
+    if k >= len(strata):
+        for label in strata:
+            allocation[label] = max(allocation[label], 1)
+    remaining = k - sum(allocation.values())
+    by_remainder = sorted(strata, key=lambda label: quotas[label] - int(quotas[label]), reverse=True)
+    for label in by_remainder:
+        if remaining <= 0:
+            break
+        if allocation[label] < len(strata[label]):
+            allocation[label] += 1
+            remaining -= 1
+    # Allocation may overshoot k when many small labels were bumped to one
+    while sum(allocation.values()) > k:
+        largest = max(allocation, key=allocation.get)
+        allocation[largest] -= 1
+
+    chosen: List[int] = []
+    for label, members in strata.items():
+        count = min(allocation[label], len(members))
+        step = len(members) / count if count else 0
+        chosen.extend(members[int(i * step)] for i in range(count))
+    return sorted(chosen)
+
+
+def build_comment_prompt(
+    header: str,
+    comments: List[Dict],
+    footer: str = "",
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+    max_comment_tokens: int = MAX_COMMENT_TOKENS,
+) -> Tuple[str, Dict]:
+    """
+    Assemble header + one line per comment + footer in linear time, keeping
+    the estimated size within token_budget. Long comments are truncated to
+    max_comment_tokens; if the comments still do not fit, a sentiment-
+    stratified sample is used instead.
+
+    Returns the prompt and a stats dict describing what was dropped.
+    """
+    formatted = [format_comment(item, max_comment_tokens) for item in comments]
+    lines = [line for line, _ in formatted]
+    costs = [estimate_tokens(line) for line in lines]
+    fixed_cost = estimate_tokens(header) + estimate_tokens(footer)
+    available = max(0, token_budget - fixed_cost)
+
+    selected = list(range(len(comments)))
+    if sum(costs) > available:
+        average = sum(costs) / len(costs)
+        k = min(len(comments), int(available // average))
+        selected = stratified_sample(comments, k)
+        while selected and sum(costs[i] for i in selected) > available:
+            k = min(k - 1, int(k * 0.95))
+            selected = stratified_sample(comments, k)
+
+    body = "".join(lines[i] for i in selected)
+    prompt = "".join((header, body, footer))
+    stats = {
+        "comments_total": len(comments),
+        "comments_included": len(selected),
+        "comments_dropped": len(comments) - len(selected),
+        "comments_truncated": sum(1 for i in selected if formatted[i][1]),
+        "estimated_tokens": fixed_cost + sum(costs[i] for i in selected),
+        "token_budget": token_budget,
+    }
+    return prompt, stats
+
+
+def chunk_comments(
+    comments: List[Dict],
+    chunk_tokens: int,
+    max_comment_tokens: int = MAX_COMMENT_TOKENS,
+) -> List[List[Dict]]:
+    """
+    Split comments, in order, into consecutive chunks whose formatted lines
+    fit within chunk_tokens each (a single oversized comment gets its own chunk).
+    """
+    chunks: List[List[Dict]] = []
+    current: List[Dict] = []
+    used = 0
+    for item in comments:
+        cost = estimate_tokens(format_comment(item, max_comment_tokens)[0])
+        if current and used + cost > chunk_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def sentiment_distribution(comments: List[Dict]) -> Dict[str, int]:
+    counts: Dict[str, int] = defaultdict(int)
+    for item in comments:
+        label, _ = sentiment_parts(item)
+        counts[str(label or "UNKNOWN")] += 1
+    return dict(counts)
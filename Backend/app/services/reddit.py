@@ -1,54 +1,179 @@
-from app.utils.reddit_client import get_reddit_client
-from typing import List, Dict, Union
-from app.services.sentiment import analyze_sentiment
+from prawcore.exceptions import TooManyRequests
+from praw.models import MoreComments
+from app.utils.reddit_client import get_reddit_client, record_reddit_throttle, reddit_request_count
+from app.utils.rate_limiter import rate_limiter, RateLimitExceeded
+from app.utils.fetch_stats import FetchStats
+from app.utils.cursor_store import cursor_store
+from app.utils.near_dedup import NearDuplicateIndex
+from app.utils.text_preprocess import text_preprocessor
+from app.utils.metrics import stage
+from typing import List, Dict, Union, Iterator, Tuple, Optional, Set
+from collections import deque
+from app.services.sentiment import analyze_sentiment_batch_async
+from app.utils.executors import run_blocking
+import asyncio
 import logging
+import os
+import time
 from datetime import datetime
-from app.services.persistence import save_bulk_posts
+from app.services.persistence import post_queue
 
-def fetch_recent_comments(subreddit: str, query: str, limit: int = 10) -> Union[List[str], dict]:
+# Submissions whose comments are fetched at the same time
+REDDIT_SUBMISSION_CONCURRENCY = int(os.environ.get("REDDIT_SUBMISSION_CONCURRENCY", 4))
+# Extra comments requested per submission to make up for deleted/empty ones
+COMMENT_LIMIT_HEADROOM = 10
+
+# Submissions remembered per (query, subreddit) so repeat runs skip them
+MAX_SEEN_SUBMISSIONS = 500
+# Listings cannot page past 1000 items
+MAX_SEARCH_RESULTS = 1000
+
+# Requests and latency per fetch_recent_comments call
+reddit_fetch_stats = FetchStats()
+
+
+def search_submission_ids(subreddit: str, query: str, limit: int) -> Tuple[List[str], int]:
+    """Ids of the newest matching submissions, and the number of requests made."""
+    before = reddit_request_count()
     reddit = get_reddit_client()
+    # Search listings return up to 100 submissions per request
+    rate_limiter.acquire("reddit", "search", count=-(-limit // 100))
+    ids = [submission.id for submission in reddit.subreddit(subreddit).search(query, sort="new", limit=limit)]
+    return ids, reddit_request_count() - before
+
+
+def _iter_comments(forest) -> Iterator:
+    """Breadth-first walk over an already fetched comment forest, skipping 'load more' stubs."""
+    queue = deque(forest)
+    while queue:
+        item = queue.popleft()
+        if isinstance(item, MoreComments):
+            continue
+        yield item
+        queue.extend(item.replies)
+
+
+def fetch_submission_comments(submission_id: str, limit: int) -> Tuple[List, int]:
+    """
+    Up to `limit` non-empty comments from one submission, taken from a
+    single comments request capped near `limit`; MoreComments are never expanded.
+    Returns the comments and the number of requests made.
+    """
+    before = reddit_request_count()
+    rate_limiter.acquire("reddit", "comments")
+    submission = get_reddit_client().submission(id=submission_id)
+    submission.comment_limit = limit + COMMENT_LIMIT_HEADROOM
+    comments = []
+    for comment in _iter_comments(submission.comments):
+        if comment.body:
+            comments.append(comment)
+            if len(comments) >= limit:
+                break
+    return comments, reddit_request_count() - before
+
+
+@stage("fetch_reddit")
+async def fetch_recent_comments(
+    subreddit: str, query: str, limit: int = 10, skip_submissions: Optional[Set[str]] = None
+) -> Union[List, dict]:
+    """
+    Newest comments from submissions matching `query`, stopping as soon as
+    `limit` comments are collected. Submissions are read in waves of
+    REDDIT_SUBMISSION_CONCURRENCY, each on its own executor thread.
+    Submissions in `skip_submissions` are passed over.
+    """
+    started = time.monotonic()
+    requests = 0
+    comments = []
+    skip_submissions = skip_submissions or set()
     try:
-        comments = []
-        for submission in reddit.subreddit(subreddit).search(query, sort="new", limit=limit):
-            submission.comments.replace_more(limit=0)
-            for comment in submission.comments.list():
-                if comment.body:
-                    comments.append(comment)
-                if len(comments) >= limit:
-                    break
+        search_limit = min(MAX_SEARCH_RESULTS, limit + len(skip_submissions))
+        submission_ids, requests = await run_blocking("reddit", search_submission_ids, subreddit, query, search_limit)
+        submission_ids = [submission_id for submission_id in submission_ids if submission_id not in skip_submissions][:limit]
+        for start in range(0, len(submission_ids), REDDIT_SUBMISSION_CONCURRENCY):
+            remaining = limit - len(comments)
+            wave = submission_ids[start:start + REDDIT_SUBMISSION_CONCURRENCY]
+            outcomes = await asyncio.gather(
+                *(run_blocking("reddit", fetch_submission_comments, submission_id, remaining) for submission_id in wave),
+                return_exceptions=True,
+            )
+            for submission_id, outcome in zip(wave, outcomes):
+                if isinstance(outcome, (RateLimitExceeded, TooManyRequests)):
+                    raise outcome
+                if isinstance(outcome, Exception):
+                    logging.warning(f"Skipping Reddit submission {submission_id}: {outcome}")
+                    continue
+                submission_comments, submission_requests = outcome
+                requests += submission_requests
+                comments.extend(submission_comments[:limit - len(comments)])
             if len(comments) >= limit:
                 break
-        return comments[:limit]
+        rate_limiter.succeeded("reddit")
+        result = comments
+    except RateLimitExceeded as e:
+        logging.warning(str(e))
+        result = {"error": str(e), "retry_after": round(e.retry_after)}
+    except TooManyRequests as e:
+        retry_after = record_reddit_throttle(e)
+        logging.warning("Rate limited by Reddit API. Try again after some time.")
+        result = {"error": "Reddit rate limit hit. Please wait and try again later.", "retry_after": round(retry_after)}
     except Exception as e:
         logging.error(f"Error fetching Reddit comments: {e}")
-        return {"error": str(e)}
+        result = {"error": str(e)}
 
+    latency = time.monotonic() - started
+    reddit_fetch_stats.record(requests, latency, items=len(comments), error=isinstance(result, dict))
+    logging.info(f"Reddit fetch: {len(comments)} comments in {requests} requests, {latency * 1000:.0f} ms")
+    return result
 
-def analyze_comments_sentiment(subreddit: str, query: str, limit: int = 10) -> Union[List[Dict], dict]:
-    comments = fetch_recent_comments(subreddit, query, limit)
+
+async def analyze_comments_sentiment(
+    subreddit: str, query: str, limit: int = 10, incremental: bool = False, dedup: Optional[NearDuplicateIndex] = None
+) -> Union[List[Dict], dict]:
+    """
+    With incremental=True, submissions read by earlier runs for this query
+    and subreddit are skipped; new results are merged with the stored
+    results of earlier runs, each flagged with "new". A `dedup` index shared
+    across sources skips sentiment for near-duplicates of texts it has seen.
+    """
+    source = f"reddit:{subreddit.lower()}"
+    cursor = await run_blocking("sqlite", cursor_store.get_cursor, query, source) if incremental else None
+    seen = (cursor or {}).get("seen_submissions", [])
+    comments = await fetch_recent_comments(subreddit, query, limit, skip_submissions=set(seen))
     if isinstance(comments, dict) and "error" in comments:
         return comments
+    texts = [comment.body if hasattr(comment, 'body') else str(comment) for comment in comments]
+    # Strip markdown and boilerplate, and drop deleted or empty comments
+    texts, kept = text_preprocessor.preprocess(texts)
+    fetched, comments = comments, [comments[i] for i in kept]
+    try:
+        sentiments = await analyze_sentiment_batch_async(texts, dedup)
+    except Exception as e:
+        logging.error(f"Error analyzing sentiment: {e}")
+        return [{"text": text, "sentiment": {"error": str(e)}} for text in texts]
     results = []
     posts_to_save = []
-    for comment in comments:
-        text = comment.body if hasattr(comment, 'body') else str(comment)
+    analyzed = []
+    for comment, text, sentiment in zip(comments, texts, sentiments):
         user_handle = getattr(comment, 'author', None)
         timestamp = getattr(comment, 'created_utc', None)
-        try:
-            sentiment = analyze_sentiment(text)
-            results.append({"text": text, "sentiment": sentiment})
-            posts_to_save.append({
-                "platform": "reddit",
-                "content": text,
-                "user_handle": str(user_handle) if user_handle else None,
-                "timestamp": datetime.utcfromtimestamp(timestamp).isoformat() if timestamp else datetime.utcnow().isoformat(),
-                "sentiment_score": sentiment.get("score"),
-                "emotion": sentiment.get("label"),
-                "metadata": {"comment_id": getattr(comment, 'id', None), "subreddit": subreddit}
-            })
-        except Exception as e:
-            logging.error(f"Error analyzing sentiment: {e}")
-            results.append({"text": text, "sentiment": {"error": str(e)}})
+        results.append({"text": text, "sentiment": sentiment})
+        if "error" not in sentiment:
+            analyzed.append((str(getattr(comment, 'id', text)), results[-1]))
+        posts_to_save.append({
+            "platform": "reddit",
+            "content": text,
+            "user_handle": str(user_handle) if user_handle else None,
+            "timestamp": datetime.utcfromtimestamp(timestamp).isoformat() if timestamp else datetime.utcnow().isoformat(),
+            "sentiment_score": sentiment.get("score"),
+            "emotion": sentiment.get("label"),
+            "metadata": {"comment_id": getattr(comment, 'id', None), "subreddit": subreddit}
+        })
     if posts_to_save:
-        save_bulk_posts(posts_to_save)
+        post_queue.enqueue(posts_to_save)
+    if incremental:
+        # link_id is the parent submission's fullname, e.g. "t3_abc123"
+        read = [comment.link_id.split("_", 1)[-1] for comment in fetched if getattr(comment, 'link_id', None)]
+        seen = list(dict.fromkeys(read + seen))[:MAX_SEEN_SUBMISSIONS]
+        return await run_blocking("sqlite", cursor_store.record_run, query, source, {"seen_submissions": seen}, analyzed, limit)
     return results 
\ No newline at end of file
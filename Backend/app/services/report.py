@@ -1,33 +1,178 @@
-from app.utils.gemini_client import gemini_chat_generate
-from typing import List, Dict
+from app.utils.gemini_client import gemini_chat_generate_async
+from app.services.prompt_builder import (
+    build_comment_prompt,
+    chunk_comments,
+    estimate_tokens,
+    sentiment_distribution,
+    PROMPT_TOKEN_BUDGET,
+)
+from typing import List, Dict, Optional
+import asyncio
+import logging
+import os
 
-def generate_report_from_sentiments(topic: str, comments_with_sentiment: List[Dict], max_tokens: int = 512) -> str:
+logger = logging.getLogger(__name__)
+
+# Identical comment sets produce identical prompts, e.g. repeated /generate-report calls
+REPORT_CACHE_TTL = float(os.environ.get("REPORT_CACHE_TTL", 600))
+REPORT_STALE_TTL = float(os.environ.get("REPORT_STALE_TTL", 0))
+
+# Map-reduce mode: comments are summarized in chunks of MAP_CHUNK_TOKENS
+# estimated tokens, at most MAP_REDUCE_CONCURRENCY Gemini calls at a time
+MAP_CHUNK_TOKENS = int(os.environ.get("MAP_CHUNK_TOKENS", 6000))
+MAP_REDUCE_CONCURRENCY = int(os.environ.get("MAP_REDUCE_CONCURRENCY", 8))
+REPORT_MODES = ("auto", "single", "map_reduce")
+
+REPORT_INSTRUCTIONS = (
+    "The report should include:\n"
+    "- An overall sentiment summary (positive/negative/neutral)\n"
+    "- Key themes or opinions\n"
+    "- Any notable trends or anomalies\n"
+    "- A concise summary for an executive\n\n"
+)
+
+
+async def _generate_single(topic: str, comments_with_sentiment: List[Dict]) -> Dict:
     # Build a chat message for the LLM
-    user_message = (
+    header = (
         f"You are an expert analyst. Given the following comments and their sentiment scores about '{topic}', "
-        "generate a detailed summary and report. The report should include:\n"
-        "- An overall sentiment summary (positive/negative/neutral)\n"
-        "- Key themes or opinions\n"
-        "- Any notable trends or anomalies\n"
-        "- A concise summary for an executive\n\n"
+        "generate a detailed summary and report. " + REPORT_INSTRUCTIONS +
         "Comments and Sentiments:\n"
     )
-    for item in comments_with_sentiment:
-        comment = item.get("text")
-        sentiment = item.get("sentiment")
-        if isinstance(sentiment, dict):
-            label = sentiment.get("label")
-            score = sentiment.get("score")
-        else:
-            label = sentiment
-            score = None
-        user_message += f"\n- Comment: {comment}\n  Sentiment: {label} (score: {score})"
-    user_message += "\n\nSummary and Report:"
+    user_message, prompt_stats = build_comment_prompt(header, comments_with_sentiment, "\n\nSummary and Report:")
 
     messages = [
         {"role": "user", "content": user_message}
     ]
     # Call the Gemini API
-    response = gemini_chat_generate(messages)
-    # Return the generated content directly
-    return response 
\ No newline at end of file
+    response = await gemini_chat_generate_async(messages, cache_ttl=REPORT_CACHE_TTL, stale_ttl=REPORT_STALE_TTL)
+    return {"report": response, "prompt_stats": prompt_stats, "mode": "single"}
+
+
+async def _summarize_chunk(topic: str, chunk: List[Dict], semaphore: asyncio.Semaphore) -> Optional[str]:
+    """Map step: condense one chunk of comments into notes. Returns None on failure."""
+    header = (
+        f"You are an expert analyst. Below is one batch of comments about '{topic}' with their sentiment scores. "
+        "Write concise notes on this batch covering the prevailing sentiment, the main themes and opinions, "
+        "and anything unusual. Quote representative phrases where useful.\n\n"
+        "Comments and Sentiments:\n"
+    )
+    # The chunk was sized to fit, so nothing is sampled away here
+    user_message, _ = build_comment_prompt(
+        header, chunk, "\n\nBatch Notes:", token_budget=MAP_CHUNK_TOKENS + estimate_tokens(header) + 16
+    )
+    async with semaphore:
+        try:
+            return await gemini_chat_generate_async(
+                [{"role": "user", "content": user_message}], cache_ttl=REPORT_CACHE_TTL
+            )
+        except Exception as e:
+            logger.error(f"Error summarizing comment chunk: {str(e)}")
+            return None
+
+
+async def _combine_notes(topic: str, notes: List[str], semaphore: asyncio.Semaphore) -> Optional[str]:
+    """Intermediate reduce step: merge several batch notes into one set of notes."""
+    user_message = "".join((
+        f"You are an expert analyst. Merge the following notes on batches of comments about '{topic}' "
+        "into one set of concise notes, keeping every distinct theme and the sentiment balance.\n\n",
+        "".join(f"Notes {idx}:\n{text}\n\n" for idx, text in enumerate(notes, 1)),
+        "Merged Notes:",
+    ))
+    async with semaphore:
+        try:
+            return await gemini_chat_generate_async(
+                [{"role": "user", "content": user_message}], cache_ttl=REPORT_CACHE_TTL
+            )
+        except Exception as e:
+            logger.error(f"Error merging chunk notes: {str(e)}")
+            return None
+
+
+def _group_notes(notes: List[str], token_budget: int) -> List[List[str]]:
+    groups: List[List[str]] = [[]]
+    used = 0
+    for text in notes:
+        cost = estimate_tokens(text) + 8
+        if groups[-1] and used + cost > token_budget:
+            groups.append([])
+            used = 0
+        groups[-1].append(text)
+        used += cost
+    return groups
+
+
+async def _generate_map_reduce(topic: str, comments_with_sentiment: List[Dict]) -> Dict:
+    """
+    Summarize comments chunk by chunk in parallel (map), then merge the
+    chunk notes into the final report (reduce). When the notes themselves
+    exceed the prompt budget they are merged in groups first, so the number
+    of sequential rounds grows only logarithmically with the comment count.
+    """
+    semaphore = asyncio.Semaphore(MAP_REDUCE_CONCURRENCY)
+    chunks = chunk_comments(comments_with_sentiment, MAP_CHUNK_TOKENS)
+    partials = await asyncio.gather(*(_summarize_chunk(topic, chunk, semaphore) for chunk in chunks))
+    notes = [text for text in partials if text]
+    failed_chunks = len(chunks) - len(notes)
+    if not notes:
+        raise RuntimeError("All comment chunks failed to summarize")
+
+    # Leave room for the final prompt's instructions
+    notes_budget = PROMPT_TOKEN_BUDGET - 1024
+    reduce_rounds = 1
+    while len(notes) > 1 and sum(estimate_tokens(text) + 8 for text in notes) > notes_budget:
+        groups = _group_notes(notes, notes_budget)
+        if len(groups) == len(notes):
+            # Every note is too large to pair up; merging further cannot help
+            break
+        merged = await asyncio.gather(*(_combine_notes(topic, group, semaphore) for group in groups))
+        notes = [text for text in merged if text]
+        if not notes:
+            raise RuntimeError("Failed to merge comment chunk notes")
+        reduce_rounds += 1
+
+    distribution = sentiment_distribution(comments_with_sentiment)
+    user_message = "".join((
+        f"You are an expert analyst. The notes below each cover a batch of the {len(comments_with_sentiment)} "
+        f"comments collected about '{topic}'. Using them, generate a detailed summary and report. ",
+        REPORT_INSTRUCTIONS,
+        "Sentiment counts across all comments: ",
+        ", ".join(f"{label}: {count}" for label, count in sorted(distribution.items())),
+        "\n\n",
+        "".join(f"Batch Notes {idx}:\n{text}\n\n" for idx, text in enumerate(notes, 1)),
+        "Summary and Report:",
+    ))
+    response = await gemini_chat_generate_async(
+        [{"role": "user", "content": user_message}], cache_ttl=REPORT_CACHE_TTL, stale_ttl=REPORT_STALE_TTL
+    )
+    return {
+        "report": response,
+        "mode": "map_reduce",
+        "map_reduce_stats": {
+            "comments_total": len(comments_with_sentiment),
+            "chunks": len(chunks),
+            "failed_chunks": failed_chunks,
+            "reduce_rounds": reduce_rounds,
+        },
+    }
+
+
+async def generate_report_from_sentiments(
+    topic: str,
+    comments_with_sentiment: List[Dict],
+    max_tokens: int = 512,
+    mode: str = "auto",
+) -> Dict:
+    """
+    mode is "single" (one prompt, sampled down to the token budget),
+    "map_reduce", or "auto", which uses map-reduce only when a single
+    prompt would have to drop comments.
+    """
+    if mode not in REPORT_MODES:
+        raise ValueError(f"Unknown report mode: {mode}")
+    if mode == "auto":
+        _, prompt_stats = build_comment_prompt("", comments_with_sentiment)
+        mode = "map_reduce" if prompt_stats["comments_dropped"] else "single"
+    if mode == "map_reduce" and comments_with_sentiment:
+        return await _generate_map_reduce(topic, comments_with_sentiment)
+    return await _generate_single(topic, comments_with_sentiment)
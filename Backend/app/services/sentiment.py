@@ -1,9 +1,109 @@
-from app.utils.hf_inference import hf_sentiment_analysis
+import os
+import asyncio
+from typing import List, Optional
 
+from app.utils.executors import run_blocking
+from app.utils.sentiment_cache import sentiment_cache, cache_key
+from app.utils.near_dedup import NearDuplicateIndex
+from app.utils.text_preprocess import text_preprocessor
+from app.utils.metrics import stage
+
+# "local" runs distilbert in-process; "hf_api" calls the HF Inference API per text
+SENTIMENT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "local")
+SENTIMENT_MODEL = os.environ.get("LOCAL_SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english")
+SENTIMENT_CACHE_ENABLED = os.environ.get("SENTIMENT_CACHE_ENABLED", "true").lower() == "true"
+HF_API_CONCURRENCY = int(os.environ.get("HF_API_CONCURRENCY", 8))
+
+# Cache keys include the backend so API and local scores are never mixed
+MODEL_ID = f"{SENTIMENT_BACKEND}:{SENTIMENT_MODEL}"
+
+
+def _lookup_cached(texts: List[str]):
+    """
+    Resolve texts against the sentiment cache.
+    Returns the per-text keys, the cached results and the unique uncached (key, text) pairs.
+    """
+    keys = [cache_key(text, MODEL_ID) for text in texts]
+    cached = sentiment_cache.get_many(keys) if SENTIMENT_CACHE_ENABLED else {}
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    return keys, cached, missing
+
+
+def _merge_results(keys: List[str], cached: dict, missing_keys: List[str], fresh: List[dict]) -> List[dict]:
+    computed = dict(zip(missing_keys, fresh))
+    if SENTIMENT_CACHE_ENABLED:
+        sentiment_cache.put_many(computed)
+    cached.update(computed)
+    return [dict(cached[key]) for key in keys]
+
+
+@stage("sentiment_inference")
+def _infer_batch(texts: List[str]) -> List[dict]:
+    if SENTIMENT_BACKEND == "hf_api":
+        from app.utils.hf_inference import hf_sentiment_analysis
+        # The local path truncates in its own tokenizer call; the API should not be sent text it will discard
+        texts = text_preprocessor.truncate_for_model(texts)
+        return [hf_sentiment_analysis(text, model=SENTIMENT_MODEL) for text in texts]
+    from app.utils.local_sentiment import local_sentiment_batch
+    return local_sentiment_batch(texts)
+
+
+@stage("sentiment_inference")
+async def _infer_batch_async(texts: List[str]) -> List[dict]:
+    if SENTIMENT_BACKEND == "hf_api":
+        from app.utils.hf_inference import hf_sentiment_analysis_async
+        texts = await run_blocking("inference", text_preprocessor.truncate_for_model, texts)
+        semaphore = asyncio.Semaphore(HF_API_CONCURRENCY)
+
+        async def classify(text: str) -> dict:
+            async with semaphore:
+                return await hf_sentiment_analysis_async(text, model=SENTIMENT_MODEL)
+        return list(await asyncio.gather(*(classify(text) for text in texts)))
+    from app.utils.local_sentiment import local_sentiment_batch
+    return await run_blocking("inference", local_sentiment_batch, texts)
+
+
+def analyze_sentiment_batch(texts: List[str]) -> List[dict]:
+    """
+    Analyze sentiment of a list of texts and return one dict with 'label' and 'score' per text, in input order.
+    Cached texts (and repeats within the batch) skip inference.
+    """
+    if not texts:
+        return []
+    keys, cached, missing = _lookup_cached(texts)
+    fresh = _infer_batch(list(missing.values())) if missing else []
+    return _merge_results(keys, cached, list(missing), fresh)
+
+
+async def analyze_sentiment_batch_async(texts: List[str], dedup: Optional[NearDuplicateIndex] = None) -> List[dict]:
+    """
+    Non-blocking variant of analyze_sentiment_batch. Local inference runs on the
+    inference executor; the HF API backend issues bounded concurrent requests.
+    With a `dedup` index only texts that are not near-duplicates of texts
+    already analyzed through it are classified.
+    """
+    if not texts:
+        return []
+    if dedup is not None:
+        return await dedup.analyze(texts, analyze_sentiment_batch_async)
+    # Cache reads and writes are SQLite transactions (writes occasionally evict), so keep them off the loop
+    keys, cached, missing = await run_blocking("sqlite", _lookup_cached, texts)
+    fresh = await _infer_batch_async(list(missing.values())) if missing else []
+    return await run_blocking("sqlite", _merge_results, keys, cached, list(missing), fresh)
 
 
 def analyze_sentiment(text: str) -> dict:
     """
     Analyze sentiment of the input text and return a dict with 'label' and 'score'.
     """
-    return hf_sentiment_analysis(text)
+    return analyze_sentiment_batch([text])[0]
+
+
+async def analyze_sentiment_async(text: str) -> dict:
+    """
+    Non-blocking variant of analyze_sentiment.
+    """
+    return (await analyze_sentiment_batch_async([text]))[0]
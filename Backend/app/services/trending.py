@@ -1,35 +1,33 @@
-from typing import List, Dict
-from collections import Counter
-import re
-
-from app.utils.youtube_client import get_youtube_api_key
-from googleapiclient.discovery import build
-from app.utils.reddit_client import get_reddit_client
-
-STOPWORDS = set(
-    "the a an and or for with from this that those these you your our us we of to in on at by is are was were it its it's as be have has had not no but if then than about into over under more most less few many new latest top breaking video watch review official ft vs vs. live full".split()
-)
-
-def _extract_keywords(titles: List[str], max_items: int = 15) -> List[str]:
-    tokens: List[str] = []
-    for t in titles:
-        # keep alphanumerics and spaces
-        clean = re.sub(r"[^A-Za-z0-9\s#]", "", t)
-        for w in clean.split():
-            lw = w.lower().strip()
-            if not lw or lw in STOPWORDS or len(lw) < 3:
-                continue
-            # prefer hashtags or capitalized words
-            tokens.append(lw)
-    # count and return top tokens
-    counts = Counter(tokens)
-    return [w for w, _ in counts.most_common(max_items)]
+from typing import List, Dict, Optional, Tuple
+import asyncio
+from datetime import datetime
+import logging
+import os
+import time
+
+from app.utils.youtube_client import get_youtube_client, execute_youtube
+from prawcore.exceptions import TooManyRequests
+from app.utils.reddit_client import get_reddit_client, record_reddit_throttle
+from app.utils.executors import run_blocking
+from app.utils.rate_limiter import rate_limiter
+from app.utils.singleflight import SingleFlight
+from app.services.keyword_engine import KeywordEngine
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background recomputations of the trending snapshot
+TRENDING_REFRESH_SECONDS = float(os.environ.get("TRENDING_REFRESH_SECONDS", 300))
+# Seconds before retrying while no refresh has produced any titles yet
+TRENDING_RETRY_SECONDS = float(os.environ.get("TRENDING_RETRY_SECONDS", 15))
 
+EMPTY_TRENDING = {"youtube": [], "reddit": [], "topics": []}
 
 def get_youtube_trending_titles(max_results: int = 15) -> List[str]:
-    api_key = get_youtube_api_key()
-    youtube = build('youtube', 'v3', developerKey=api_key)
-    resp = youtube.videos().list(part='snippet', chart='mostPopular', regionCode='US', maxResults=min(max_results, 50)).execute()
+    youtube = get_youtube_client()
+    resp = execute_youtube(
+        youtube.videos().list(part='snippet', chart='mostPopular', regionCode='US', maxResults=min(max_results, 50)),
+        "videos.list",
+    )
     items = resp.get('items', [])
     return [it['snippet'].get('title', '') for it in items if 'snippet' in it]
 
@@ -37,26 +35,19 @@ def get_youtube_trending_titles(max_results: int = 15) -> List[str]:
 def get_reddit_hot_titles(limit: int = 25) -> List[str]:
     reddit = get_reddit_client()
     titles: List[str] = []
-    for submission in reddit.subreddit('popular').hot(limit=limit):
-        titles.append(getattr(submission, 'title', ''))
-    return titles
-
-
-def get_trending_topics() -> Dict:
-    yt_titles = []
-    rd_titles = []
+    # Listings return up to 100 items per request
+    rate_limiter.acquire("reddit", "listing", count=-(-limit // 100))
     try:
-        yt_titles = get_youtube_trending_titles()
-    except Exception:
-        yt_titles = []
-    try:
-        rd_titles = get_reddit_hot_titles()
-    except Exception:
-        rd_titles = []
+        for submission in reddit.subreddit('popular').hot(limit=limit):
+            titles.append(getattr(submission, 'title', ''))
+    except TooManyRequests as e:
+        record_reddit_throttle(e)
+        raise
+    rate_limiter.succeeded("reddit")
+    return titles
 
-    yt_keywords = _extract_keywords(yt_titles, 12)
-    rd_keywords = _extract_keywords(rd_titles, 12)
 
+def _merge_topics(yt_keywords: List[str], rd_keywords: List[str]) -> List[str]:
     # merge lists preserving some source attribution
     merged = []
     seen = set()
@@ -64,9 +55,143 @@ def get_trending_topics() -> Dict:
         if kw not in seen:
             merged.append(kw)
             seen.add(kw)
+    return merged[:20]
+
+
+async def fetch_trending_titles() -> Tuple[Optional[List[str]], Optional[List[str]]]:
+    """Titles from the YouTube chart and r/popular, fetched in parallel; None for a source that failed."""
+    yt_titles, rd_titles = await asyncio.gather(
+        run_blocking("youtube", get_youtube_trending_titles),
+        run_blocking("reddit", get_reddit_hot_titles),
+        return_exceptions=True,
+    )
+    if isinstance(yt_titles, Exception):
+        logger.warning(f"YouTube trending fetch failed: {yt_titles}")
+        yt_titles = None
+    if isinstance(rd_titles, Exception):
+        logger.warning(f"Reddit trending fetch failed: {rd_titles}")
+        rd_titles = None
+    return yt_titles, rd_titles
+
+
+class TrendingRefresher:
+    """
+    Keeps the trending snapshot in memory and recomputes it from a
+    background task every `interval` seconds, so requests never wait on
+    YouTube or Reddit once the first snapshot exists.
+
+    Reads are stale-while-revalidate: a snapshot older than the interval
+    (e.g. after a failed refresh) is still served, and a refresh is
+    started in the background. A source that fails keeps its keywords
+    from the previous snapshot. Until some refresh gets titles there is no
+    snapshot: requests get empty topics and refreshes are retried every
+    `retry_interval` seconds.
+    """
+
+    def __init__(self, interval: float = TRENDING_REFRESH_SECONDS, retry_interval: float = TRENDING_RETRY_SECONDS):
+        self.interval = interval
+        self.retry_interval = retry_interval
+        # One engine per source, fed each refresh's new titles
+        self.engines = {"youtube": KeywordEngine(), "reddit": KeywordEngine()}
+        self._snapshot: Optional[Dict] = None
+        self._refreshed_at: Optional[float] = None  # monotonic
+        self._refreshed_at_wall: Optional[str] = None
+        self._retry_at = 0.0  # monotonic; cold-start requests do not fetch before this
+        self._flight = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"refreshes": 0, "refresh_failures": 0, "source_failures": 0, "served": 0, "stale_served": 0}
+
+    async def _refresh(self) -> Optional[Dict]:
+        yt_titles, rd_titles = await fetch_trending_titles()
+        previous = self._snapshot or {}
+        failed = [name for name, titles in (("youtube", yt_titles), ("reddit", rd_titles)) if titles is None]
+        self._counters["source_failures"] += len(failed)
+        if len(failed) == 2:
+            self._counters["refresh_failures"] += 1
+        if not (yt_titles or rd_titles):
+            # Nothing to rank: keep the previous snapshot, or stay cold and retry soon
+            if self._snapshot is None:
+                self._retry_at = time.monotonic() + self.retry_interval
+            return self._snapshot
+        keywords = {}
+        for source, titles in (("youtube", yt_titles), ("reddit", rd_titles)):
+            if titles is None:
+                keywords[source] = previous.get(source, [])
+                continue
+            self.engines[source].ingest(titles)
+            keywords[source] = self.engines[source].top_terms(12)
+        yt_keywords, rd_keywords = keywords["youtube"], keywords["reddit"]
+        self._snapshot = {
+            "youtube": yt_keywords,
+            "reddit": rd_keywords,
+            "topics": _merge_topics(yt_keywords, rd_keywords),
+        }
+        self._refreshed_at = time.monotonic()
+        self._refreshed_at_wall = datetime.utcnow().isoformat()
+        self._counters["refreshes"] += 1
+        return self._snapshot
+
+    async def refresh(self) -> Optional[Dict]:
+        """Recompute the snapshot; concurrent callers share one refresh. None while no refresh has got titles."""
+        return await self._flight.do("trending", self._refresh)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._counters["refresh_failures"] += 1
+                logger.error(f"Trending refresh failed: {e}")
+            await asyncio.sleep(self.interval if self._snapshot is not None else self.retry_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def age(self) -> Optional[float]:
+        return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    async def get(self) -> Dict:
+        """The current snapshot plus its age in seconds; only a cold start waits for a fetch."""
+        if self._snapshot is None:
+            if time.monotonic() >= self._retry_at or self._flight.in_flight("trending"):
+                await self.refresh()
+            if self._snapshot is None:
+                self._counters["served"] += 1
+                return {**EMPTY_TRENDING, "snapshot_age": None, "refreshed_at": None}
+        elif self.age() > self.interval and not self._flight.in_flight("trending"):
+            self._counters["stale_served"] += 1
+            self._flight.start("trending", self._refresh)
+        self._counters["served"] += 1
+        return {
+            **self._snapshot,
+            "snapshot_age": round(self.age(), 3),
+            "refreshed_at": self._refreshed_at_wall,
+        }
+
+    def stats(self) -> Dict:
+        age = self.age()
+        return {
+            **self._counters,
+            "interval": self.interval,
+            "snapshot_age": None if age is None else round(age, 3),
+            "running": self._task is not None and not self._task.done(),
+            "engines": {source: engine.stats() for source, engine in self.engines.items()},
+        }
+
+
+# Global instance
+trending_refresher = TrendingRefresher()
+
 
-    return {
-        "youtube": yt_keywords,
-        "reddit": rd_keywords,
-        "topics": merged[:20],
-    }
+async def get_trending_topics() -> Dict:
+    return await trending_refresher.get()
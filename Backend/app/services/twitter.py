@@ -1,72 +1,118 @@
-from app.utils.twitter_client import get_twitter_client
-from typing import List, Dict, Union
-from app.services.sentiment import analyze_sentiment
+import tweepy
+from app.utils.twitter_client import get_twitter_client, record_twitter_throttle
+from app.utils.rate_limiter import rate_limiter, RateLimitExceeded
+from typing import List, Dict, Union, Optional
+from app.services.sentiment import analyze_sentiment_batch_async
+from app.utils.executors import run_blocking
+from app.utils.cursor_store import cursor_store
+from app.utils.near_dedup import NearDuplicateIndex
+from app.utils.text_preprocess import text_preprocessor
+from app.utils.metrics import stage
 import logging
 from datetime import datetime
-from app.services.persistence import save_bulk_posts
+from app.services.persistence import post_queue
 
+# Recent search only reaches back 7 days, so older since_id cursors are rejected by the API
+TWITTER_CURSOR_MAX_AGE = 6 * 24 * 3600
 
-def fetch_recent_tweets(query: str, max_results: int = 10) -> Union[List[str], dict]:
+
+@stage("fetch_twitter")
+def fetch_recent_tweets(query: str, max_results: int = 10, since_id: Optional[str] = None) -> Union[List[str], dict]:
     client = get_twitter_client()
 
     # Clamp max_results to between 10 and 100 per Twitter API requirement
     max_results = max(10, min(max_results, 100))
 
     try:
+        rate_limiter.acquire("twitter", "search_recent_tweets")
         # Add language filter to the query string
         twitter_query = f"{query} lang:en"
         response = client.search_recent_tweets(
             query=twitter_query,
             max_results=max_results,
+            since_id=since_id,
             tweet_fields=["text","created_at","author_id"]
         )
+        rate_limiter.succeeded("twitter")
         tweets = response.data if response.data else []
         return tweets
 
+    except RateLimitExceeded as e:
+        logging.warning(str(e))
+        return {"error": str(e), "retry_after": round(e.retry_after)}
+    except tweepy.TooManyRequests as e:
+        retry_after = record_twitter_throttle(e)
+        logging.warning("Rate limited by Twitter API. Try again after some time.")
+        return {"error": "Twitter rate limit hit. Please wait and try again later.", "retry_after": round(retry_after)}
     except Exception as e:
         error_message = str(e)
-        if "429" in error_message or "Too Many Requests" in error_message:
-            logging.warning("Rate limited by Twitter API. Try again after some time.")
-            return {"error": "Twitter rate limit hit. Please wait and try again later."}
-
         logging.error(f"Error fetching tweets: {error_message}")
         return {"error": error_message}
 
 
-def analyze_tweets_sentiment(query: str, max_results: int = 10) -> Union[List[Dict], dict]:
-    tweets = fetch_recent_tweets(query, max_results)
+async def analyze_tweets_sentiment(
+    query: str, max_results: int = 10, incremental: bool = False, dedup: Optional[NearDuplicateIndex] = None
+) -> Union[List[Dict], dict]:
+    """
+    With incremental=True only tweets newer than the previous run for this
+    query are fetched and analyzed; they are merged with the stored results
+    of earlier runs, each result flagged with "new". A `dedup` index shared
+    across sources skips sentiment for near-duplicates of texts it has seen.
+    """
+    cursor = (
+        await run_blocking("sqlite", cursor_store.get_cursor, query, "twitter", max_age=TWITTER_CURSOR_MAX_AGE)
+        if incremental else None
+    )
+    since_id = cursor.get("since_id") if cursor else None
+    tweets = await run_blocking("twitter", fetch_recent_tweets, query, max_results, since_id)
     
     if isinstance(tweets, dict) and "error" in tweets:
         return tweets  # return error directly
 
+    fetched_ids = [int(tweet.id) for tweet in tweets if getattr(tweet, 'id', None)]
+    texts = [tweet.text if hasattr(tweet, 'text') else str(tweet) for tweet in tweets]
+    # Clean the text and drop tweets with nothing left to analyze (e.g. only a link)
+    texts, kept = text_preprocessor.preprocess(texts)
+    tweets = [tweets[i] for i in kept]
+    try:
+        sentiments = await analyze_sentiment_batch_async(texts, dedup)
+    except Exception as e:
+        logging.error(f"Error analyzing sentiment: {e}")
+        return [{"text": text, "sentiment": {"error": str(e)}} for text in texts]
+
     results = []
     posts_to_save = []
+    analyzed = []
+    failed_ids = []
     
-    for tweet in tweets:
-        text = tweet.text if hasattr(tweet, 'text') else str(tweet)
+    for tweet, text, sentiment in zip(tweets, texts, sentiments):
         user_handle = getattr(tweet, 'author_id', None)
         timestamp = getattr(tweet, 'created_at', datetime.utcnow())
-        try:
-            sentiment = analyze_sentiment(text)
-            results.append({
-                "text": text,
-                "sentiment": sentiment
-            })
-            posts_to_save.append({
-                "platform": "twitter",
-                "content": text,
-                "user_handle": str(user_handle) if user_handle else None,
-                "timestamp": timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp),
-                "sentiment_score": sentiment.get("score"),
-                "emotion": sentiment.get("label"),
-                "metadata": {"tweet_id": getattr(tweet, 'id', None)}
-            })
-        except Exception as e:
-            logging.error(f"Error analyzing sentiment: {e}")
-            results.append({
-                "text": text,
-                "sentiment": {"error": str(e)}
-            })
+        results.append({
+            "text": text,
+            "sentiment": sentiment
+        })
+        if "error" not in sentiment:
+            analyzed.append((str(getattr(tweet, 'id', text)), results[-1]))
+        elif getattr(tweet, 'id', None):
+            failed_ids.append(int(tweet.id))
+        posts_to_save.append({
+            "platform": "twitter",
+            "content": text,
+            "user_handle": str(user_handle) if user_handle else None,
+            "timestamp": timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp),
+            "sentiment_score": sentiment.get("score"),
+            "emotion": sentiment.get("label"),
+            "metadata": {"tweet_id": getattr(tweet, 'id', None)}
+        })
     if posts_to_save:
-        save_bulk_posts(posts_to_save)
+        post_queue.enqueue(posts_to_save)
+    if incremental:
+        # Move past every fetched tweet, including those dropped by preprocessing, but
+        # stop short of the first one whose sentiment failed so the next run retries it
+        if failed_ids:
+            fetched_ids = [tweet_id for tweet_id in fetched_ids if tweet_id < min(failed_ids)]
+        # Leave the cursor (and its age) untouched when nothing new arrived
+        new_cursor = {"since_id": str(max(fetched_ids))} if fetched_ids else None
+        return await run_blocking("sqlite", cursor_store.record_run, query, "twitter", new_cursor, analyzed, max_results)
     return results
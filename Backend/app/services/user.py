@@ -1,4 +1,4 @@
-from app.utils.Supabase_client import get_supabase_client
+from app.utils.Supabase_client import get_supabase_client, get_supabase_auth_client
 from supabase import Client, AuthApiError
 from typing import Optional
 from uuid import uuid4
@@ -8,7 +8,7 @@ from datetime import datetime
 def register_user(email: str, password: str, full_name: Optional[str] = None) -> dict:
     supabase: Client = get_supabase_client()
     try:
-        response = supabase.auth.sign_up({"email": email, "password": password})
+        response = get_supabase_auth_client().auth.sign_up({"email": email, "password": password})
         user = response.user
         session = getattr(response, "session", None)
         # Insert into custom User table if registration succeeded
@@ -33,7 +33,7 @@ def register_user(email: str, password: str, full_name: Optional[str] = None) ->
 
 
 def login_user(email: str, password: str) -> dict:
-    supabase: Client = get_supabase_client()
+    supabase: Client = get_supabase_auth_client()
     try:
         response = supabase.auth.sign_in_with_password({"email": email, "password": password})
         return {"user": response.user, "session": response.session}
@@ -1,82 +1,212 @@
-from app.utils.youtube_client import get_youtube_api_key
-from typing import List, Dict, Union
-from app.services.sentiment import analyze_sentiment
-from googleapiclient.discovery import build
+from app.utils.youtube_client import get_youtube_client, execute_youtube
+from app.utils.rate_limiter import RateLimitExceeded
+from typing import List, Dict, Union, Optional, Tuple, AsyncIterator
+from app.services.sentiment import analyze_sentiment_batch_async
+from app.utils.executors import run_blocking
+from app.utils.cursor_store import cursor_store
+from app.utils.near_dedup import NearDuplicateIndex
+from app.utils.text_preprocess import text_preprocessor
+from app.utils.metrics import stage
+import asyncio
 import logging
 from datetime import datetime
-from app.services.persistence import save_bulk_posts
+from app.services.persistence import post_queue
 
+# Ask the API for only the fields we read, which keeps responses small
+SEARCH_FIELDS = "items/id/videoId"
+COMMENT_FIELDS = "nextPageToken,items/snippet/topLevelComment(id,snippet(textDisplay,authorDisplayName,publishedAt))"
+COMMENT_PAGE_SIZE = 100  # API maximum for commentThreads.list
+MAX_CURSOR_VIDEOS = 200  # Per-video comment cursors kept per query
+
+
+@stage("fetch_youtube_search")
 def fetch_video_ids(query: str, max_results: int = 5) -> Union[List[str], dict]:
-    api_key = get_youtube_api_key()
     try:
-        youtube = build('youtube', 'v3', developerKey=api_key)
-        search_response = youtube.search().list(
+        youtube = get_youtube_client()
+        search_response = execute_youtube(youtube.search().list(
             q=query,
             part='id',
             type='video',
-            maxResults=max_results
-        ).execute()
+            maxResults=min(max_results, 50),
+            fields=SEARCH_FIELDS
+        ), "search.list")
         logging.debug(f"YouTube search response: {search_response}")
         video_ids = [item['id']['videoId'] for item in search_response.get('items', []) if 'videoId' in item.get('id', {})]
         return video_ids
+    except RateLimitExceeded as e:
+        logging.warning(str(e))
+        return {"error": str(e), "retry_after": round(e.retry_after)}
     except Exception as e:
         logging.error(f"Error fetching YouTube video IDs: {e}")
         return {"error": str(e)}
 
 
-def fetch_comments_for_video(video_id: str, max_comments: int = 20) -> Union[List[dict], dict]:
-    api_key = get_youtube_api_key()
+@stage("fetch_youtube_comments")
+def fetch_comment_page(video_id: str, page_size: int, page_token: Optional[str] = None) -> Union[Tuple[List[dict], Optional[str]], dict]:
+    """
+    One page of top-level comments for a video. Returns the comment
+    snippets (with the comment id added) and the next page token.
+    """
     try:
-        youtube = build('youtube', 'v3', developerKey=api_key)
-        comments = []
+        youtube = get_youtube_client()
         request = youtube.commentThreads().list(
             part='snippet',
             videoId=video_id,
-            maxResults=min(max_comments, 100),
-            textFormat='plainText'
+            maxResults=min(page_size, COMMENT_PAGE_SIZE),
+            textFormat='plainText',
+            pageToken=page_token,
+            fields=COMMENT_FIELDS
         )
-        response = request.execute()
+        response = execute_youtube(request, "commentThreads.list")
+        comments = []
         for item in response.get('items', []):
-            comment = item['snippet']['topLevelComment']['snippet']
-            comments.append(comment)
-            if len(comments) >= max_comments:
-                break
-        return comments[:max_comments]
+            top_level = item['snippet']['topLevelComment']
+            comments.append({**top_level['snippet'], 'id': top_level.get('id')})
+        return comments, response.get('nextPageToken')
+    except RateLimitExceeded as e:
+        logging.warning(str(e))
+        return {"error": str(e), "retry_after": round(e.retry_after)}
     except Exception as e:
         logging.error(f"Error fetching YouTube comments: {e}")
         return {"error": str(e)}
 
 
-def analyze_comments_sentiment(query: str, max_videos: int = 3, max_comments_per_video: int = 10) -> Union[List[Dict], dict]:
-    video_ids = fetch_video_ids(query, max_videos)
+async def harvest_comments(
+    video_ids: List[str], max_comments_per_video: int, newer_than: Optional[Dict[str, str]] = None
+) -> AsyncIterator[Tuple[str, Optional[List[dict]], Optional[str]]]:
+    """
+    Fetch comments for every video concurrently, following nextPageToken
+    until each video has max_comments_per_video comments or runs out.
+    Pages arrive newest first, so a video in `newer_than` (video id ->
+    publishedAt) stops at its first comment that is not newer.
+    Yields (video_id, comments, None) for each page as it arrives, or
+    (video_id, None, error) when a video fails.
+    """
+    newer_than = newer_than or {}
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def harvest(video_id: str) -> None:
+        remaining = max_comments_per_video
+        page_token = None
+        try:
+            while remaining > 0:
+                page = await run_blocking("youtube", fetch_comment_page, video_id, remaining, page_token)
+                if isinstance(page, dict):
+                    await queue.put((video_id, None, page["error"]))
+                    return
+                comments, page_token = page
+                caught_up = False
+                if video_id in newer_than:
+                    fresh = [comment for comment in comments if comment.get('publishedAt', '') > newer_than[video_id]]
+                    caught_up = len(fresh) < len(comments)
+                    comments = fresh
+                comments = comments[:remaining]
+                remaining -= len(comments)
+                if comments:
+                    await queue.put((video_id, comments, None))
+                if not page_token or not comments or caught_up:
+                    return
+        finally:
+            await queue.put(None)
+
+    tasks = [asyncio.ensure_future(harvest(video_id)) for video_id in video_ids]
+    try:
+        finished = 0
+        while finished < len(tasks):
+            item = await queue.get()
+            if item is None:
+                finished += 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def analyze_comments_sentiment(
+    query: str,
+    max_videos: int = 3,
+    max_comments_per_video: int = 10,
+    incremental: bool = False,
+    dedup: Optional[NearDuplicateIndex] = None,
+) -> Union[List[Dict], dict]:
+    """
+    With incremental=True only comments posted since the previous run for
+    this query are fetched and analyzed; they are merged with the stored
+    results of earlier runs, each flagged with "new". A `dedup` index shared
+    across sources skips sentiment for near-duplicates of texts it has seen.
+    """
+    video_ids = await run_blocking("youtube", fetch_video_ids, query, max_videos)
     if isinstance(video_ids, dict) and "error" in video_ids:
         return video_ids
+    cursor = await run_blocking("sqlite", cursor_store.get_cursor, query, "youtube") if incremental else None
+    newer_than = (cursor or {}).get("videos", {})
+
+    # Start inference on each page as soon as it arrives, overlapping it with the remaining fetches
+    pages = []
+    try:
+        async for video_id, comments, error in harvest_comments(video_ids, max_comments_per_video, newer_than):
+            if error is not None:
+                pages.append((video_id, None, error, None))
+                continue
+            # Unescape entities, strip links, and drop comments with no text left
+            texts, kept = text_preprocessor.preprocess([comment.get('textDisplay', '') for comment in comments])
+            comments = [{**comments[i], 'textDisplay': text} for i, text in zip(kept, texts)]
+            if not comments:
+                continue
+            pages.append((video_id, comments, None, asyncio.ensure_future(analyze_sentiment_batch_async(texts, dedup))))
+        await asyncio.gather(*(page[3] for page in pages if page[3] is not None), return_exceptions=True)
+    finally:
+        for page in pages:
+            if page[3] is not None:
+                page[3].cancel()
+
+    # Report videos in search order, pages in fetch order
+    order = {video_id: index for index, video_id in enumerate(video_ids)}
+    pages.sort(key=lambda page: order.get(page[0], len(order)))
+
     results = []
     posts_to_save = []
-    for video_id in video_ids:
-        comments = fetch_comments_for_video(video_id, max_comments_per_video)
-        if isinstance(comments, dict) and "error" in comments:
-            results.append({"video_id": video_id, "error": comments["error"]})
+    analyzed = []
+    for video_id, comments, error, sentiment_task in pages:
+        if comments is None:
+            results.append({"video_id": video_id, "error": error})
             continue
-        for comment in comments:
+        try:
+            sentiments = sentiment_task.result()
+        except Exception as e:
+            logging.error(f"Error analyzing sentiment: {e}")
+            sentiments = [{"error": str(e)}] * len(comments)
+        for comment, sentiment in zip(comments, sentiments):
             text = comment.get('textDisplay', '')
+            results.append({"video_id": video_id, "text": text, "sentiment": sentiment})
+            if "error" in sentiment:
+                continue
+            analyzed.append((comment.get('id') or text, results[-1]))
             user_handle = comment.get('authorDisplayName', None)
             timestamp = comment.get('publishedAt', None)
-            try:
-                sentiment = analyze_sentiment(text)
-                results.append({"video_id": video_id, "text": text, "sentiment": sentiment})
-                posts_to_save.append({
-                    "platform": "youtube",
-                    "content": text,
-                    "user_handle": user_handle,
-                    "timestamp": timestamp if timestamp else datetime.utcnow().isoformat(),
-                    "sentiment_score": sentiment.get("score"),
-                    "emotion": sentiment.get("label"),
-                    "metadata": {"video_id": video_id, "comment_id": comment.get('id', None)}
-                })
-            except Exception as e:
-                logging.error(f"Error analyzing sentiment: {e}")
-                results.append({"video_id": video_id, "text": text, "sentiment": {"error": str(e)}})
+            posts_to_save.append({
+                "platform": "youtube",
+                "content": text,
+                "user_handle": user_handle,
+                "timestamp": timestamp if timestamp else datetime.utcnow().isoformat(),
+                "sentiment_score": sentiment.get("score"),
+                "emotion": sentiment.get("label"),
+                "metadata": {"video_id": video_id, "comment_id": comment.get('id', None)}
+            })
     if posts_to_save:
-        save_bulk_posts(posts_to_save)
-    return results 
\ No newline at end of file
+        post_queue.enqueue(posts_to_save)
+    if incremental:
+        videos = dict(newer_than)
+        for video_id, comments, _, _ in pages:
+            for comment in comments or []:
+                published = comment.get('publishedAt')
+                if published and published > videos.get(video_id, ''):
+                    videos[video_id] = published
+        videos = dict(list(videos.items())[-MAX_CURSOR_VIDEOS:])
+        errors = [result for result in results if "error" in result and "text" not in result]
+        merged = await run_blocking(
+            "sqlite", cursor_store.record_run, query, "youtube", {"videos": videos}, analyzed, max_videos * max_comments_per_video
+        )
+        return errors + merged
+    return results
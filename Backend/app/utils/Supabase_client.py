@@ -1,6 +1,7 @@
 import os
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
+from app.utils.client_registry import client_registry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,11 +12,35 @@ SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in the environment variables.")
 
-def get_supabase_client() -> Client:
-    """
-    Returns a new Supabase client instance with error handling.
-    """
+def _create_supabase_client() -> Client:
     try:
-        return create_client(SUPABASE_URL, SUPABASE_KEY)
+        # No session handling: this client only ever acts with the service key
+        return create_client(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=ClientOptions(auto_refresh_token=False, persist_session=False),
+        )
     except Exception as e:
         raise Exception(f"Failed to create Supabase client: {str(e)}")
+
+def _warm_supabase_client(client: Client) -> None:
+    # Instantiates the PostgREST sub-client and its connection pool
+    client.table("post")
+
+# Data access and auth calls use separate clients: a sign-in switches the
+# client's Authorization header to the user's token, which must never leak
+# into the shared data client.
+client_registry.register("supabase", _create_supabase_client, warm=_warm_supabase_client)
+client_registry.register("supabase_auth", _create_supabase_client)
+
+def get_supabase_client() -> Client:
+    """
+    Returns the shared Supabase client used for table access.
+    """
+    return client_registry.get("supabase")
+
+def get_supabase_auth_client() -> Client:
+    """
+    Returns the shared Supabase client used only for sign-up and sign-in calls.
+    """
+    return client_registry.get("supabase_auth")
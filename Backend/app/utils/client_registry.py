@@ -0,0 +1,131 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.executors import run_on_every_worker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ClientSpec:
+    factory: Callable[[], Any]
+    per_thread: bool = False
+    warm: Optional[Callable[[Any], None]] = None
+    close: Optional[Callable[[Any], None]] = None
+    executor: Optional[str] = None
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of long-lived SDK clients.
+
+    Each client module registers a factory at import time. Thread-safe
+    clients are built once and shared; SDKs that are not thread-safe
+    (praw, googleapiclient) are registered with per_thread=True and get
+    one instance per executor thread, built on that thread's first use or,
+    when registered with the executor that calls them, on every thread of
+    that executor at startup.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, _ClientSpec] = {}
+        self._shared: Dict[str, Any] = {}
+        self._thread_instances: Dict[str, List[Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        per_thread: bool = False,
+        warm: Optional[Callable[[Any], None]] = None,
+        close: Optional[Callable[[Any], None]] = None,
+        executor: Optional[str] = None,
+    ) -> None:
+        self._specs[name] = _ClientSpec(factory, per_thread, warm, close, executor)
+
+    def get(self, name: str) -> Any:
+        """Returns the client for `name`, building it on first use."""
+        spec = self._specs.get(name)
+        if spec is None:
+            raise KeyError(f"No client registered under '{name}'")
+
+        if spec.per_thread:
+            clients = getattr(self._local, "clients", None)
+            if clients is None:
+                clients = self._local.clients = {}
+            client = clients.get(name)
+            if client is None:
+                client = clients[name] = spec.factory()
+                with self._lock:
+                    self._thread_instances.setdefault(name, []).append(client)
+            return client
+
+        client = self._shared.get(name)
+        if client is None:
+            with self._lock:
+                client = self._shared.get(name)
+                if client is None:
+                    client = self._shared[name] = spec.factory()
+        return client
+
+    def _build_and_warm(self, name: str) -> bool:
+        spec = self._specs[name]
+        try:
+            client = self.get(name)
+            if spec.warm is not None:
+                spec.warm(client)
+            return True
+        except Exception as e:
+            logger.warning(f"Warm-up failed for client '{name}': {str(e)}")
+            return False
+
+    def startup(self) -> None:
+        """
+        Build and warm every registered client. Shared clients are built on
+        the calling thread; per-thread clients on each worker of their
+        executor, the threads that will use them. Per-thread clients without
+        an executor are left to be built on first use. Warm-up failures are
+        logged, not raised.
+        """
+        for name, spec in self._specs.items():
+            if not spec.per_thread:
+                if self._build_and_warm(name):
+                    logger.info(f"Warmed client: {name}")
+            elif spec.executor is not None:
+                run_on_every_worker(spec.executor, lambda name=name: self._build_and_warm(name))
+                logger.info(f"Warmed client: {name} on every '{spec.executor}' executor thread")
+
+    def shutdown(self) -> None:
+        """Close and forget every client built so far."""
+        with self._lock:
+            shared = list(self._shared.items())
+            per_thread = [(name, client) for name, clients in self._thread_instances.items() for client in clients]
+            self._shared.clear()
+            self._thread_instances.clear()
+        self._local = threading.local()
+        for name, client in shared + per_thread:
+            close = self._specs[name].close
+            if close is None:
+                continue
+            try:
+                close(client)
+            except Exception as e:
+                logger.warning(f"Error closing client '{name}': {str(e)}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                name: {
+                    "per_thread": spec.per_thread,
+                    "instances": len(self._thread_instances.get(name, [])) if spec.per_thread else int(name in self._shared),
+                }
+                for name, spec in self._specs.items()
+            }
+
+
+# Global instance
+client_registry = ClientRegistry()
@@ -1,97 +1,158 @@
 import os
 import json
+import time
 import uuid
+import sqlite3
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Optional
-from pathlib import Path
 
-# File to store anonymous user credits
+from app.utils.metrics import CREDIT_STORE_DURATION, timed
+
+# SQLite database storing anonymous user credits (shared by all worker processes)
+CREDITS_DB = os.environ.get("CREDITS_DB_PATH", "anonymous_credits.sqlite3")
+# Legacy JSON store, imported into the database once
 CREDITS_FILE = "anonymous_credits.json"
 
+DEFAULT_CREDITS = 5
+SESSION_TTL = timedelta(hours=24)
+CLEANUP_INTERVAL = 60  # seconds between expiry sweeps in each process
+
+
 class CreditManager:
-    def __init__(self):
-        self.credits_data = self._load_credits()
-    
-    def _load_credits(self) -> Dict:
-        """Load credits data from file"""
-        if os.path.exists(CREDITS_FILE):
+    """
+    Guest-session credit store backed by SQLite in WAL mode.
+
+    Credits are decremented with a single conditional UPDATE, so concurrent
+    requests in any number of processes can never overspend a session.
+    Sessions expire 24 hours after last use; expiry is an indexed column,
+    so lookups ignore expired rows and the periodic sweep only touches them.
+    """
+
+    def __init__(self, db_path: str = CREDITS_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+        self._init_db()
+        self._import_legacy_file()
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, "
+            "credits_remaining INTEGER NOT NULL, "
+            "created_at TEXT NOT NULL, "
+            "last_used TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _import_legacy_file(self) -> None:
+        """Copy sessions from the old JSON file into the database, once per database."""
+        if not os.path.exists(CREDITS_FILE):
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                conn.execute("COMMIT")
+                return
             try:
                 with open(CREDITS_FILE, 'r') as f:
-                    return json.load(f)
+                    legacy = json.load(f)
             except (json.JSONDecodeError, FileNotFoundError):
-                return {}
-        return {}
-    
-    def _save_credits(self) -> None:
-        """Save credits data to file"""
-        with open(CREDITS_FILE, 'w') as f:
-            json.dump(self.credits_data, f, indent=2)
-    
+                legacy = {}
+            rows = []
+            for session_id, data in legacy.items():
+                try:
+                    last_used = datetime.fromisoformat(data.get('last_used', ''))
+                except (ValueError, TypeError):
+                    continue
+                rows.append((
+                    session_id,
+                    int(data.get('credits_remaining', 0)),
+                    data.get('created_at', last_used.isoformat()),
+                    last_used.isoformat(),
+                    (last_used + SESSION_TTL).timestamp(),
+                ))
+            conn.executemany("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (datetime.now().isoformat(),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
     def _cleanup_expired(self) -> None:
-        """Remove expired session data (older than 24 hours)"""
-        now = datetime.now()
-        expired_sessions = []
-        
-        for session_id, data in self.credits_data.items():
-            try:
-                last_used = datetime.fromisoformat(data.get('last_used', ''))
-                if now - last_used > timedelta(hours=24):
-                    expired_sessions.append(session_id)
-            except (ValueError, TypeError):
-                expired_sessions.append(session_id)
-        
-        for session_id in expired_sessions:
-            del self.credits_data[session_id]
-        
-        if expired_sessions:
-            self._save_credits()
-    
+        """Remove expired session data (older than 24 hours), at most once per CLEANUP_INTERVAL"""
+        now = time.time()
+        if now - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        self._conn().execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    @timed(CREDIT_STORE_DURATION, operation="create_session")
     def create_session(self) -> str:
         """Create a new guest session with 5 credits"""
         self._cleanup_expired()
-        
+
         session_id = str(uuid.uuid4())
-        self.credits_data[session_id] = {
-            'credits_remaining': 5,
-            'created_at': datetime.now().isoformat(),
-            'last_used': datetime.now().isoformat()
-        }
-        self._save_credits()
+        now = datetime.now()
+        self._conn().execute(
+            "INSERT INTO sessions (session_id, credits_remaining, created_at, last_used, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (session_id, DEFAULT_CREDITS, now.isoformat(), now.isoformat(), (now + SESSION_TTL).timestamp()),
+        )
         return session_id
-    
+
+    @timed(CREDIT_STORE_DURATION, operation="get_credits")
     def get_credits(self, session_id: str) -> Optional[int]:
         """Get remaining credits for a session"""
         self._cleanup_expired()
-        
-        if session_id not in self.credits_data:
-            return None
-        
-        return self.credits_data[session_id]['credits_remaining']
-    
+
+        row = self._conn().execute(
+            "SELECT credits_remaining FROM sessions WHERE session_id = ? AND expires_at > ?",
+            (session_id, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    @timed(CREDIT_STORE_DURATION, operation="use_credit")
     def use_credit(self, session_id: str) -> bool:
         """Use one credit for a session. Returns True if successful, False if no credits left"""
         self._cleanup_expired()
-        
-        if session_id not in self.credits_data:
-            return False
-        
-        session_data = self.credits_data[session_id]
-        if session_data['credits_remaining'] <= 0:
-            return False
-        
-        session_data['credits_remaining'] -= 1
-        session_data['last_used'] = datetime.now().isoformat()
-        self._save_credits()
-        return True
-    
+
+        now = datetime.now()
+        cursor = self._conn().execute(
+            "UPDATE sessions SET credits_remaining = credits_remaining - 1, last_used = ?, expires_at = ? "
+            "WHERE session_id = ? AND credits_remaining > 0 AND expires_at > ?",
+            (now.isoformat(), (now + SESSION_TTL).timestamp(), session_id, now.timestamp()),
+        )
+        return cursor.rowcount == 1
+
+    @timed(CREDIT_STORE_DURATION, operation="get_session_info")
     def get_session_info(self, session_id: str) -> Optional[Dict]:
         """Get full session information"""
         self._cleanup_expired()
-        
-        if session_id not in self.credits_data:
+
+        row = self._conn().execute(
+            "SELECT credits_remaining, created_at, last_used FROM sessions WHERE session_id = ? AND expires_at > ?",
+            (session_id, time.time()),
+        ).fetchone()
+        if row is None:
             return None
-        
-        return self.credits_data[session_id].copy()
+        return {'credits_remaining': row[0], 'created_at': row[1], 'last_used': row[2]}
 
 # Global instance
 credit_manager = CreditManager()
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fetch cursors and previously analyzed items for repeat (incremental) analyses
+CURSOR_STORE_PATH = os.environ.get("CURSOR_STORE_PATH", "fetch_cursors.sqlite3")
+# Analyzed items kept per (topic, source) for merging into later runs
+CURSOR_ITEMS_PER_KEY = int(os.environ.get("CURSOR_ITEMS_PER_KEY", 1000))
+# Cursors and items not refreshed for this long are ignored
+CURSOR_TTL = float(os.environ.get("CURSOR_TTL", 30 * 24 * 3600))
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.split()).lower()
+
+
+class CursorStore:
+    """
+    Per-(topic, source) fetch cursors (e.g. Twitter since_id, Reddit seen
+    submissions, YouTube newest comment per video) plus the items analyzed
+    on earlier runs, so a repeat analysis only fetches and analyzes what is
+    new and merges it with what it already has.
+    """
+
+    def __init__(self, path: str = CURSOR_STORE_PATH, items_per_key: int = CURSOR_ITEMS_PER_KEY):
+        self.items_per_key = items_per_key
+        self._lock = threading.Lock()
+        self._counters = {"runs": 0, "new_items": 0, "reused_items": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cursors ("
+            "topic TEXT NOT NULL, source TEXT NOT NULL, cursor TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (topic, source))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cursor_items ("
+            "topic TEXT NOT NULL, source TEXT NOT NULL, item_id TEXT NOT NULL, item TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, PRIMARY KEY (topic, source, item_id))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cursor_items_recent ON cursor_items (topic, source, stored_at)"
+        )
+
+    def get_cursor(self, topic: str, source: str, max_age: float = CURSOR_TTL) -> Optional[Dict]:
+        """The stored cursor, or None if there is none or it is older than max_age seconds."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor FROM cursors WHERE topic = ? AND source = ? AND updated_at > ?",
+                (normalize_topic(topic), source, time.time() - max_age),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _load_items(self, topic: str, source: str, limit: int) -> List[Tuple[str, Dict]]:
+        rows = self._conn.execute(
+            "SELECT item_id, item FROM cursor_items WHERE topic = ? AND source = ? AND stored_at > ? "
+            "ORDER BY stored_at DESC LIMIT ?",
+            (topic, source, time.time() - CURSOR_TTL, limit),
+        ).fetchall()
+        return [(item_id, json.loads(item)) for item_id, item in rows]
+
+    def record_run(
+        self,
+        topic: str,
+        source: str,
+        cursor: Optional[Dict],
+        new_items: List[Tuple[str, Dict]],
+        limit: int,
+    ) -> List[Dict]:
+        """
+        Save the cursor and the newly analyzed (item_id, item) pairs, then
+        return up to `limit` items: the new ones first, flagged "new": True,
+        followed by the most recent stored ones, flagged "new": False.
+        """
+        topic = normalize_topic(topic)
+        now = time.time()
+        with self._lock:
+            new_ids = {item_id for item_id, _ in new_items}
+            previous = [
+                item for item_id, item in self._load_items(topic, source, limit + len(new_ids))
+                if item_id not in new_ids
+            ]
+            self._conn.execute("BEGIN")
+            try:
+                if cursor is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cursors (topic, source, cursor, updated_at) VALUES (?, ?, ?, ?)",
+                        (topic, source, json.dumps(cursor), now),
+                    )
+                # Later items in the run get slightly earlier timestamps, so the newest-first
+                # read in _load_items returns them in the order they were listed
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cursor_items (topic, source, item_id, item, stored_at) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (topic, source, item_id, json.dumps(item, default=str), now - index * 1e-6)
+                        for index, (item_id, item) in enumerate(new_items)
+                    ],
+                )
+                self._conn.execute(
+                    "DELETE FROM cursor_items WHERE topic = ? AND source = ? AND item_id NOT IN ("
+                    "SELECT item_id FROM cursor_items WHERE topic = ? AND source = ? ORDER BY stored_at DESC LIMIT ?)",
+                    (topic, source, topic, source, self.items_per_key),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        merged = [{**item, "new": True} for _, item in new_items][:limit]
+        merged += [{**item, "new": False} for item in previous[:limit - len(merged)]]
+        self._counters["runs"] += 1
+        self._counters["new_items"] += len(new_items)
+        self._counters["reused_items"] += len(merged) - min(len(new_items), limit)
+        return merged
+
+    def stats(self) -> Dict:
+        return dict(self._counters)
+
+
+def delta_counts(items: List[Dict]) -> Dict:
+    """New vs. reused item counts for results returned by an incremental run."""
+    new = sum(1 for item in items if item.get("new") is True)
+    return {"new": new, "reused": sum(1 for item in items if item.get("new") is False)}
+
+
+# Global instance
+cursor_store = CursorStore()
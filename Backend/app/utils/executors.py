@@ -0,0 +1,79 @@
+import os
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Dedicated pools for the blocking SDKs (praw, tweepy, googleapiclient, supabase),
+# CPU-bound inference and the local SQLite stores, so none of them can starve the
+# others or the event loop.
+EXECUTOR_SIZES = {
+    "reddit": int(os.environ.get("REDDIT_EXECUTOR_WORKERS", 16)),
+    "twitter": int(os.environ.get("TWITTER_EXECUTOR_WORKERS", 8)),
+    "youtube": int(os.environ.get("YOUTUBE_EXECUTOR_WORKERS", 16)),
+    "supabase": int(os.environ.get("SUPABASE_EXECUTOR_WORKERS", 8)),
+    "inference": int(os.environ.get("INFERENCE_EXECUTOR_WORKERS", 2)),
+    "sqlite": int(os.environ.get("SQLITE_EXECUTOR_WORKERS", 4)),
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """
+    Returns the named executor, creating it on first use.
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(name)
+            if executor is None:
+                if name not in EXECUTOR_SIZES:
+                    raise ValueError(f"Unknown executor: {name}")
+                executor = ThreadPoolExecutor(max_workers=EXECUTOR_SIZES[name], thread_name_prefix=f"{name}-io")
+                _executors[name] = executor
+    return executor
+
+
+async def run_blocking(name: str, fn: Callable, *args, **kwargs):
+    """
+    Run a blocking callable on the named executor without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), functools.partial(fn, *args, **kwargs))
+
+
+def run_on_every_worker(name: str, fn: Callable, timeout: float = 60.0) -> None:
+    """
+    Run `fn` once on every worker thread of the named executor, starting the
+    threads if they are not running yet. A barrier holds each thread until
+    all have called `fn`, so no thread picks up a second call.
+    """
+    executor = get_executor(name)
+    barrier = threading.Barrier(EXECUTOR_SIZES[name])
+
+    def call():
+        try:
+            fn()
+        finally:
+            barrier.wait(timeout)
+
+    for future in [executor.submit(call) for _ in range(EXECUTOR_SIZES[name])]:
+        future.result()
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    """
+    Shut down every executor created so far.
+    """
+    with _lock:
+        executors = list(_executors.items())
+        _executors.clear()
+    for name, executor in executors:
+        logger.debug(f"Shutting down executor: {name}")
+        executor.shutdown(wait=wait, cancel_futures=True)
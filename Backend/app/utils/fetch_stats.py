@@ -0,0 +1,35 @@
+import threading
+from collections import deque
+from typing import Dict
+
+LATENCY_WINDOW = 256
+
+
+class FetchStats:
+    """
+    Per-call upstream request counts and latency for one fetcher, with
+    latency percentiles over the most recent LATENCY_WINDOW calls.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._counters = {"calls": 0, "errors": 0, "requests": 0, "items": 0}
+        self._lock = threading.Lock()
+
+    def record(self, requests: int, latency: float, items: int = 0, error: bool = False) -> None:
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["errors"] += int(error)
+            self._counters["requests"] += requests
+            self._counters["items"] += items
+            self._latencies.append(latency)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+        calls = counters["calls"]
+        counters["requests_per_call"] = round(counters["requests"] / calls, 2) if calls else 0.0
+        for name, fraction in (("p50", 0.5), ("p95", 0.95)):
+            counters[f"latency_{name}_ms"] = int(latencies[int(fraction * (len(latencies) - 1))] * 1000) if latencies else None
+        return counters
@@ -1,10 +1,15 @@
 import os
-import requests
+import asyncio
+import httpx
 import json
 import logging
 import time
 import random
 from dotenv import load_dotenv
+from app.utils.llm_cache import llm_cache, llm_cache_key
+from app.utils.http_pool import http_pool
+from app.utils.model_health import model_health, parse_retry_after
+from app.utils.metrics import GEMINI_FALLBACKS, GEMINI_REQUEST_DURATION, GEMINI_RETRIES
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -33,6 +38,61 @@ GEMINI_MODELS = [
 MAX_RETRIES = 3
 BASE_DELAY = 1  # Base delay in seconds
 MAX_DELAY = 8   # Maximum delay in seconds
+REQUEST_TIMEOUT = 45  # Per-attempt timeout in seconds
+
+# Hedging (async path): if the model has not answered within its recent
+# GEMINI_HEDGE_PERCENTILE latency, send the same request to the next model.
+# Hedges are capped at one per attempt and, across the process, at
+# GEMINI_HEDGE_BUDGET_RATIO of requests (with a small burst allowance).
+GEMINI_HEDGING_ENABLED = os.environ.get("GEMINI_HEDGING_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_PERCENTILE = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", 95))
+GEMINI_HEDGE_MIN_DELAY = float(os.environ.get("GEMINI_HEDGE_MIN_DELAY", 1))
+GEMINI_HEDGE_DEFAULT_DELAY = float(os.environ.get("GEMINI_HEDGE_DEFAULT_DELAY", 10))
+GEMINI_HEDGE_BUDGET_RATIO = float(os.environ.get("GEMINI_HEDGE_BUDGET_RATIO", 0.1))
+GEMINI_HEDGE_BURST = float(os.environ.get("GEMINI_HEDGE_BURST", 5))
+HEDGE_MIN_SAMPLES = 20
+
+DEFAULT_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 2048,
+}
+
+class HedgeBudget:
+    """
+    Token bucket limiting hedges to a fraction of requests: every primary
+    request earns `ratio` tokens (up to `burst`) and every hedge spends one.
+    """
+
+    def __init__(self, ratio=GEMINI_HEDGE_BUDGET_RATIO, burst=GEMINI_HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._counters = {"requests": 0, "hedges": 0, "hedge_wins": 0, "hedges_denied": 0}
+
+    def record_request(self):
+        self._counters["requests"] += 1
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self):
+        if self._tokens < 1:
+            self._counters["hedges_denied"] += 1
+            return False
+        self._tokens -= 1
+        self._counters["hedges"] += 1
+        return True
+
+    def record_win(self):
+        self._counters["hedge_wins"] += 1
+
+    def stats(self):
+        counters = dict(self._counters)
+        counters["enabled"] = GEMINI_HEDGING_ENABLED
+        counters["tokens"] = round(self._tokens, 2)
+        return counters
+
+hedge_budget = HedgeBudget()
 
 def get_next_model(current_model=None, failed_models=None):
     """
@@ -141,186 +201,360 @@ def calculate_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
     
     return max(0, delay)
 
-def gemini_chat_generate(messages, model=None):
+def _to_gemini_contents(messages):
+    """
+    Convert OpenAI-style messages to the Gemini 'contents' format.
+    """
+    gemini_contents = []
+    for message in messages:
+        role = message.get("role", "user")
+        content = message.get("content", "")
+
+        # Gemini uses 'user' and 'model' roles
+        if role == "assistant":
+            role = "model"
+        elif role == "system":
+            # Prepend system message to user content
+            if gemini_contents and gemini_contents[-1]["role"] == "user":
+                gemini_contents[-1]["parts"][0]["text"] = content + "\n\n" + gemini_contents[-1]["parts"][0]["text"]
+                continue
+            else:
+                role = "user"
+
+        gemini_contents.append({
+            "role": role,
+            "parts": [{"text": content}]
+        })
+    return gemini_contents
+
+def _generation_config(overrides=None):
+    return {**DEFAULT_GENERATION_CONFIG, **(overrides or {})}
+
+def _build_payload(messages, generation_config=None):
+    return {
+        "contents": _to_gemini_contents(messages),
+        "generationConfig": _generation_config(generation_config),
+    }
+
+def _model_url(model, method="generateContent"):
+    return f"https://generativelanguage.googleapis.com/v1beta/models/{model}:{method}?key={GOOGLE_API_KEY}"
+
+def _extract_text(result):
+    """
+    Pull the generated text out of a generateContent response body.
+    Raises ValueError if the response does not contain any text.
     """
-    Generate chat response using Google's Gemini API with model rotation and retry logic.
+    if "candidates" in result and len(result["candidates"]) > 0:
+        candidate = result["candidates"][0]
+        if "content" in candidate and "parts" in candidate["content"]:
+            parts = candidate["content"]["parts"]
+            if len(parts) > 0 and "text" in parts[0]:
+                return parts[0]["text"]
+
+    logger.error(f"Unexpected response format from Gemini: {result}")
+    raise ValueError("Unexpected response format from Gemini API")
+
+def _chunk_text(result):
+    """
+    Text carried by one streamed chunk, or an empty string.
+    """
+    candidates = result.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+def _error_info(response):
+    error_info = response.text
+    try:
+        error_json = response.json()
+        if "error" in error_json:
+            error_info = error_json["error"].get("message", error_info)
+    except Exception:
+        pass
+    return error_info
+
+def _record_http_failure(model, response, error):
+    model_health.record_failure(
+        model,
+        status_code=response.status_code,
+        error=error,
+        retry_after=parse_retry_after(response.headers.get("retry-after")),
+    )
+
+def _observe_request(model, outcome, started):
+    GEMINI_REQUEST_DURATION.labels(model, outcome).observe(time.monotonic() - started)
+
+def _switch_model(current_model, failed_models, last_error):
+    """
+    Mark the current model as failed for this call and pick the healthiest
+    remaining one. Raises if every model has already failed.
+    """
+    failed_models.add(current_model)
+    next_model = model_health.pick(GEMINI_MODELS, failed_models)
+    if next_model is None:
+        logger.error("All models have failed, no more models to try")
+        raise Exception(f"All Gemini models failed. Last error: {last_error}")
+    logger.info(f"Switching to model: {next_model}")
+    GEMINI_FALLBACKS.labels(current_model, next_model).inc()
+    return next_model
+
+async def gemini_chat_generate_async(messages, model=None, generation_config=None, cache_ttl=None, stale_ttl=0, hedge=None):
+    """
+    Generate a chat response using Google's Gemini API with model rotation
+    and retry logic, using non-blocking HTTP calls and non-blocking backoff.
     
     Parameters
     ----------
     messages : list
         List of message dictionaries with 'role' and 'content' keys.
-        Compatible with OpenAI chat format.
     model : str, optional
         The Gemini model to use. If None, uses model rotation.
+    generation_config : dict, optional
+        Overrides merged into DEFAULT_GENERATION_CONFIG.
+    cache_ttl : float, optional
+        If set, serve identical requests from the response cache for this
+        many seconds; concurrent identical misses share one upstream call.
+    stale_ttl : float, optional
+        Extra seconds during which an expired entry is still returned while
+        it is regenerated in the background.
+    hedge : bool, optional
+        Send a duplicate request to the next model when the current one is
+        slower than its usual tail latency. Defaults to GEMINI_HEDGING_ENABLED.
     
     Returns
     -------
     str
         The generated response content.
     """
+    if cache_ttl is None:
+        return await _gemini_generate_async(messages, model, generation_config, hedge)
+    
+    key = llm_cache_key(messages, _generation_config(generation_config), model)
+    return await llm_cache.get_or_generate(
+        key,
+        lambda: _gemini_generate_async(messages, model, generation_config, hedge),
+        ttl=cache_ttl,
+        stale_ttl=stale_ttl,
+    )
+
+async def _attempt_async(client, model, payload, headers):
+    """
+    One generateContent call. Returns (text, None) on success or
+    (None, error) for retryable failures; raises for non-retryable ones.
+    """
+    started = time.monotonic()
+    try:
+        response = await client.post(_model_url(model), headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
+    except httpx.TimeoutException:
+        logger.error(f"Timeout error with model {model}")
+        _observe_request(model, "timeout", started)
+        model_health.record_failure(model, error="timeout")
+        return None, "timeout"
+    except httpx.RequestError as e:
+        logger.error(f"Request error with model {model}: {str(e)}")
+        _observe_request(model, "error", started)
+        model_health.record_failure(model, error=str(e))
+        return None, str(e)
+    
+    _observe_request(model, "success" if response.status_code == 200 else "error", started)
+    logger.debug(f"Response status code: {response.status_code}")
+    if response.status_code == 200:
+        try:
+            text = _extract_text(response.json())
+        except ValueError as e:
+            model_health.record_failure(model, error=str(e))
+            return None, str(e)
+        model_health.record_success(model, time.monotonic() - started)
+        logger.info(f"Successfully generated response using {model}")
+        return text, None
+    
+    error_info = _error_info(response)
+    logger.error(f"Gemini API error: {response.status_code} - {error_info}")
+    if not is_retryable_error(response.status_code, error_info):
+        raise Exception(f"Gemini API error: {response.status_code} - {error_info}")
+    last_error = f"{response.status_code} - {error_info}"
+    _record_http_failure(model, response, last_error)
+    return None, last_error
+
+def _hedge_delay(model):
+    """
+    Seconds to wait on `model` before hedging: its recent latency at
+    GEMINI_HEDGE_PERCENTILE, or GEMINI_HEDGE_DEFAULT_DELAY until enough
+    samples exist.
+    """
+    delay = model_health.latency_percentile(model, GEMINI_HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES)
+    if delay is None:
+        delay = GEMINI_HEDGE_DEFAULT_DELAY
+    return max(GEMINI_HEDGE_MIN_DELAY, delay)
+
+async def _hedged_attempt(client, model, payload, headers, failed_models):
+    """
+    Run one attempt on `model`; if it has not answered within the hedge
+    delay and the hedge budget allows, send the same request to the next
+    healthiest model. The first successful answer wins and the other
+    request is cancelled.
+    
+    Returns (text, error, models_tried).
+    """
+    hedge_budget.record_request()
+    primary = asyncio.ensure_future(_attempt_async(client, model, payload, headers))
+    started = time.monotonic()
+    done, _ = await asyncio.wait({primary}, timeout=_hedge_delay(model))
+    if done:
+        text, error = primary.result()
+        return text, error, [model]
+    
+    hedge_model = model_health.pick(GEMINI_MODELS, failed_models | {model})
+    if hedge_model is None or not hedge_budget.try_acquire():
+        text, error = await primary
+        return text, error, [model]
+    
+    logger.info(f"No answer from {model} after {time.monotonic() - started:.1f}s, hedging with {hedge_model}")
+    hedge = asyncio.ensure_future(_attempt_async(client, hedge_model, payload, headers))
+    tasks = {primary: model, hedge: hedge_model}
+    pending = set(tasks)
+    last_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                text, error = task.result()
+                if text is not None:
+                    if task is hedge:
+                        hedge_budget.record_win()
+                    return text, None, list(tasks.values())
+                last_error = error
+        return None, last_error, list(tasks.values())
+    finally:
+        for task in pending:
+            task.cancel()
+            # The cancelled request took at least this long; keep it in the percentile window
+            model_health.observe_latency(tasks[task], time.monotonic() - started)
+
+async def _gemini_generate_async(messages, model=None, generation_config=None, hedge=None):
+    if model is None:
+        model = model_health.pick(GEMINI_MODELS)
+    if hedge is None:
+        hedge = GEMINI_HEDGING_ENABLED
+    
+    failed_models = set()
+    current_model = model
+    payload = _build_payload(messages, generation_config)
+    headers = {
+        "Content-Type": "application/json"
+    }
+    
+    client = http_pool.async_client("gemini")
+    
+    for attempt in range(MAX_RETRIES):
+        logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} with model: {current_model}")
+        if attempt:
+            GEMINI_RETRIES.labels("generate_async").inc()
+        if hedge:
+            text, last_error, tried = await _hedged_attempt(client, current_model, payload, headers, failed_models)
+            failed_models.update(tried)
+        else:
+            text, last_error = await _attempt_async(client, current_model, payload, headers)
+        if text is not None:
+            return text
+        
+        if attempt == MAX_RETRIES - 1:
+            break
+        current_model = _switch_model(current_model, failed_models, last_error)
+        
+        if not model_health.is_healthy(current_model):
+            delay = calculate_delay(attempt)
+            logger.info(f"Retrying in {delay:.2f} seconds...")
+            await asyncio.sleep(delay)
+    
+    raise Exception(f"Failed to generate response after {MAX_RETRIES} attempts across all available models. Last error: {last_error}")
+
+async def gemini_chat_stream_async(messages, model=None, generation_config=None):
+    """
+    Stream a chat response from Gemini's `streamGenerateContent` endpoint
+    (server-sent events), yielding text chunks as they arrive.
+    
+    Model rotation and backoff apply until the first chunk is received;
+    after that the stream is committed to its model and errors propagate.
+    
+    Parameters
+    ----------
+    messages : list
+        List of message dictionaries with 'role' and 'content' keys.
+    model : str, optional
+        The Gemini model to use. If None, uses model rotation.
+    generation_config : dict, optional
+        Overrides merged into DEFAULT_GENERATION_CONFIG.
+    
+    Yields
+    ------
+    str
+        Successive pieces of the generated response.
+    """
     if model is None:
-        model = GEMINI_MODELS[0]  # Start with first model
+        model = model_health.pick(GEMINI_MODELS)
     
     failed_models = set()
     current_model = model
+    payload = _build_payload(messages, generation_config)
+    headers = {
+        "Content-Type": "application/json"
+    }
+    client = http_pool.async_client("gemini")
     
     for attempt in range(MAX_RETRIES):
+        logger.info(f"Stream attempt {attempt + 1}/{MAX_RETRIES} with model: {current_model}")
+        if attempt:
+            GEMINI_RETRIES.labels("stream").inc()
+        started = False
+        requested = time.monotonic()
         try:
-            logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} with model: {current_model}")
-            
-            # Convert OpenAI-style messages to Gemini format
-            gemini_contents = []
-            for message in messages:
-                role = message.get("role", "user")
-                content = message.get("content", "")
-                
-                # Gemini uses 'user' and 'model' roles
-                if role == "assistant":
-                    role = "model"
-                elif role == "system":
-                    # Prepend system message to user content
-                    if gemini_contents and gemini_contents[-1]["role"] == "user":
-                        gemini_contents[-1]["parts"][0]["text"] = content + "\n\n" + gemini_contents[-1]["parts"][0]["text"]
-                        continue
-                    else:
-                        role = "user"
-                
-                gemini_contents.append({
-                    "role": role,
-                    "parts": [{"text": content}]
-                })
-            
-            # Prepare the API request
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{current_model}:generateContent?key={GOOGLE_API_KEY}"
-            
-            payload = {
-                "contents": gemini_contents,
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "topK": 40,
-                    "topP": 0.95,
-                    "maxOutputTokens": 2048,
-                }
-            }
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            # Make the request with timeout
-            response = requests.post(url, headers=headers, json=payload, timeout=45)
-            
-            logger.debug(f"Response status code: {response.status_code}")
-            logger.debug(f"Response content: {response.text}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Extract the generated content
-                if "candidates" in result and len(result["candidates"]) > 0:
-                    candidate = result["candidates"][0]
-                    if "content" in candidate and "parts" in candidate["content"]:
-                        parts = candidate["content"]["parts"]
-                        if len(parts) > 0 and "text" in parts[0]:
-                            logger.info(f"Successfully generated response using {current_model}")
-                            return parts[0]["text"]
-                
-                logger.error(f"Unexpected response format from Gemini: {result}")
-                raise ValueError("Unexpected response format from Gemini API")
-            
-            else:
-                # Handle error response
-                error_info = response.text
-                try:
-                    error_json = response.json()
-                    if "error" in error_json:
-                        error_info = error_json["error"].get("message", error_info)
-                except:
-                    pass
-                
-                logger.error(f"Gemini API error: {response.status_code} - {error_info}")
-                
-                # Check if error is retryable
-                if is_retryable_error(response.status_code, error_info):
-                    # Mark current model as failed for this request
-                    failed_models.add(current_model)
-                    
-                    # Try to get next model
-                    next_model = get_next_model(current_model, failed_models)
-                    
-                    if next_model:
-                        current_model = next_model
-                        logger.info(f"Switching to model: {current_model}")
-                        
-                        # Add delay before retry
-                        if attempt < MAX_RETRIES - 1:
-                            delay = calculate_delay(attempt)
-                            logger.info(f"Retrying in {delay:.2f} seconds...")
-                            time.sleep(delay)
-                        continue
-                    else:
-                        logger.error("All models have failed, no more models to try")
-                        raise Exception(f"All Gemini models failed. Last error: {response.status_code} - {error_info}")
+            url = _model_url(current_model, "streamGenerateContent") + "&alt=sse"
+            async with client.stream("POST", url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    _observe_request(current_model, "error", requested)
+                    error_info = _error_info(response)
+                    logger.error(f"Gemini API error: {response.status_code} - {error_info}")
+                    if not is_retryable_error(response.status_code, error_info):
+                        raise Exception(f"Gemini API error: {response.status_code} - {error_info}")
+                    last_error = f"{response.status_code} - {error_info}"
+                    _record_http_failure(current_model, response, last_error)
                 else:
-                    # Non-retryable error
-                    raise Exception(f"Gemini API error: {response.status_code} - {error_info}")
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        text = _chunk_text(json.loads(line[len("data:"):].strip()))
+                        if not text:
+                            # Chunks without text, e.g. the final finish/usage chunk
+                            continue
+                        if not started:
+                            # Time to first chunk is not comparable with full-response latency
+                            model_health.record_success(current_model)
+                        started = True
+                        yield text
+                    _observe_request(current_model, "success" if started else "error", requested)
+                    if started:
+                        logger.info(f"Successfully streamed response using {current_model}")
+                        return
+                    last_error = "empty stream"
+                    model_health.record_failure(current_model, error=last_error)
+        except (httpx.TimeoutException, httpx.RequestError) as e:
+            _observe_request(current_model, "timeout" if isinstance(e, httpx.TimeoutException) else "error", requested)
+            if started:
+                raise
+            logger.error(f"Stream error with model {current_model}: {str(e)}")
+            last_error = str(e) or "timeout"
+            model_health.record_failure(current_model, error=last_error)
         
-        except requests.exceptions.Timeout:
-            logger.error(f"Timeout error with model {current_model}")
-            failed_models.add(current_model)
-            
-            # Try next model
-            next_model = get_next_model(current_model, failed_models)
-            if next_model:
-                current_model = next_model
-                logger.info(f"Switching to model due to timeout: {current_model}")
-                
-                if attempt < MAX_RETRIES - 1:
-                    delay = calculate_delay(attempt)
-                    logger.info(f"Retrying in {delay:.2f} seconds...")
-                    time.sleep(delay)
-                continue
-            else:
-                logger.error("All models have timed out")
-                raise Exception("All Gemini models timed out")
+        if attempt == MAX_RETRIES - 1:
+            break
+        current_model = _switch_model(current_model, failed_models, last_error)
         
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error with model {current_model}: {str(e)}")
-            failed_models.add(current_model)
-            
-            # Try next model
-            next_model = get_next_model(current_model, failed_models)
-            if next_model:
-                current_model = next_model
-                logger.info(f"Switching to model due to request error: {current_model}")
-                
-                if attempt < MAX_RETRIES - 1:
-                    delay = calculate_delay(attempt)
-                    logger.info(f"Retrying in {delay:.2f} seconds...")
-                    time.sleep(delay)
-                continue
-            else:
-                logger.error("All models have failed with request errors")
-                raise Exception(f"All Gemini models failed with request errors. Last error: {str(e)}")
-        
-        except Exception as e:
-            logger.error(f"Unexpected error with model {current_model}: {str(e)}")
-            
-            # For unexpected errors, try next model
-            failed_models.add(current_model)
-            next_model = get_next_model(current_model, failed_models)
-            
-            if next_model and attempt < MAX_RETRIES - 1:
-                current_model = next_model
-                logger.info(f"Switching to model due to unexpected error: {current_model}")
-                
-                delay = calculate_delay(attempt)
-                logger.info(f"Retrying in {delay:.2f} seconds...")
-                time.sleep(delay)
-                continue
-            else:
-                # If no more models or last attempt, raise the error
-                raise
+        if not model_health.is_healthy(current_model):
+            delay = calculate_delay(attempt)
+            logger.info(f"Retrying in {delay:.2f} seconds...")
+            await asyncio.sleep(delay)
     
-    # If we've exhausted all retries
-    raise Exception(f"Failed to generate response after {MAX_RETRIES} attempts across all available models")
+    raise Exception(f"Failed to stream response after {MAX_RETRIES} attempts across all available models. Last error: {last_error}")
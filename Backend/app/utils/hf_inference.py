@@ -1,8 +1,9 @@
 import os
 import json
-import requests
+import httpx
 from dotenv import load_dotenv
 import logging
+from app.utils.http_pool import http_pool
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -33,8 +34,29 @@ headers = {
 
 logger.debug(f"Headers: {headers}")
 
+DEFAULT_MODEL = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
 
-def hf_sentiment_analysis(text: str, model: str = "distilbert/distilbert-base-uncased-finetuned-sst-2-english") -> dict:
+
+def _parse_classification(result) -> dict:
+    """
+    Extract `label` and `score` from an HF text-classification response body.
+    """
+    # HF returns classifications inside a list (sometimes nested). Take the first item conveniently.
+    if isinstance(result, list) and len(result) > 0:
+        entry = result[0]
+        # Some endpoints wrap results in an extra list: [[{...}, {...}]]
+        if isinstance(entry, list) and len(entry) > 0:
+            entry = entry[0]
+
+        if isinstance(entry, dict):
+            label = entry.get("label")
+            score = entry.get("score")
+            return {"label": label, "score": float(score) if score is not None else None}
+
+    raise ValueError(f"Unexpected response format: {result}")
+
+
+def hf_sentiment_analysis(text: str, model: str = DEFAULT_MODEL) -> dict:
     """\
     Perform sentiment analysis on the given text by calling the Hugging Face Inference API.
 
@@ -61,7 +83,7 @@ def hf_sentiment_analysis(text: str, model: str = "distilbert/distilbert-base-un
     logger.debug(f"Payload: {payload}")
 
     try:
-        response = requests.post(inference_url, headers=headers, json=payload, timeout=30)
+        response = http_pool.client("huggingface").post(inference_url, headers=headers, json=payload, timeout=30)
         logger.debug(f"Status code: {response.status_code}")
         logger.debug(f"Raw response: {response.text}")
 
@@ -75,23 +97,51 @@ def hf_sentiment_analysis(text: str, model: str = "distilbert/distilbert-base-un
         if response.status_code != 200:
             raise RuntimeError(f"HF inference API error {response.status_code}: {response.text}")
 
-        result = response.json()
-        # HF returns classifications inside a list (sometimes nested). Take the first item conveniently.
-        if isinstance(result, list) and len(result) > 0:
-            entry = result[0]
-            # Some endpoints wrap results in an extra list: [[{...}, {...}]]
-            if isinstance(entry, list) and len(entry) > 0:
-                entry = entry[0]
-
-            if isinstance(entry, dict):
-                label = entry.get("label")
-                score = entry.get("score")
-                return {"label": label, "score": float(score) if score is not None else None}
-
-        raise ValueError(f"Unexpected response format: {result}")
-    except requests.RequestException as e:
+        return _parse_classification(response.json())
+    except httpx.RequestError as e:
         logger.error(f"Network error calling HF inference API: {e}")
         raise
     except Exception as e:
         logger.error(f"Error in hf_sentiment_analysis: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+async def hf_sentiment_analysis_async(text: str, model: str = DEFAULT_MODEL) -> dict:
+    """\
+    Async variant of `hf_sentiment_analysis` using a non-blocking HTTP client.
+
+    Parameters
+    ----------
+    text : str
+        The input text to analyze.
+    model : str, optional
+        The fully-qualified model name on Hugging Face Hub.
+
+    Returns
+    -------
+    dict
+        A dictionary containing the keys `label` and `score`.
+    """
+    inference_url = f"https://api-inference.huggingface.co/models/{model}"
+    payload = {"inputs": text}
+
+    try:
+        client = http_pool.async_client("huggingface")
+        response = await client.post(inference_url, headers=headers, json=payload, timeout=30)
+        logger.debug(f"Status code: {response.status_code}")
+
+        if response.status_code == 503:
+            estimated = response.json().get("estimated_time", "unknown")
+            logger.warning(f"Model is loading. Estimated time: {estimated} seconds")
+            raise RuntimeError("Model loading in progress. Please retry later.")
+
+        if response.status_code != 200:
+            raise RuntimeError(f"HF inference API error {response.status_code}: {response.text}")
+
+        return _parse_classification(response.json())
+    except httpx.RequestError as e:
+        logger.error(f"Network error calling HF inference API: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Error in hf_sentiment_analysis_async: {e}")
+        raise
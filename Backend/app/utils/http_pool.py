@@ -0,0 +1,146 @@
+import os
+import logging
+import threading
+import importlib.util
+from typing import Dict
+
+import httpx
+
+from app.utils.metrics import UPSTREAM_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_MAX_CONNECTIONS = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", 100))
+HTTP_POOL_MAX_KEEPALIVE = int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", 20))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_POOL_KEEPALIVE_EXPIRY", 60))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "true").lower() == "true"
+
+# HTTP/2 needs the optional 'h2' package (httpx[http2])
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# One connection pool per upstream host. Pool sizes can be overridden per
+# upstream with e.g. GEMINI_POOL_MAX_CONNECTIONS / GEMINI_POOL_MAX_KEEPALIVE.
+UPSTREAMS = {
+    "gemini": {"http2": True, "timeout": 45},
+    "huggingface": {"http2": True, "timeout": 30},
+    "newsdata": {"http2": False, "timeout": 20},
+}
+
+
+def _pool_setting(upstream: str, name: str, default):
+    return type(default)(os.environ.get(f"{upstream.upper()}_POOL_{name}", default))
+
+
+class HTTPPool:
+    """
+    Long-lived httpx clients (sync and async) per upstream, with keep-alive
+    connection pooling and per-upstream request/connection counters.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            upstream: {"requests": 0, "connections_opened": 0, "http2_responses": 0}
+            for upstream in UPSTREAMS
+        }
+
+    def _client_kwargs(self, upstream: str) -> Dict:
+        if upstream not in UPSTREAMS:
+            raise ValueError(f"Unknown upstream: {upstream}")
+        config = UPSTREAMS[upstream]
+        http2 = HTTP2_ENABLED and config["http2"]
+        if http2 and not _HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        return {
+            "http2": http2,
+            "timeout": config["timeout"],
+            "limits": httpx.Limits(
+                max_connections=_pool_setting(upstream, "MAX_CONNECTIONS", HTTP_POOL_MAX_CONNECTIONS),
+                max_keepalive_connections=_pool_setting(upstream, "MAX_KEEPALIVE", HTTP_POOL_MAX_KEEPALIVE),
+                keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+            ),
+        }
+
+    def _record_trace(self, upstream: str, event_name: str) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._stats[upstream]["connections_opened"] += 1
+
+    def _record_response(self, upstream: str, response: httpx.Response) -> None:
+        self._stats[upstream]["requests"] += 1
+        UPSTREAM_REQUESTS.labels(upstream, str(response.status_code)).inc()
+        if response.http_version == "HTTP/2":
+            self._stats[upstream]["http2_responses"] += 1
+
+    def client(self, upstream: str) -> httpx.Client:
+        """Returns the shared blocking client for an upstream."""
+        client = self._clients.get(upstream)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(upstream)
+                if client is None:
+                    def trace(event_name, info):
+                        self._record_trace(upstream, event_name)
+
+                    def on_request(request):
+                        request.extensions["trace"] = trace
+
+                    def on_response(response):
+                        self._record_response(upstream, response)
+
+                    client = httpx.Client(
+                        event_hooks={"request": [on_request], "response": [on_response]},
+                        **self._client_kwargs(upstream),
+                    )
+                    self._clients[upstream] = client
+        return client
+
+    def async_client(self, upstream: str) -> httpx.AsyncClient:
+        """Returns the shared async client for an upstream (bound to the serving event loop)."""
+        client = self._async_clients.get(upstream)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(upstream)
+                if client is None:
+                    async def trace(event_name, info):
+                        self._record_trace(upstream, event_name)
+
+                    async def on_request(request):
+                        request.extensions["trace"] = trace
+
+                    async def on_response(response):
+                        self._record_response(upstream, response)
+
+                    client = httpx.AsyncClient(
+                        event_hooks={"request": [on_request], "response": [on_response]},
+                        **self._client_kwargs(upstream),
+                    )
+                    self._async_clients[upstream] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pooled client."""
+        with self._lock:
+            clients = list(self._clients.values())
+            async_clients = list(self._async_clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+        for client in clients:
+            client.close()
+        for client in async_clients:
+            await client.aclose()
+
+    def stats(self) -> Dict:
+        result = {}
+        for upstream, counters in self._stats.items():
+            entry = dict(counters)
+            entry["connections_reused"] = max(0, entry["requests"] - entry["connections_opened"])
+            entry["reuse_ratio"] = round(entry["connections_reused"] / entry["requests"], 4) if entry["requests"] else 0.0
+            result[upstream] = entry
+        return result
+
+
+# Global instance
+http_pool = HTTPPool()
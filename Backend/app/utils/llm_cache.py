@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 1024))
+
+
+def canonicalize_messages(messages: List[Dict]) -> List[Dict]:
+    """
+    Reduce a message list to the parts that affect generation, with
+    whitespace collapsed so trivially different prompts share an entry.
+    """
+    return [
+        {"role": message.get("role", "user"), "content": " ".join(str(message.get("content", "")).split())}
+        for message in messages
+    ]
+
+
+def llm_cache_key(messages: List[Dict], generation_config: Optional[Dict] = None, model: Optional[str] = None) -> str:
+    payload = {
+        "messages": canonicalize_messages(messages),
+        "config": generation_config or {},
+        "model": model,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    In-memory LRU of generated responses.
+
+    Freshness is decided per call: each caller passes its own `ttl`, and
+    entries older than that but within `ttl + stale_ttl` are returned
+    immediately while one background refresh regenerates them. Concurrent
+    misses for the same key share one upstream call.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "refresh_failures": 0}
+
+    def _store(self, key: str, value: str) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _generate_and_store(self, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        value = await generate()
+        self._store(key, value)
+        return value
+
+    def _refresh_in_background(self, key: str, generate: Callable[[], Awaitable[str]]) -> None:
+        if self._flight.in_flight(key):
+            return
+        self._counters["refreshes"] += 1
+        task = self._flight.start(key, lambda: self._generate_and_store(key, generate))
+
+        def _log_failure(finished) -> None:
+            if not finished.cancelled() and finished.exception() is not None:
+                self._counters["refresh_failures"] += 1
+                logger.warning(f"Background LLM cache refresh failed: {finished.exception()}")
+
+        task.add_done_callback(_log_failure)
+
+    async def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[str]],
+        ttl: float,
+        stale_ttl: float = 0.0,
+    ) -> str:
+        """
+        Return the cached response for `key`, or produce it with `generate()`.
+        Failures are never cached.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age <= ttl:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return value
+            if age <= ttl + stale_ttl:
+                self._counters["stale_hits"] += 1
+                self._refresh_in_background(key, generate)
+                return value
+
+        self._counters["misses"] += 1
+        if self._flight.in_flight(key):
+            self._counters["coalesced"] += 1
+        return await self._flight.do(key, lambda: self._generate_and_store(key, generate))
+
+    def stats(self) -> Dict:
+        counters = dict(self._counters)
+        counters["entries"] = len(self._entries)
+        lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+        counters["hit_ratio"] = round((counters["hits"] + counters["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Global instance
+llm_cache = LLMResponseCache()
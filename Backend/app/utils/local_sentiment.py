@@ -0,0 +1,90 @@
+import os
+import logging
+import threading
+from typing import List
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+# Same checkpoint the HF Inference API path uses, loaded in-process instead
+LOCAL_SENTIMENT_MODEL = os.environ.get(
+    "LOCAL_SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+)
+LOCAL_SENTIMENT_BATCH_SIZE = int(os.environ.get("LOCAL_SENTIMENT_BATCH_SIZE", 32))
+LOCAL_SENTIMENT_THREADS = int(os.environ.get("LOCAL_SENTIMENT_THREADS", 0))  # 0 = torch default
+MAX_SEQUENCE_LENGTH = 512
+
+_tokenizer = None
+_model = None
+_load_lock = threading.Lock()
+
+
+def _load_model():
+    """
+    Load the tokenizer and model once per process (thread-safe, lazy).
+    """
+    global _tokenizer, _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                logger.info(f"Loading local sentiment model: {LOCAL_SENTIMENT_MODEL}")
+                if LOCAL_SENTIMENT_THREADS > 0:
+                    torch.set_num_threads(LOCAL_SENTIMENT_THREADS)
+                tokenizer = AutoTokenizer.from_pretrained(LOCAL_SENTIMENT_MODEL, use_fast=True)
+                model = AutoModelForSequenceClassification.from_pretrained(LOCAL_SENTIMENT_MODEL)
+                model.eval()
+                _tokenizer, _model = tokenizer, model
+    return _tokenizer, _model
+
+
+def local_sentiment_batch(texts: List[str], batch_size: int = LOCAL_SENTIMENT_BATCH_SIZE) -> List[dict]:
+    """
+    Classify a list of texts with the local distilbert SST-2 model on CPU.
+
+    Texts are tokenized once, sorted by token length and run in padded
+    batches so that each batch only pads up to its own longest member.
+
+    Parameters
+    ----------
+    texts : list of str
+        The input texts to analyze.
+    batch_size : int, optional
+        Maximum number of texts per forward pass.
+
+    Returns
+    -------
+    list of dict
+        One dictionary with the keys `label` and `score` per input text,
+        in the same order as `texts`.
+    """
+    if not texts:
+        return []
+
+    tokenizer, model = _load_model()
+    encoded = tokenizer(list(texts), truncation=True, max_length=MAX_SEQUENCE_LENGTH)
+    input_ids = encoded["input_ids"]
+    attention_mask = encoded["attention_mask"]
+
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+    results: List[dict] = [None] * len(texts)
+
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            batch = tokenizer.pad(
+                {
+                    "input_ids": [input_ids[i] for i in indices],
+                    "attention_mask": [attention_mask[i] for i in indices],
+                },
+                padding=True,
+                return_tensors="pt",
+            )
+            logits = model(**batch).logits
+            scores, labels = torch.softmax(logits, dim=-1).max(dim=-1)
+            for i, score, label in zip(indices, scores.tolist(), labels.tolist()):
+                results[i] = {"label": model.config.id2label[label], "score": float(score)}
+
+    logger.debug(f"Local sentiment batch: {len(texts)} texts in {(len(order) + batch_size - 1) // batch_size} batches")
+    return results
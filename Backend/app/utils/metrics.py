@@ -0,0 +1,126 @@
+import time
+import inspect
+import functools
+from typing import Callable, Dict
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Stages span sub-millisecond cache reads to minute-long Gemini calls
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# The credit store is a local SQLite file
+CREDIT_STORE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "sentiant_http_request_duration_seconds", "API request latency until the response starts",
+    ["method", "route", "status"], buckets=STAGE_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "sentiant_http_requests_in_progress", "API requests being handled", ["method"],
+)
+STAGE_DURATION = Histogram(
+    "sentiant_stage_duration_seconds", "Latency of one pipeline stage call", ["stage"], buckets=STAGE_BUCKETS,
+)
+STAGE_FAILURES = Counter(
+    "sentiant_stage_failures_total", "Stage calls that raised or returned an error", ["stage"],
+)
+REPORT_SOURCE_DURATION = Histogram(
+    "sentiant_report_source_duration_seconds", "Time for one source of a full report, analysis included",
+    ["source", "status"], buckets=STAGE_BUCKETS,
+)
+GEMINI_REQUEST_DURATION = Histogram(
+    "sentiant_gemini_request_duration_seconds", "Latency of one Gemini request", ["model", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+GEMINI_RETRIES = Counter(
+    "sentiant_gemini_retries_total", "Gemini attempts after the first within one call", ["call"],
+)
+GEMINI_FALLBACKS = Counter(
+    "sentiant_gemini_fallbacks_total", "Switches to another Gemini model after a failure", ["from_model", "to_model"],
+)
+UPSTREAM_REQUESTS = Counter(
+    "sentiant_upstream_requests_total", "Responses from upstream APIs by status code", ["upstream", "status"],
+)
+CREDIT_STORE_DURATION = Histogram(
+    "sentiant_credit_store_duration_seconds", "Latency of credit store operations", ["operation"],
+    buckets=CREDIT_STORE_BUCKETS,
+)
+
+
+def _is_error(result) -> bool:
+    # Services report most failures as {"error": ...} rather than raising
+    return isinstance(result, dict) and "error" in result
+
+
+def timed(histogram: Histogram, count_failures: bool = False, **labels) -> Callable:
+    """
+    Decorator observing each call's duration in `histogram` (sync or async
+    functions alike). The labelled child is bound once, so a call costs two
+    clock reads and one observe().
+    """
+    child = histogram.labels(**labels)
+    failures = STAGE_FAILURES.labels(**labels) if count_failures else None
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = await fn(*args, **kwargs)
+                    failed = _is_error(result)
+                    return result
+                finally:
+                    child.observe(time.perf_counter() - started)
+                    if failed and failures is not None:
+                        failures.inc()
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = _is_error(result)
+                return result
+            finally:
+                child.observe(time.perf_counter() - started)
+                if failed and failures is not None:
+                    failures.inc()
+        return wrapper
+
+    return decorate
+
+
+def stage(name: str) -> Callable:
+    """Time a pipeline stage and count its failures."""
+    return timed(STAGE_DURATION, count_failures=True, stage=name)
+
+
+class _CacheCollector:
+    """Reads hit and miss counts from the caches' own stats() at scrape time."""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+
+    def add(self, cache: str, stats: Callable[[], Dict]) -> None:
+        self._sources[cache] = stats
+
+    def collect(self):
+        lookups = CounterMetricFamily("sentiant_cache_lookups", "Cache lookups by result", labels=["cache", "result"])
+        ratio = GaugeMetricFamily("sentiant_cache_hit_ratio", "Share of lookups served from the cache", labels=["cache"])
+        for cache, stats in self._sources.items():
+            counters = stats()
+            for name, value in counters.items():
+                if name.endswith("hits") or name == "misses":
+                    lookups.add_metric([cache, name], value)
+            ratio.add_metric([cache], counters.get("hit_ratio", 0.0))
+        yield lookups
+        yield ratio
+
+
+# Global instance
+cache_collector = _CacheCollector()
+REGISTRY.register(cache_collector)
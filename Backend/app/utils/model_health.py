@@ -0,0 +1,226 @@
+import os
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+# Consecutive retryable failures that open a model's circuit, and how long it
+# stays open (doubling on every failed probe, up to CIRCUIT_MAX_OPEN_SECONDS)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 3))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", 30))
+CIRCUIT_MAX_OPEN_SECONDS = float(os.environ.get("CIRCUIT_MAX_OPEN_SECONDS", 300))
+# Cooldowns after quota (429) and overload (503) responses, unless Retry-After says otherwise
+RATE_LIMIT_COOLDOWN = float(os.environ.get("RATE_LIMIT_COOLDOWN", 60))
+OVERLOAD_COOLDOWN = float(os.environ.get("OVERLOAD_COOLDOWN", 15))
+LATENCY_EWMA_ALPHA = float(os.environ.get("LATENCY_EWMA_ALPHA", 0.2))
+# Recent latency samples kept per model for percentile estimates
+LATENCY_WINDOW = int(os.environ.get("LATENCY_WINDOW", 256))
+# A model whose latency EWMA exceeds this multiple of the fastest healthy model is ranked lower
+SLOW_MODEL_FACTOR = float(os.environ.get("SLOW_MODEL_FACTOR", 3))
+# A half-open probe that never reported back frees its slot after this long
+PROBE_TIMEOUT = 90
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+@dataclass
+class _ModelState:
+    state: str = CLOSED
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    open_seconds: float = CIRCUIT_OPEN_SECONDS
+    cooldown_until: float = 0.0
+    probe_started_at: float = 0.0
+    latency_ewma: Optional[float] = None
+    latencies: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    successes: int = 0
+    failures: int = 0
+    last_error: Optional[str] = None
+
+
+class ModelHealthRegistry:
+    """
+    Process-wide health of each Gemini model, shared by every request.
+
+    Each model has a circuit breaker (closed -> open after repeated
+    failures -> half-open, letting one probe request through), a cooldown
+    window set by 429/503 responses, and a latency EWMA. `pick` returns
+    the model a request should try next: the first model in the configured
+    order that is available and not markedly slower than its peers.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState()
+        return state
+
+    def _available(self, state: _ModelState, now: float) -> bool:
+        if now < state.cooldown_until:
+            return False
+        if state.state == OPEN:
+            return now >= state.open_until
+        if state.state == HALF_OPEN:
+            return now - state.probe_started_at >= PROBE_TIMEOUT
+        return True
+
+    def _tier(self, state: _ModelState, now: float, fastest: Optional[float]) -> int:
+        """0 = healthy, 1 = usable but degraded, 2 = unavailable."""
+        if not self._available(state, now):
+            return 2
+        if state.state != CLOSED or state.consecutive_failures:
+            return 1
+        if fastest and state.latency_ewma and state.latency_ewma > fastest * SLOW_MODEL_FACTOR:
+            return 1
+        return 0
+
+    def _ranked(self, models: List[str], now: float) -> List[str]:
+        states = {model: self._state(model) for model in models}
+        healthy_latencies = [
+            s.latency_ewma for s in states.values()
+            if s.latency_ewma is not None and s.state == CLOSED and self._available(s, now)
+        ]
+        fastest = min(healthy_latencies) if healthy_latencies else None
+
+        def sort_key(item):
+            index, model = item
+            state = states[model]
+            tier = self._tier(state, now, fastest)
+            # Unavailable models are ordered by when they become usable again
+            ready_at = max(state.cooldown_until, state.open_until) if tier == 2 else 0.0
+            return tier, ready_at, index
+
+        return [model for _, model in sorted(enumerate(models), key=sort_key)]
+
+    def pick(self, models: List[str], exclude: Optional[Set[str]] = None) -> Optional[str]:
+        """
+        The model to try next, skipping `exclude` (models that already failed
+        in the current call). If every remaining model is cooling down or
+        open, the one that recovers soonest is returned rather than none.
+        """
+        exclude = exclude or set()
+        candidates = [model for model in models if model not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            model = self._ranked(candidates, now)[0]
+            state = self._state(model)
+            if state.state == OPEN and now >= state.open_until:
+                state.state = HALF_OPEN
+            if state.state == HALF_OPEN:
+                state.probe_started_at = now
+        return model
+
+    def is_healthy(self, model: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            return state.state == CLOSED and not state.consecutive_failures and self._available(state, now)
+
+    def record_success(self, model: str, latency: Optional[float] = None) -> None:
+        with self._lock:
+            state = self._state(model)
+            state.successes += 1
+            state.consecutive_failures = 0
+            state.state = CLOSED
+            state.open_seconds = CIRCUIT_OPEN_SECONDS
+            state.probe_started_at = 0.0
+            if latency is not None:
+                state.latencies.append(latency)
+                if state.latency_ewma is None:
+                    state.latency_ewma = latency
+                else:
+                    state.latency_ewma += LATENCY_EWMA_ALPHA * (latency - state.latency_ewma)
+
+    def observe_latency(self, model: str, latency: float) -> None:
+        """
+        Add a latency sample without an outcome, e.g. the elapsed time of a
+        request that was cancelled before answering (a lower bound).
+        """
+        with self._lock:
+            self._state(model).latencies.append(latency)
+
+    def latency_percentile(self, model: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """Latency at `percentile` (0-100) over the recent window, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._state(model).latencies)
+        if len(samples) < max(1, min_samples):
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def record_failure(
+        self,
+        model: str,
+        status_code: Optional[int] = None,
+        error: Optional[str] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """Record a retryable failure (timeouts, 5xx, 429). Client errors should not be recorded."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_error = error or (str(status_code) if status_code else None)
+
+            if status_code == 429:
+                cooldown = retry_after if retry_after is not None else RATE_LIMIT_COOLDOWN
+            elif status_code == 503:
+                cooldown = retry_after if retry_after is not None else OVERLOAD_COOLDOWN
+            else:
+                cooldown = 0.0
+            state.cooldown_until = max(state.cooldown_until, now + cooldown)
+
+            if state.state == HALF_OPEN:
+                # The probe failed: reopen for longer
+                state.open_seconds = min(state.open_seconds * 2, CIRCUIT_MAX_OPEN_SECONDS)
+                state.state = OPEN
+                state.open_until = now + state.open_seconds
+            elif state.state == CLOSED and state.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+                state.state = OPEN
+                state.open_until = now + state.open_seconds
+            state.probe_started_at = 0.0
+
+    def snapshot(self, models: Iterable[str] = ()) -> Dict:
+        """Current state of every known model, in pick order."""
+        now = time.monotonic()
+        with self._lock:
+            for model in models:
+                self._state(model)
+            result = {}
+            for model in self._ranked(list(self._models), now):
+                state = self._models[model]
+                result[model] = {
+                    "state": state.state,
+                    "available": self._available(state, now),
+                    "consecutive_failures": state.consecutive_failures,
+                    "open_for": round(max(0.0, state.open_until - now), 1) if state.state == OPEN else 0.0,
+                    "cooldown_for": round(max(0.0, state.cooldown_until - now), 1),
+                    "latency_ewma_ms": int(state.latency_ewma * 1000) if state.latency_ewma is not None else None,
+                    "latency_samples": len(state.latencies),
+                    "successes": state.successes,
+                    "failures": state.failures,
+                    "last_error": state.last_error,
+                }
+            return result
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a numeric Retry-After header; HTTP-date values are ignored."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+# Global instance
+model_health = ModelHealthRegistry()
@@ -0,0 +1,186 @@
+import os
+import re
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Fingerprints within this many differing bits (of 64) are treated as the same text.
+# On comment-length texts one substituted word moves ~6 bits, unrelated texts 14+.
+SIMHASH_MAX_DISTANCE = int(os.environ.get("SIMHASH_MAX_DISTANCE", 7))
+# Texts with fewer words than this only match when identical after normalization
+SIMHASH_MIN_WORDS = int(os.environ.get("SIMHASH_MIN_WORDS", 8))
+
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize_text(text: str) -> str:
+    text = _URL.sub(" ", text.lower())
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+@lru_cache(maxsize=65536)
+def _word_bits(word: str) -> str:
+    return format(int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+
+
+def simhash(words: List[str]) -> int:
+    """64-bit SimHash over the words of a text."""
+    # Bit-sliced majority vote: one 64-char bit string per word, counted column-wise
+    bits = [_word_bits(word) for word in words]
+    half = len(bits) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in zip(*bits)), 2)
+
+
+class _Cluster:
+    __slots__ = ("text", "fingerprint", "sentiment")
+
+    def __init__(self, text: str, fingerprint: Optional[int]):
+        self.text = text
+        self.fingerprint = fingerprint
+        self.sentiment: Optional[asyncio.Future] = None
+
+
+class _RepresentativeCancelled(Exception):
+    pass
+
+
+class NearDuplicateIndex:
+    """
+    Groups near-identical texts within one report, across all sources.
+
+    Each text is normalized (lowercase, URLs and punctuation removed);
+    identical normalized texts share a cluster directly, and texts of
+    SIMHASH_MIN_WORDS or more are matched to an existing cluster when their
+    SimHash fingerprints differ in at most SIMHASH_MAX_DISTANCE bits. The
+    fingerprint is split into SIMHASH_MAX_DISTANCE + 1 bands, so any match
+    shares at least one band exactly and only same-band clusters are
+    compared. Texts are compared with cluster representatives (the first
+    text seen) only, so clusters do not drift by chaining.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self._band_mask = (1 << self.band_bits) - 1
+        self._clusters: List[_Cluster] = []
+        self._exact: Dict[str, int] = {}
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self._counters = {"texts": 0, "exact_duplicates": 0, "near_duplicates": 0, "sentiment_texts_saved": 0}
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> (band * self.band_bits)) & self._band_mask for band in range(self.bands)]
+
+    def assign(self, text: str, record: bool = True) -> int:
+        """
+        Cluster id for `text`, creating a cluster if nothing matches. With
+        record=False the text is only looked up, not counted as an occurrence.
+        """
+        normalized = normalize_text(text)
+        cluster_id = self._exact.get(normalized)
+        if cluster_id is not None:
+            if record:
+                self._counters["texts"] += 1
+                self._counters["exact_duplicates"] += 1
+            return cluster_id
+        if record:
+            self._counters["texts"] += 1
+
+        words = normalized.split()
+        fingerprint = simhash(words) if len(words) >= SIMHASH_MIN_WORDS else None
+        if fingerprint is not None:
+            keys = self._band_keys(fingerprint)
+            for band, key in enumerate(keys):
+                for candidate in self._tables[band].get(key, ()):
+                    if bin(fingerprint ^ self._clusters[candidate].fingerprint).count("1") <= self.max_distance:
+                        self._exact[normalized] = candidate
+                        if record:
+                            self._counters["near_duplicates"] += 1
+                        return candidate
+
+        cluster_id = len(self._clusters)
+        self._clusters.append(_Cluster(text, fingerprint))
+        self._exact[normalized] = cluster_id
+        if fingerprint is not None:
+            for band, key in enumerate(keys):
+                self._tables[band].setdefault(key, []).append(cluster_id)
+        return cluster_id
+
+    async def analyze(self, texts: List[str], analyze_batch: Callable[[List[str]], Awaitable[List[dict]]]) -> List[dict]:
+        """
+        Sentiment for every text, running `analyze_batch` only on clusters
+        not analyzed yet by this or another source; every duplicate gets
+        (a copy of) its representative's result. Clusters whose leading
+        source failed or was cancelled are classified again by each source
+        that was waiting on them.
+        """
+        cluster_ids = [self.assign(text) for text in texts]
+        unique = list(dict.fromkeys(cluster_ids))
+        loop = asyncio.get_running_loop()
+        leading: List[_Cluster] = []
+        # Taken before the first await: a failing leader resets cluster.sentiment meanwhile
+        futures: List[asyncio.Future] = []
+        for cluster_id in unique:
+            cluster = self._clusters[cluster_id]
+            if cluster.sentiment is None:
+                cluster.sentiment = loop.create_future()
+                leading.append(cluster)
+            futures.append(cluster.sentiment)
+        self._counters["sentiment_texts_saved"] += len(texts) - len(leading)
+
+        if leading:
+            try:
+                results = await analyze_batch([cluster.text for cluster in leading])
+            except BaseException as e:
+                # Sources waiting on these clusters classify them on their own
+                error = _RepresentativeCancelled() if isinstance(e, asyncio.CancelledError) else e
+                for cluster in leading:
+                    cluster.sentiment.set_exception(error)
+                    cluster.sentiment.exception()
+                    cluster.sentiment = None
+                raise
+            for cluster, result in zip(leading, results):
+                cluster.sentiment.set_result(result)
+
+        # Shielded so a follower being cancelled never cancels another source's leader future
+        outcomes = await asyncio.gather(*(asyncio.shield(future) for future in futures), return_exceptions=True)
+        by_cluster: Dict[int, dict] = {}
+        retry: List[int] = []
+        for cluster_id, outcome in zip(unique, outcomes):
+            if isinstance(outcome, BaseException):
+                retry.append(cluster_id)
+            else:
+                by_cluster[cluster_id] = outcome
+        if retry:
+            retried = await analyze_batch([self._clusters[cluster_id].text for cluster_id in retry])
+            by_cluster.update(zip(retry, retried))
+        return [dict(by_cluster[cluster_id]) for cluster_id in cluster_ids]
+
+    def collapse(self, items: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """
+        One representative per cluster, in first-seen order, with "count"
+        set when it stands for more than one item. Items without text are
+        kept as they are.
+        """
+        representatives: List[Dict] = []
+        position: Dict[int, int] = {}
+        for item in items:
+            if "text" not in item:
+                representatives.append(item)
+                continue
+            cluster_id = self.assign(str(item["text"] or ""), record=False)
+            if cluster_id in position:
+                representative = representatives[position[cluster_id]]
+                representative["count"] = representative.get("count", 1) + 1
+                continue
+            position[cluster_id] = len(representatives)
+            representatives.append(dict(item))
+        return representatives, {
+            "comments_before_dedup": len(items),
+            "duplicates_collapsed": len(items) - len(representatives),
+        }
+
+    def stats(self) -> Dict:
+        return {**self._counters, "clusters": len(self._clusters)}
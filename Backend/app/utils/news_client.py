@@ -1,6 +1,7 @@
 import os
-import requests
 from dotenv import load_dotenv
+from app.utils.http_pool import http_pool
+from app.utils.metrics import stage
 
 load_dotenv()
 
@@ -9,13 +10,24 @@ NEWS_API_KEY = os.environ.get("NEWS_API_KEY")
 if not NEWS_API_KEY:
     raise ValueError("NEWS_API_KEY must be set in the environment variables.")
 
-def fetch_news(query: str):
-    print(f"[DEBUG] NEWS_API_KEY: {NEWS_API_KEY}")  # Debugging statement
-    url = "https://newsdata.io/api/1/latest"
-    params = {
+NEWS_API_URL = "https://newsdata.io/api/1/latest"
+NEWS_API_TIMEOUT = 20
+
+def _news_params(query: str) -> dict:
+    return {
         "apikey": NEWS_API_KEY,
         "q": query if query is not None else ""
     }
-    response = requests.get(url, params=params)
+
+@stage("fetch_news")
+def fetch_news(query: str):
+    response = http_pool.client("newsdata").get(NEWS_API_URL, params=_news_params(query), timeout=NEWS_API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+@stage("fetch_news")
+async def fetch_news_async(query: str):
+    client = http_pool.async_client("newsdata")
+    response = await client.get(NEWS_API_URL, params=_news_params(query), timeout=NEWS_API_TIMEOUT)
     response.raise_for_status()
-    return response.json() 
\ No newline at end of file
+    return response.json()
@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Quota units charged per call type. YouTube costs follow the Data API v3
+# quota table; Twitter and Reddit limits are per request.
+QUOTA_COSTS = {
+    "youtube": {"search.list": 100, "commentThreads.list": 1, "videos.list": 1},
+    "twitter": {"search_recent_tweets": 1},
+    "reddit": {"search": 1, "comments": 1, "listing": 1},
+}
+
+# Bucket size and the window over which it refills:
+# YouTube 10,000 units/day, Twitter recent search 450 requests/15 min (app auth),
+# Reddit OAuth 100 queries/min.
+UPSTREAM_LIMITS = {
+    "youtube": {
+        "capacity": float(os.environ.get("YOUTUBE_DAILY_QUOTA", 10000)),
+        "window": 86400,
+    },
+    "twitter": {
+        "capacity": float(os.environ.get("TWITTER_SEARCH_LIMIT", 450)),
+        "window": 900,
+    },
+    "reddit": {
+        "capacity": float(os.environ.get("REDDIT_QUERIES_PER_MINUTE", 100)),
+        "window": 60,
+    },
+}
+
+# Callers wait at most this long for tokens; beyond it they fail fast with an ETA
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 2))
+# AIMD: a throttling signal halves the refill rate, each success restores a step of it
+AIMD_DECREASE_FACTOR = 0.5
+AIMD_INCREASE_STEP = 0.05
+AIMD_MIN_SCALE = 0.1
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"{upstream} rate limit reached; try again in {retry_after:.0f}s")
+
+
+class TokenBucket:
+    """
+    Token bucket with an adaptive refill rate. Tokens may go negative:
+    a caller that is willing to wait reserves its units up front and
+    sleeps until the bucket would have refilled them, which keeps waiting
+    callers in arrival order.
+    """
+
+    def __init__(self, capacity: float, window: float):
+        self.capacity = capacity
+        self.base_rate = capacity / window
+        self.scale = 1.0
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._counters = {"granted": 0, "rejected": 0, "units": 0.0, "throttled": 0, "waited": 0.0}
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.base_rate * self.scale)
+        self._updated = now
+
+    def reserve(self, cost: float, max_wait: float) -> Tuple[bool, float]:
+        """
+        Try to reserve `cost` units. Returns (True, seconds to wait before
+        using them), or (False, seconds until they would be available) with
+        nothing reserved when that exceeds max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            deficit = cost - self.tokens
+            wait = max(0.0, self.paused_until - now)
+            if deficit > 0:
+                wait += deficit / (self.base_rate * self.scale)
+            if wait > max_wait:
+                self._counters["rejected"] += 1
+                return False, wait
+            self.tokens -= cost
+            self._counters["granted"] += 1
+            self._counters["units"] += cost
+            self._counters["waited"] += wait
+            return True, wait
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.scale = max(AIMD_MIN_SCALE, self.scale * AIMD_DECREASE_FACTOR)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._counters["throttled"] += 1
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.scale < 1.0:
+                self._refill(time.monotonic())
+                self.scale = min(1.0, self.scale + AIMD_INCREASE_STEP)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            counters = dict(self._counters)
+            counters["waited"] = round(counters["waited"], 2)
+            counters["tokens"] = round(self.tokens, 2)
+            counters["capacity"] = self.capacity
+            counters["rate_scale"] = round(self.scale, 3)
+            counters["paused_for"] = round(max(0.0, self.paused_until - now), 1)
+            return counters
+
+
+class RateLimiter:
+    """
+    Per-upstream quota accounting for the SDK fetchers. Call `acquire`
+    before each upstream call from executor threads (it may sleep briefly),
+    or `acquire_async` from the event loop, then report the outcome with
+    `throttled` or `succeeded`.
+    """
+
+    def __init__(self):
+        self._buckets = {name: TokenBucket(**limits) for name, limits in UPSTREAM_LIMITS.items()}
+
+    def _reserve(self, upstream: str, call: str, count: int, max_wait: float) -> float:
+        cost = QUOTA_COSTS[upstream][call] * count
+        granted, wait = self._buckets[upstream].reserve(cost, max_wait)
+        if not granted:
+            logger.warning(f"Rejected {upstream} {call}: quota available in {wait:.0f}s")
+            raise RateLimitExceeded(upstream, wait)
+        return wait
+
+    def acquire(self, upstream: str, call: str, count: int = 1, max_wait: float = RATE_LIMIT_MAX_WAIT) -> None:
+        """Reserve quota for a call, sleeping until it is available. Not for use on the event loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("RateLimiter.acquire would block the event loop; use acquire_async")
+        wait = self._reserve(upstream, call, count, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, upstream: str, call: str, count: int = 1, max_wait: float = RATE_LIMIT_MAX_WAIT) -> None:
+        """Like `acquire`, waiting with asyncio.sleep instead of blocking."""
+        wait = self._reserve(upstream, call, count, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, upstream: str, retry_after: Optional[float] = None) -> None:
+        """The upstream signalled throttling (429 / quota exceeded)."""
+        logger.warning(f"{upstream} signalled throttling; backing off" + (f" for {retry_after:.0f}s" if retry_after else ""))
+        self._buckets[upstream].on_throttle(retry_after)
+
+    def succeeded(self, upstream: str) -> None:
+        self._buckets[upstream].on_success()
+
+    def stats(self) -> Dict:
+        return {name: bucket.stats() for name, bucket in self._buckets.items()}
+
+
+# Global instance
+rate_limiter = RateLimiter()
@@ -1,6 +1,11 @@
 import os
+import threading
 from dotenv import load_dotenv
 import praw
+import prawcore
+from prawcore.exceptions import TooManyRequests
+from app.utils.client_registry import client_registry
+from app.utils.rate_limiter import rate_limiter
 
 load_dotenv()
 
@@ -13,14 +18,48 @@ REDDIT_USER_AGENT = os.environ.get("REDDIT_USER_AGENT")
 if not all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USERNAME, REDDIT_PASSWORD, REDDIT_USER_AGENT]):
     raise ValueError("All Reddit credentials must be set in the environment variables.")
 
-def get_reddit_client() -> praw.Reddit:
+_request_counts = threading.local()
+
+class _CountingRequestor(prawcore.Requestor):
+    """Counts the HTTP requests PRAW makes on the current thread."""
+
+    def request(self, *args, **kwargs):
+        _request_counts.value = getattr(_request_counts, "value", 0) + 1
+        return super().request(*args, **kwargs)
+
+def reddit_request_count() -> int:
     """
-    Returns a PRAW Reddit client instance.
+    Number of Reddit HTTP requests made so far on this thread; take the
+    difference around a block of work to count its requests.
     """
+    return getattr(_request_counts, "value", 0)
+
+def _create_reddit_client() -> praw.Reddit:
     return praw.Reddit(
         client_id=REDDIT_CLIENT_ID,
         client_secret=REDDIT_CLIENT_SECRET,
         username=REDDIT_USERNAME,
         password=REDDIT_PASSWORD,
-        user_agent=REDDIT_USER_AGENT
-    ) 
\ No newline at end of file
+        user_agent=REDDIT_USER_AGENT,
+        requestor_class=_CountingRequestor
+    )
+
+# PRAW is not thread-safe, so each executor thread keeps its own instance
+client_registry.register("reddit", _create_reddit_client, per_thread=True, executor="reddit")
+
+def get_reddit_client() -> praw.Reddit:
+    """
+    Returns this thread's long-lived PRAW Reddit client instance.
+    """
+    return client_registry.get("reddit")
+
+def record_reddit_throttle(error: TooManyRequests) -> float:
+    """
+    Report a Reddit 429 to the rate limiter. Returns the back-off in seconds.
+    """
+    try:
+        retry_after = float(error.response.headers.get("retry-after", 0))
+    except (AttributeError, ValueError):
+        retry_after = 0.0
+    rate_limiter.throttled("reddit", retry_after)
+    return retry_after
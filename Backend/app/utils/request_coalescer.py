@@ -0,0 +1,49 @@
+import copy
+import json
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+from app.utils.singleflight import SingleFlight
+
+
+def _normalize(value: Any) -> Any:
+    # Search terms are case-insensitive upstream, so "AI  News" and "ai news" share a run
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    return value
+
+
+def request_key(endpoint: str, params: Dict) -> str:
+    payload = {"endpoint": endpoint, "params": {name: _normalize(value) for name, value in params.items()}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RequestCoalescer:
+    """
+    Runs identical in-flight analyses once. Requests to the same endpoint
+    with the same normalized parameters that arrive while a run is in
+    progress await that run instead of starting their own; every caller
+    gets its own deep copy of the result, so per-caller additions (such as
+    credits_remaining) never leak between responses. Nothing is cached
+    once the run finishes.
+    """
+
+    def __init__(self):
+        self._flight = SingleFlight()
+        self._counters = {"runs": 0, "coalesced": 0}
+
+    async def run(self, endpoint: str, params: Dict, fn: Callable[[], Awaitable[Any]]) -> Any:
+        key = request_key(endpoint, params)
+        if self._flight.in_flight(key):
+            self._counters["coalesced"] += 1
+        else:
+            self._counters["runs"] += 1
+        result = await self._flight.do(key, fn)
+        return copy.deepcopy(result)
+
+    def stats(self) -> Dict:
+        return {**self._counters, "in_flight": self._flight.stats()["in_flight"]}
+
+
+# Global instance
+request_coalescer = RequestCoalescer()
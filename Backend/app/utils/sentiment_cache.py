@@ -0,0 +1,148 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+# File to store cached sentiment results
+SENTIMENT_CACHE_PATH = os.environ.get("SENTIMENT_CACHE_PATH", "sentiment_cache.sqlite3")
+SENTIMENT_CACHE_TTL = float(os.environ.get("SENTIMENT_CACHE_TTL", 7 * 24 * 3600))
+SENTIMENT_CACHE_MEMORY_ITEMS = int(os.environ.get("SENTIMENT_CACHE_MEMORY_ITEMS", 20000))
+SENTIMENT_CACHE_MAX_ROWS = int(os.environ.get("SENTIMENT_CACHE_MAX_ROWS", 1000000))
+EVICTION_INTERVAL_WRITES = 1000  # Run disk eviction after this many new rows
+SQLITE_MAX_VARIABLES = 900  # Stay below SQLite's bound-parameter limit
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and lowercase (the sentiment model is uncased)."""
+    return " ".join(text.split()).lower()
+
+
+def cache_key(text: str, model_id: str) -> str:
+    """Content address of a text for a given model."""
+    return hashlib.sha256(f"{model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    Two-tier cache of sentiment results: an in-memory LRU in front of a
+    SQLite table. Entries expire after `ttl` seconds and the table is
+    trimmed to `max_rows`, dropping the entries closest to expiry first.
+    """
+
+    def __init__(
+        self,
+        path: str = SENTIMENT_CACHE_PATH,
+        ttl: float = SENTIMENT_CACHE_TTL,
+        memory_items: int = SENTIMENT_CACHE_MEMORY_ITEMS,
+        max_rows: int = SENTIMENT_CACHE_MAX_ROWS,
+    ):
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.max_rows = max_rows
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment_cache ("
+            "key TEXT PRIMARY KEY, label TEXT, score REAL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_cache_expires ON sentiment_cache (expires_at)")
+
+    def _remember(self, key: str, value: dict, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Return cached results for whichever of `keys` are present and fresh."""
+        now = time.time()
+        found: Dict[str, dict] = {}
+        with self._lock:
+            pending = []
+            for key in dict.fromkeys(keys):
+                entry = self._memory.get(key)
+                if entry is not None and entry[1] > now:
+                    self._memory.move_to_end(key)
+                    found[key] = entry[0]
+                    self._counters["memory_hits"] += 1
+                else:
+                    pending.append(key)
+
+            disk_hits = 0
+            for start in range(0, len(pending), SQLITE_MAX_VARIABLES):
+                chunk = pending[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, label, score, expires_at FROM sentiment_cache "
+                    f"WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, now),
+                ).fetchall()
+                for key, label, score, expires_at in rows:
+                    value = {"label": label, "score": score}
+                    found[key] = value
+                    self._remember(key, value, expires_at)
+                    disk_hits += 1
+
+            self._counters["disk_hits"] += disk_hits
+            self._counters["misses"] += len(pending) - disk_hits
+        return found
+
+    def put_many(self, items: Dict[str, dict]) -> None:
+        """Store results keyed by cache_key. Error results are never cached."""
+        expires_at = time.time() + self.ttl
+        rows = [
+            (key, value.get("label"), value.get("score"), expires_at)
+            for key, value in items.items()
+            if "error" not in value
+        ]
+        if not rows:
+            return
+        with self._lock:
+            for key, label, score, _ in rows:
+                self._remember(key, {"label": label, "score": score}, expires_at)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sentiment_cache (key, label, score, expires_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._counters["writes"] += len(rows)
+            self._writes_since_eviction += len(rows)
+            if self._writes_since_eviction >= EVICTION_INTERVAL_WRITES:
+                self._writes_since_eviction = 0
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired rows, then the soonest-to-expire rows above max_rows. Caller holds the lock."""
+        removed = self._conn.execute("DELETE FROM sentiment_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()
+        if count > self.max_rows:
+            removed += self._conn.execute(
+                "DELETE FROM sentiment_cache WHERE key IN "
+                "(SELECT key FROM sentiment_cache ORDER BY expires_at LIMIT ?)",
+                (count - self.max_rows,),
+            ).rowcount
+        if removed:
+            self._counters["evictions"] += removed
+            logger.debug(f"Evicted {removed} sentiment cache rows")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["memory_items"] = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        counters["hit_ratio"] = round((lookups - counters["misses"]) / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Global instance
+sentiment_cache = SentimentCache()
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task. Each caller awaits it through
+    asyncio.shield, so one caller disconnecting does not cancel the shared
+    work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._counters = {"leaders": 0, "followers": 0}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Return the running task for `key`, starting `fn()` if there is none."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self._counters["followers"] += 1
+            return task
+
+        self._counters["leaders"] += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            # Mark the exception as retrieved even if every caller went away
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.debug(f"Single-flight call for {key[:16]} failed: {finished.exception()}")
+
+        task.add_done_callback(_done)
+        return task
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` once per key among concurrent callers and return its result to each."""
+        return await asyncio.shield(self.start(key, fn))
+
+    def stats(self) -> Dict:
+        return {**self._counters, "in_flight": len(self._inflight)}
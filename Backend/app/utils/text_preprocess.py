@@ -0,0 +1,157 @@
+import os
+import re
+import html
+import logging
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer of the sentiment model, used to cut texts to its input window
+PREPROCESS_TOKENIZER = os.environ.get(
+    "LOCAL_SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+)
+# distilbert's 512-token window minus [CLS] and [SEP]
+MODEL_MAX_TOKENS = int(os.environ.get("MODEL_MAX_TOKENS", 510))
+# Used when the tokenizer cannot be loaded
+FALLBACK_CHARS_PER_TOKEN = 4
+# Long texts are cut to this many characters per allowed token before tokenizing;
+# English WordPiece tokens average ~4 characters, so the window is still filled
+PRECUT_CHARS_PER_TOKEN = 8
+
+_HTML_TAG = re.compile(r"</?[A-Za-z][^>]*>")
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_MD_IMAGE_OR_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_MD_MARKUP = re.compile(r"\*\*|__|~~|`+|\^")
+_MD_LINE_PREFIX = re.compile(r"^[ \t]*(?:#{1,6}[ \t]+|>+[ \t]?|[-*+][ \t]+|\d+\.[ \t]+)", re.MULTILINE)
+_BOT_FOOTER = re.compile(r"\*?I am a bot, and this action was performed automatically.*$", re.IGNORECASE | re.DOTALL)
+_ZERO_WIDTH = re.compile(r"[\u200b-\u200d\u2060\ufeff]")
+_LETTER = re.compile(r"[^\W\d_]")
+REMOVED_MARKERS = {"[deleted]", "[removed]"}
+
+
+class TextPreprocessor:
+    """
+    Cleans platform text before sentiment analysis and prompting: HTML
+    entities and tags, URLs, Reddit markdown and bot footers are removed,
+    Unicode is NFKC-normalized (so styled "𝓰𝓸𝓸𝓭" reads as "good") and
+    whitespace collapsed. Items that end up empty, deleted, or without a
+    single letter are dropped.
+
+    Texts that may exceed the model's input window are cut to
+    MODEL_MAX_TOKENS with the model's fast tokenizer, so the HF API is never
+    sent text the model would discard anyway.
+    """
+
+    def __init__(self, tokenizer_name: str = PREPROCESS_TOKENIZER, max_tokens: int = MODEL_MAX_TOKENS):
+        self.tokenizer_name = tokenizer_name
+        self.max_tokens = max_tokens
+        self._tokenizer = None
+        self._tokenizer_failed = False
+        self._load_lock = threading.Lock()
+        self._counters = {
+            "texts": 0, "dropped_empty": 0, "dropped_removed": 0, "dropped_non_text": 0,
+            "chars_in": 0, "chars_out": 0, "truncated": 0,
+        }
+
+    def clean(self, text: Optional[str]) -> str:
+        if not isinstance(text, str):
+            return ""
+        # Entities can arrive double-escaped ("&amp;#39;")
+        for _ in range(2):
+            if "&" not in text:
+                break
+            text = html.unescape(text)
+        if "<" in text:
+            text = _HTML_TAG.sub(" ", text)
+        # Markdown links keep their label; bare URLs carry no sentiment
+        text = _MD_IMAGE_OR_LINK.sub(r"\1", text)
+        text = _URL.sub(" ", text)
+        text = _MD_LINE_PREFIX.sub("", text)
+        text = _MD_MARKUP.sub("", text)
+        text = _BOT_FOOTER.sub("", text)
+        text = _ZERO_WIDTH.sub("", unicodedata.normalize("NFKC", text))
+        return " ".join(text.split())
+
+    def preprocess(self, texts: List[Optional[str]]) -> Tuple[List[str], List[int]]:
+        """
+        Clean each text and drop the unusable ones. Returns the cleaned
+        texts and, for each, the index of the input it came from.
+        """
+        cleaned: List[str] = []
+        kept: List[int] = []
+        counters = self._counters
+        for index, text in enumerate(texts):
+            counters["texts"] += 1
+            counters["chars_in"] += len(text) if isinstance(text, str) else 0
+            clean = self.clean(text)
+            if not clean:
+                counters["dropped_empty"] += 1
+            elif clean.lower() in REMOVED_MARKERS:
+                counters["dropped_removed"] += 1
+            elif not _LETTER.search(clean):
+                counters["dropped_non_text"] += 1
+            else:
+                counters["chars_out"] += len(clean)
+                cleaned.append(clean)
+                kept.append(index)
+        return cleaned, kept
+
+    def load_tokenizer(self):
+        if self._tokenizer is None and not self._tokenizer_failed:
+            with self._load_lock:
+                if self._tokenizer is None and not self._tokenizer_failed:
+                    try:
+                        from transformers import AutoTokenizer
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name, use_fast=True)
+                    except Exception as e:
+                        logger.warning(f"Tokenizer {self.tokenizer_name} unavailable, truncating by characters: {e}")
+                        self._tokenizer_failed = True
+        return self._tokenizer
+
+    def truncate_for_model(self, texts: List[str]) -> List[str]:
+        """
+        Cut texts longer than max_tokens tokens at the end of their last
+        token that fits. A WordPiece token covers at least one character, so
+        only texts longer than max_tokens characters are tokenized at all,
+        and very long texts are pre-cut so the tokenizer never walks the
+        part that would be thrown away.
+        """
+        long_indices = [i for i, text in enumerate(texts) if len(text) > self.max_tokens]
+        if not long_indices:
+            return texts
+        texts = list(texts)
+        tokenizer = self.load_tokenizer()
+        if tokenizer is None:
+            limit = self.max_tokens * FALLBACK_CHARS_PER_TOKEN
+            for i in long_indices:
+                if len(texts[i]) > limit:
+                    texts[i] = texts[i][:limit]
+                    self._counters["truncated"] += 1
+            return texts
+
+        precut = self.max_tokens * PRECUT_CHARS_PER_TOKEN
+        encoded = tokenizer(
+            [texts[i][:precut] for i in long_indices],
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.max_tokens,
+            return_offsets_mapping=True,
+        )
+        for i, offsets in zip(long_indices, encoded["offset_mapping"]):
+            end = offsets[-1][1] if len(offsets) >= self.max_tokens else precut
+            if end < len(texts[i]):
+                texts[i] = texts[i][:end]
+                self._counters["truncated"] += 1
+        return texts
+
+    def stats(self) -> Dict:
+        return {
+            **self._counters,
+            "tokenizer": "chars" if self._tokenizer_failed else ("fast" if self._tokenizer is not None else "not loaded"),
+        }
+
+
+# Global instance
+text_preprocessor = TextPreprocessor()
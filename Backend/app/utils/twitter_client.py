@@ -1,6 +1,9 @@
 import os
 from dotenv import load_dotenv
+import time
 import tweepy
+from app.utils.client_registry import client_registry
+from app.utils.rate_limiter import rate_limiter
 
 load_dotenv()
 
@@ -11,8 +14,25 @@ TWITTER_BEARER_TOKEN = os.environ.get("TWITTER_BEARER_TOKEN")
 if not TWITTER_BEARER_TOKEN:
     raise ValueError("TWITTER_BEARER_TOKEN must be set in the environment variables.")
 
+def _create_twitter_client() -> tweepy.Client:
+    return tweepy.Client(bearer_token=TWITTER_BEARER_TOKEN)
+
+client_registry.register("twitter", _create_twitter_client, close=lambda client: client.session.close())
+
 def get_twitter_client() -> tweepy.Client:
     """
-    Returns a Tweepy Client instance for Twitter API v2.
+    Returns the shared Tweepy Client instance for Twitter API v2.
+    """
+    return client_registry.get("twitter")
+
+def record_twitter_throttle(error: tweepy.TooManyRequests) -> float:
+    """
+    Report a Twitter 429 to the rate limiter, pausing until the window
+    resets (x-rate-limit-reset). Returns the back-off in seconds.
     """
-    return tweepy.Client(bearer_token=TWITTER_BEARER_TOKEN) 
\ No newline at end of file
+    try:
+        retry_after = max(0.0, float(error.response.headers["x-rate-limit-reset"]) - time.time())
+    except (AttributeError, KeyError, TypeError, ValueError):
+        retry_after = 0.0
+    rate_limiter.throttled("twitter", retry_after)
+    return retry_after
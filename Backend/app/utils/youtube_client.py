@@ -1,5 +1,15 @@
 import os
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from app.utils.client_registry import client_registry
+from app.utils.rate_limiter import rate_limiter
+from app.utils.metrics import UPSTREAM_REQUESTS
 
 load_dotenv()
 
@@ -8,8 +18,76 @@ YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
 if not YOUTUBE_API_KEY:
     raise ValueError("YOUTUBE_API_KEY must be set in the environment variables.")
 
+# Error reasons meaning we are out of quota rather than the request being bad
+QUOTA_ERROR_REASONS = {"quotaExceeded", "dailyLimitExceeded", "rateLimitExceeded", "userRateLimitExceeded"}
+
+# The discovery document is loaded once and reused for every client instance
+_discovery_document = None
+
 def get_youtube_api_key() -> str:
     """
     Returns the YouTube API key from environment variables.
     """
-    return YOUTUBE_API_KEY 
\ No newline at end of file
+    return YOUTUBE_API_KEY
+
+def _create_youtube_client():
+    global _discovery_document
+    if _discovery_document is None:
+        _discovery_document = get_static_doc("youtube", "v3")
+    if _discovery_document is None:
+        return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, cache_discovery=False)
+    return build_from_document(_discovery_document, developerKey=YOUTUBE_API_KEY)
+
+# googleapiclient resources wrap an httplib2 connection, which is not thread-safe
+client_registry.register(
+    "youtube", _create_youtube_client, per_thread=True, close=lambda client: client.close(), executor="youtube"
+)
+
+def get_youtube_client():
+    """
+    Returns this thread's long-lived YouTube Data API v3 client.
+    """
+    return client_registry.get("youtube")
+
+def _seconds_until_quota_reset() -> float:
+    """YouTube daily quotas reset at midnight Pacific time."""
+    now = datetime.now(ZoneInfo("America/Los_Angeles"))
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+def _quota_retry_after(error: HttpError) -> Optional[float]:
+    """Seconds to back off if `error` is a quota/rate error, else None."""
+    if error.resp.status == 429:
+        try:
+            return float(error.resp.get("retry-after", 0))
+        except ValueError:
+            return 0.0
+    if error.resp.status != 403:
+        return None
+    try:
+        reasons = {item.get("reason") for item in json.loads(error.content)["error"]["errors"]}
+    except (ValueError, KeyError, TypeError):
+        return None
+    if reasons & {"quotaExceeded", "dailyLimitExceeded"}:
+        return _seconds_until_quota_reset()
+    if reasons & QUOTA_ERROR_REASONS:
+        return 0.0
+    return None
+
+def execute_youtube(request, call: str):
+    """
+    Execute a YouTube API request, charging its quota cost first.
+    Raises RateLimitExceeded instead of calling when the quota is spent.
+    """
+    rate_limiter.acquire("youtube", call)
+    try:
+        response = request.execute()
+    except HttpError as e:
+        UPSTREAM_REQUESTS.labels("youtube", str(e.resp.status)).inc()
+        retry_after = _quota_retry_after(e)
+        if retry_after is not None:
+            rate_limiter.throttled("youtube", retry_after)
+        raise
+    UPSTREAM_REQUESTS.labels("youtube", "200").inc()
+    rate_limiter.succeeded("youtube")
+    return response
@@ -23,3 +23,115 @@ def test_api(ctx):
         print(json.dumps(response.json(), indent=2))
     except Exception as e:
         print(f"Error: {str(e)}")
+
+@task
+def bench_keywords(ctx, titles=200000, batch=500, seed=7):
+    """Benchmark the trending keyword engine on a synthetic title stream"""
+    import itertools
+    import random
+    import time
+    from collections import Counter
+    from app.services.keyword_engine import KeywordEngine, extract_terms
+
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(20000)]
+    # Zipf-distributed word frequencies
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    fillers = ["the", "of", "and", "new", "with"]
+    refreshes = titles // batch
+    # One phrase bursts during the last tenth of the stream
+    burst_phrase, burst_start = "solar eclipse tonight", int(refreshes * 0.9)
+
+    def make_title(refresh):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(4, 10))
+        words.insert(rng.randrange(len(words)), rng.choice(fillers))
+        if refresh >= burst_start and rng.random() < 0.05:
+            words.insert(rng.randrange(len(words)), burst_phrase)
+        return " ".join(words) + f" #{rng.getrandbits(32)}"
+
+    engine = KeywordEngine(now=0)
+    window = []
+    ingest_ms, top_ms, recompute_ms = [], [], []
+    for refresh in range(refreshes):
+        now = refresh * 300.0  # one refresh every five minutes
+        new_titles = [make_title(refresh) for _ in range(batch)]
+
+        started = time.perf_counter()
+        engine.ingest(new_titles, now=now)
+        ingest_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        top = engine.top(12, now=now)
+        top_ms.append((time.perf_counter() - started) * 1000)
+
+        # Baseline: recount n-grams over the last 24 hours of titles on every refresh
+        window = (window + new_titles)[-batch * 288:]
+        if refresh % 50 == 0 or refresh == refreshes - 1:
+            started = time.perf_counter()
+            counts = Counter()
+            for title in window:
+                counts.update(extract_terms(title))
+            counts.most_common(12)
+            recompute_ms.append((time.perf_counter() - started) * 1000)
+
+    def p(values, pct):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+    total = sum(ingest_ms) / 1000
+    print(f"titles: {refreshes * batch} in {refreshes} refreshes of {batch}")
+    print(f"ingest: {refreshes * batch / total:,.0f} titles/s, p50 {p(ingest_ms, 50):.1f} ms, p95 {p(ingest_ms, 95):.1f} ms per refresh")
+    print(f"top(12): p50 {p(top_ms, 50):.1f} ms, p95 {p(top_ms, 95):.1f} ms")
+    print(f"full recount over a 24h window: p50 {p(recompute_ms, 50):.1f} ms per refresh")
+    print(f"engine: {engine.stats()}")
+    print(f"final top terms: {[entry['term'] for entry in top]}")
+    print(f"burst phrase '{burst_phrase}' detected: {burst_phrase in [entry['term'] for entry in top]}")
+
+@task
+def bench_preprocess(ctx, comments=50000, long_fraction=0.05, seed=11):
+    """Benchmark comment cleaning and model-window truncation on a synthetic comment batch"""
+    import random
+    import time
+    from app.utils.text_preprocess import TextPreprocessor
+
+    rng = random.Random(seed)
+    words = "great awful love hate video product this is really not bad good honestly the best worst ever".split()
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    makers = [
+        lambda: f"I&#39;m {sentence(12)} &quot;wow&quot;<br>{sentence(8)} https://youtu.be/{rng.getrandbits(40):x}",
+        lambda: f"&gt; {sentence(10)}\n\n**{sentence(3)}** [source](https://example.com/{rng.getrandbits(32)}) {sentence(15)}",
+        lambda: f"{sentence(20)} 😂 https://t.co/{rng.getrandbits(32):x} #{rng.choice(words)}",
+        lambda: rng.choice(["[deleted]", "[removed]", "😂😂😂", "https://t.co/abc", "   "]),
+    ]
+    batch = []
+    for _ in range(comments):
+        if rng.random() < long_fraction:
+            batch.append(sentence(rng.randint(600, 2000)))
+        else:
+            batch.append(rng.choice(makers)())
+    size_mb = sum(len(text.encode("utf-8")) for text in batch) / 1e6
+
+    preprocessor = TextPreprocessor()
+    started = time.perf_counter()
+    cleaned, kept = preprocessor.preprocess(batch)
+    clean_s = time.perf_counter() - started
+
+    tokenizer = preprocessor.load_tokenizer()  # outside the timing
+    started = time.perf_counter()
+    truncated = preprocessor.truncate_for_model(cleaned)
+    truncate_s = time.perf_counter() - started
+
+    stats = preprocessor.stats()
+    print(f"comments: {comments} ({size_mb:.1f} MB), {long_fraction:.0%} longer than the model window")
+    print(f"clean: {comments / clean_s:,.0f} comments/s, {size_mb / clean_s:.1f} MB/s; kept {len(kept)}, dropped {comments - len(kept)}")
+    print(f"truncate ({stats['tokenizer']} tokenizer): {len(cleaned) / truncate_s:,.0f} comments/s, {stats['truncated']} truncated")
+    chars_out = sum(len(text) for text in truncated)
+    print(f"payload: {stats['chars_in']:,} chars in, {chars_out:,} chars out ({1 - chars_out / stats['chars_in']:.0%} smaller)")
+
+    if tokenizer is not None:
+        # Reference: tokenize every comment instead of only those that can exceed the window
+        started = time.perf_counter()
+        tokenizer(cleaned, add_special_tokens=False, truncation=True, max_length=preprocessor.max_tokens, return_offsets_mapping=True)
+        print(f"tokenizing every comment instead: {len(cleaned) / (time.perf_counter() - started):,.0f} comments/s")
@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# Local stores are created at import time; keep them out of the working tree
+_STORE_DIR = tempfile.mkdtemp(prefix="sentiant-tests-")
+for name, filename in {
+    "SENTIMENT_CACHE_PATH": "sentiment_cache.sqlite3",
+    "CURSOR_STORE_PATH": "cursors.sqlite3",
+    "CREDITS_DB_PATH": "credits.sqlite3",
+    "JOBS_DB_PATH": "jobs.sqlite3",
+    "POSTS_SPILL_PATH": "posts_spill.jsonl",
+    "POSTS_DEAD_LETTER_PATH": "posts_dead_letter.jsonl",
+}.items():
+    os.environ.setdefault(name, os.path.join(_STORE_DIR, filename))
+
+# Client modules refuse to import without credentials; tests never reach the real APIs
+for name in (
+    "GOOGLE_API_KEY", "HF_API_TOKEN", "NEWS_API_KEY", "YOUTUBE_API_KEY", "TWITTER_BEARER_TOKEN",
+    "REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET", "REDDIT_USERNAME", "REDDIT_PASSWORD", "REDDIT_USER_AGENT",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJyb2xlIjoiYW5vbiJ9.test")
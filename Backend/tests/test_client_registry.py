@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils import executors
+from app.utils.client_registry import ClientRegistry
+from app.utils.executors import run_blocking
+
+
+@pytest.fixture
+def test_executor(monkeypatch):
+    monkeypatch.setitem(executors.EXECUTOR_SIZES, "test", 3)
+    yield "test"
+    executor = executors._executors.pop("test", None)
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def test_per_thread_clients_are_warmed_on_their_executor_threads(test_executor):
+    registry = ClientRegistry()
+    built_on = []
+    warmed = []
+
+    def factory():
+        built_on.append(threading.current_thread().name)
+        return object()
+
+    registry.register("sdk", factory, per_thread=True, warm=warmed.append, executor=test_executor)
+    registry.register("lazy", object, per_thread=True)
+    registry.register("shared", object)
+    registry.startup()
+
+    assert len(built_on) == 3 and len(set(built_on)) == 3
+    assert all(name.startswith("test-io") for name in built_on)
+    assert len(warmed) == 3
+    stats = registry.stats()
+    assert stats["sdk"]["instances"] == 3
+    assert stats["lazy"]["instances"] == 0
+    assert stats["shared"]["instances"] == 1
+
+    async def use():
+        return await asyncio.gather(*(run_blocking(test_executor, registry.get, "sdk") for _ in range(20)))
+
+    clients = asyncio.run(use())
+    # Requests reuse the warmed instances instead of building their own
+    assert len(built_on) == 3
+    assert set(map(id, clients)) <= set(map(id, registry._thread_instances["sdk"]))
+
+
+def test_warm_up_failures_are_logged_not_raised(test_executor):
+    registry = ClientRegistry()
+
+    def broken():
+        raise RuntimeError("no network")
+
+    registry.register("sdk", broken, per_thread=True, executor=test_executor)
+    registry.register("shared", broken)
+    registry.startup()
+    assert registry.stats()["sdk"]["instances"] == 0
@@ -0,0 +1,51 @@
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.route import full_report_routes
+from app.utils.credit_manager import DEFAULT_CREDITS, credit_manager
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(full_report_routes.router)
+    return TestClient(app)
+
+
+def test_job_submission_charges_guest_credits_off_the_loop(monkeypatch):
+    threads = []
+    use_credit, get_credits = credit_manager.use_credit, credit_manager.get_credits
+
+    def recording_use(session_id):
+        threads.append(threading.current_thread().name)
+        return use_credit(session_id)
+
+    def recording_get(session_id):
+        threads.append(threading.current_thread().name)
+        return get_credits(session_id)
+
+    async def submit(params, authenticated):
+        return {"job_id": "j", "status": "queued", "queue_depth": 1}
+
+    monkeypatch.setattr(credit_manager, "use_credit", recording_use)
+    monkeypatch.setattr(credit_manager, "get_credits", recording_get)
+    monkeypatch.setattr(full_report_routes.report_jobs, "submit", submit)
+    session_id = credit_manager.create_session()
+
+    with _client() as client:
+        headers = {"X-Session-Id": session_id}
+        for remaining in range(DEFAULT_CREDITS - 1, -1, -1):
+            response = client.post("/generate-full-report/jobs", json={"topic": "ai"}, headers=headers)
+            assert response.status_code == 202
+            assert response.json()["credits_remaining"] == remaining
+        assert client.post("/generate-full-report/jobs", json={"topic": "ai"}, headers=headers).status_code == 402
+        unknown = client.post("/generate-full-report/jobs", json={"topic": "ai"}, headers={"X-Session-Id": "nope"})
+        assert unknown.status_code == 404
+
+    assert threads and all(name.startswith("sqlite-io") for name in threads)
+
+
+def test_guests_need_a_session(monkeypatch):
+    with _client() as client:
+        assert client.post("/generate-full-report/jobs", json={"topic": "ai"}).status_code == 401
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.utils import gemini_client
+from app.utils.model_health import ModelHealthRegistry
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def _ok(text):
+    return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Route Gemini calls to a scripted handler; returns the list of models called."""
+    calls = []
+    responses = []
+    monkeypatch.setattr(gemini_client, "model_health", ModelHealthRegistry())
+
+    def handler(request):
+        calls.append(request.url.path.split("/models/")[1].split(":")[0])
+        return responses.pop(0)
+
+    def client(upstream):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    monkeypatch.setattr(gemini_client.http_pool, "async_client", client)
+    return calls, responses
+
+
+def test_retryable_error_falls_back_to_the_next_model(gemini):
+    calls, responses = gemini
+    responses += [httpx.Response(503, json={"error": {"message": "overloaded"}}), _ok("fallback answer")]
+    text = asyncio.run(gemini_client.gemini_chat_generate_async(MESSAGES, hedge=False))
+    assert text == "fallback answer"
+    assert len(calls) == 2 and calls[0] != calls[1]
+    assert not gemini_client.model_health.is_healthy(calls[0])
+
+
+def test_non_retryable_error_is_raised_at_once(gemini):
+    calls, responses = gemini
+    responses.append(httpx.Response(400, json={"error": {"message": "bad request"}}))
+    with pytest.raises(Exception, match="400"):
+        asyncio.run(gemini_client.gemini_chat_generate_async(MESSAGES, hedge=False))
+    assert len(calls) == 1
+
+
+def _fallbacks():
+    return sum(
+        sample.value
+        for family in gemini_client.GEMINI_FALLBACKS.collect()
+        for sample in family.samples
+        if sample.name.endswith("_total")
+    )
+
+
+@pytest.mark.parametrize("call", ["generate", "stream"])
+def test_exhausted_retries_report_the_last_error_without_a_phantom_fallback(gemini, monkeypatch, call):
+    calls, responses = gemini
+    monkeypatch.setattr(gemini_client, "calculate_delay", lambda attempt: 0)
+    responses += [httpx.Response(503, json={"error": {"message": f"overloaded {i}"}}) for i in range(gemini_client.MAX_RETRIES)]
+    before = _fallbacks()
+
+    async def run():
+        if call == "generate":
+            return await gemini_client.gemini_chat_generate_async(MESSAGES, hedge=False)
+        return [chunk async for chunk in gemini_client.gemini_chat_stream_async(MESSAGES)]
+
+    with pytest.raises(Exception, match=f"after {gemini_client.MAX_RETRIES} attempts.*overloaded {gemini_client.MAX_RETRIES - 1}"):
+        asyncio.run(run())
+    assert len(calls) == gemini_client.MAX_RETRIES
+    # Only switches followed by another request count as fallbacks
+    assert _fallbacks() - before == gemini_client.MAX_RETRIES - 1
@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import twitter
+from app.utils.cursor_store import CursorStore, cursor_store
+
+
+def _tweet(tweet_id, text):
+    return SimpleNamespace(id=tweet_id, text=text, author_id=1, created_at=None)
+
+
+def test_record_run_keeps_listing_order_across_runs(tmp_path):
+    store = CursorStore(path=str(tmp_path / "cursors.sqlite3"))
+    first = store.record_run("AI", "x", {"n": 1}, [("a", {"id": "a"}), ("b", {"id": "b"})], limit=10)
+    assert [(item["id"], item["new"]) for item in first] == [("a", True), ("b", True)]
+    second = store.record_run("ai", "x", {"n": 2}, [("c", {"id": "c"})], limit=10)
+    assert [(item["id"], item["new"]) for item in second] == [("c", True), ("a", False), ("b", False)]
+    assert store.get_cursor("  ai ", "x") == {"n": 2}
+
+
+def _run_twitter(monkeypatch, tweets, failing_ids=()):
+    seen_since = []
+
+    def fetch(query, max_results, since_id=None):
+        seen_since.append(since_id)
+        return tweets
+
+    async def sentiment(texts, dedup=None):
+        return [
+            {"error": "inference failed"} if any(str(i) in text for i in failing_ids) else {"label": "POSITIVE", "score": 0.9}
+            for text in texts
+        ]
+
+    monkeypatch.setattr(twitter, "fetch_recent_tweets", fetch)
+    monkeypatch.setattr(twitter, "analyze_sentiment_batch_async", sentiment)
+    monkeypatch.setattr(twitter.post_queue, "enqueue", lambda posts: None)
+    result = asyncio.run(twitter.analyze_tweets_sentiment("cursor topic", 10, incremental=True))
+    return result, seen_since[0]
+
+
+def test_twitter_cursor_stops_before_failed_tweets(monkeypatch):
+    tweets = [_tweet(i, f"tweet number {i}") for i in (15, 14, 13, 12, 11)]
+    result, since = _run_twitter(monkeypatch, tweets, failing_ids=(13,))
+    assert since is None
+    assert [item["text"] for item in result] == ["tweet number 15", "tweet number 14", "tweet number 12", "tweet number 11"]
+    assert cursor_store.get_cursor("cursor topic", "twitter") == {"since_id": "12"}
+
+    # The failed tweet is fetched again; tweets analyzed last time are stored once
+    result, since = _run_twitter(monkeypatch, tweets[:3])
+    assert since == "12"
+    assert cursor_store.get_cursor("cursor topic", "twitter") == {"since_id": "15"}
+    assert sorted(item["text"] for item in result) == [f"tweet number {i}" for i in (11, 12, 13, 14, 15)]
+
+
+def test_twitter_cursor_moves_past_tweets_dropped_by_preprocessing(monkeypatch):
+    tweets = [_tweet(30, "https://t.co/abc"), _tweet(29, "a real opinion")]
+    result, _ = _run_twitter(monkeypatch, tweets)
+    assert cursor_store.get_cursor("cursor topic", "twitter") == {"since_id": "30"}
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services import jobs
+from app.services.jobs import QueueFull, ReportJobQueue
+
+
+def _fake_stream(order=None, gate=None):
+    async def stream(**params):
+        if gate is not None and params["topic"] == "blocker":
+            await gate.wait()
+        if order is not None:
+            order.append(params["topic"])
+        for source in ("reddit", "youtube", "twitter"):
+            yield "source", {"source": source, "status": "ok", "analyzed_comments": [{"text": source}]}
+        yield "news", {"news_summary": "summary", "news_articles": []}
+        yield "report", {"text": "REPORT"}
+        yield "done", {"sources_status": {}, "report_status": "ok", "prompt_stats": {}}
+    return stream
+
+
+async def _wait_for(queue, job_id, status):
+    for _ in range(500):
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_job_runs_to_completion_with_db_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_full_report", _fake_stream())
+    queue = ReportJobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1)
+    threads = []
+    execute = queue._execute
+
+    def recording_execute(sql, args=()):
+        threads.append(threading.current_thread())
+        return execute(sql, args)
+
+    async def run():
+        queue.start()
+        monkeypatch.setattr(queue, "_execute", recording_execute)
+        job = await queue.submit({"topic": "ai"}, authenticated=True)
+        done = await _wait_for(queue, job["job_id"], "done")
+        await queue.stop()
+        return threading.current_thread(), done
+
+    loop_thread, done = asyncio.run(run())
+    assert done["result"]["report"] == "REPORT"
+    assert [c["text"] for c in done["result"]["analyzed_comments"]] == ["reddit", "youtube", "twitter"]
+    assert threads and all(thread is not loop_thread for thread in threads)
+
+
+def test_partial_writes_are_throttled(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "stream_full_report", _fake_stream())
+    monkeypatch.setattr(jobs, "JOB_PARTIAL_INTERVAL", 60)
+    queue = ReportJobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1)
+    writes = []
+    persist = queue._persist_partial
+
+    async def counting_persist(job_id, state):
+        writes.append(job_id)
+        await persist(job_id, state)
+
+    monkeypatch.setattr(queue, "_persist_partial", counting_persist)
+
+    async def run():
+        queue.start()
+        job = await queue.submit({"topic": "ai"}, authenticated=True)
+        await _wait_for(queue, job["job_id"], "done")
+        await queue.stop()
+
+    asyncio.run(run())
+    # Four source/news events, one write within the interval
+    assert len(writes) == 1
+
+
+def test_authenticated_jobs_run_before_earlier_guest_jobs(tmp_path, monkeypatch):
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+        monkeypatch.setattr(jobs, "stream_full_report", _fake_stream(order, gate))
+        queue = ReportJobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1)
+        queue.start()
+        blocker = await queue.submit({"topic": "blocker"}, authenticated=True)
+        await _wait_for(queue, blocker["job_id"], "running")
+        guest = await queue.submit({"topic": "guest"}, authenticated=False)
+        member = await queue.submit({"topic": "member"}, authenticated=True)
+        assert (await queue.get(guest["job_id"]))["queue_position"] == 2
+        gate.set()
+        await _wait_for(queue, guest["job_id"], "done")
+        await queue.stop()
+
+    asyncio.run(run())
+    assert order == ["blocker", "member", "guest"]
+
+
+def test_full_queue_rejects_submissions(tmp_path, monkeypatch):
+    async def run():
+        gate = asyncio.Event()
+        monkeypatch.setattr(jobs, "stream_full_report", _fake_stream(gate=gate))
+        queue = ReportJobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1, max_queued=1)
+        queue.start()
+        blocker = await queue.submit({"topic": "blocker"}, authenticated=True)
+        await _wait_for(queue, blocker["job_id"], "running")
+        await queue.submit({"topic": "queued"}, authenticated=True)
+        with pytest.raises(QueueFull):
+            await queue.submit({"topic": "rejected"}, authenticated=True)
+        gate.set()
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_interrupted_jobs_are_recovered_on_start(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def interrupted():
+        monkeypatch.setattr(jobs, "stream_full_report", _fake_stream(gate=asyncio.Event()))
+        queue = ReportJobQueue(path=path, workers=1)
+        queue.start()
+        job = await queue.submit({"topic": "blocker"}, authenticated=True)
+        await _wait_for(queue, job["job_id"], "running")
+        await queue.stop()
+        return job["job_id"]
+
+    async def restarted(job_id):
+        monkeypatch.setattr(jobs, "stream_full_report", _fake_stream())
+        queue = ReportJobQueue(path=path, workers=1)
+        queue.start()
+        done = await _wait_for(queue, job_id, "done")
+        stats = queue.stats()
+        await queue.stop()
+        return done, stats
+
+    job_id = asyncio.run(interrupted())
+    done, stats = asyncio.run(restarted(job_id))
+    assert done["result"]["report"] == "REPORT"
+    assert stats["recovered"] == 1
+
+
+def _counting_stream(runs, gates):
+    async def stream(**params):
+        runs.append(params["topic"])
+        if params["topic"] in gates:
+            await gates[params["topic"]].wait()
+        yield "report", {"text": params["topic"]}
+        yield "done", {"sources_status": {}, "report_status": "ok", "prompt_stats": {}}
+    return stream
+
+
+def test_workers_sharing_a_database_run_each_job_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+
+    async def run():
+        gates = {"blocker": asyncio.Event()}
+        monkeypatch.setattr(jobs, "stream_full_report", _counting_stream(runs, gates))
+        first = ReportJobQueue(path=path, workers=1)
+        first.start()
+        blocker = await first.submit({"topic": "blocker"}, authenticated=True)
+        await _wait_for(first, blocker["job_id"], "running")
+        queued = await first.submit({"topic": "queued"}, authenticated=True)
+
+        # A second process starting later leaves the live job alone and takes the queued one
+        second = ReportJobQueue(path=path, workers=2)
+        second.start()
+        await _wait_for(second, queued["job_id"], "done")
+        assert (await second.get(blocker["job_id"]))["status"] == "running"
+        assert second.stats()["recovered"] == 0
+
+        gates["blocker"].set()
+        await _wait_for(first, blocker["job_id"], "done")
+        await first.stop()
+        await second.stop()
+
+    asyncio.run(run())
+    assert sorted(runs) == ["blocker", "queued"]
+
+
+def test_job_with_expired_lease_is_taken_over(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+
+    async def run():
+        gates = {"stuck": asyncio.Event()}
+        monkeypatch.setattr(jobs, "stream_full_report", _counting_stream(runs, gates))
+        crashed = ReportJobQueue(path=path, workers=1)
+        crashed.start()
+        job = await crashed.submit({"topic": "stuck"}, authenticated=True)
+        await _wait_for(crashed, job["job_id"], "running")
+        # The owner stops renewing its lease, as after a crash
+        crashed._lease_task.cancel()
+        crashed._execute("UPDATE jobs SET heartbeat_at = ?", (0,))
+
+        gates.pop("stuck")
+        takeover = ReportJobQueue(path=path, workers=1)
+        takeover.start()
+        done = await _wait_for(takeover, job["job_id"], "done")
+        assert takeover.stats()["recovered"] == 1
+
+        # The original owner finishing late does not overwrite the result
+        await crashed._finish(job["job_id"], "failed", error="late")
+        assert (await takeover.get(job["job_id"]))["status"] == "done"
+        for worker in crashed._workers:
+            worker.cancel()
+        await takeover.stop()
+        return done
+
+    done = asyncio.run(run())
+    assert done["result"]["report"] == "stuck"
+    assert runs == ["stuck", "stuck"]
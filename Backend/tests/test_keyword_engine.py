@@ -0,0 +1,112 @@
+import pytest
+
+from app.services import keyword_engine as ke
+from app.services.keyword_engine import DecayedCounter, KeywordEngine, extract_terms
+
+T0 = 1_000_000.0
+HOUR = 3600.0
+
+
+def test_extract_terms_keeps_phrases_bounded_by_content_words():
+    terms = extract_terms("Game of Thrones finale review")
+    assert {"game", "thrones", "finale", "game of thrones", "thrones finale"} <= terms
+    assert "of thrones" not in terms and "review" not in terms
+
+
+def test_counts_halve_every_half_life():
+    counter = DecayedCounter(half_life=HOUR, now=T0)
+    counter.add(["a", "a", "b"], T0)
+    assert counter.get("a", T0 + HOUR) == pytest.approx(1.0)
+    assert counter.total(T0 + 2 * HOUR) == pytest.approx(0.75)
+
+
+def test_rescaling_preserves_counts_and_prunes_tiny_ones():
+    counter = DecayedCounter(half_life=HOUR, now=T0)
+    counter.add(["old"], T0)
+    later = T0 + 20 * HOUR
+    counter.add(["kept"], later - HOUR)
+    before = counter.get("kept", later)
+    counter._rescale(later)
+    assert counter.origin == later
+    assert counter.get("kept", later) == pytest.approx(before)
+    # 2**-20 is below PRUNE_BELOW
+    assert "old" not in counter.counts
+    # Far past the point where exp() would overflow without rescaling
+    counter.add(["new"], T0 + 10_000 * HOUR)
+    assert counter.get("new", T0 + 10_000 * HOUR) == pytest.approx(1.0)
+
+
+def test_sudden_terms_outrank_steady_ones():
+    engine = KeywordEngine(fast_half_life=HOUR, slow_half_life=48 * HOUR, now=T0)
+    for hour in range(48):
+        engine.ingest([f"weather update {hour} {i}" for i in range(5)], now=T0 + hour * HOUR)
+    now = T0 + 48 * HOUR
+    engine.ingest([f"weather update late {i}" for i in range(5)] + [f"eclipse spotted {i}" for i in range(5)], now=now)
+    terms = engine.top_terms(5, now=now)
+    # Both appear five times in the latest batch, but only one is new
+    assert terms.index("eclipse spotted") < terms.index("weather update")
+
+
+def test_cohesive_phrases_replace_their_words():
+    engine = KeywordEngine(now=T0)
+    engine.ingest(
+        [f"new york marathon {word}" for word in "alpha beta gamma delta epsilon zeta".split()]
+        + ["york minster bells", "york minster choir"],
+        now=T0,
+    )
+    terms = engine.top_terms(2, now=T0)
+    # "york marathon" accounts for most uses of "york" and "marathon", so it replaces
+    # them; "york minster" covers too few uses of "york" to count as a phrase
+    assert terms == ["york marathon", "minster"]
+
+
+def test_repeated_titles_are_counted_once():
+    engine = KeywordEngine(now=T0)
+    assert engine.ingest(["Solar eclipse tonight", "solar ECLIPSE tonight!"], now=T0) == 1
+    assert engine.ingest(["Solar eclipse tonight"], now=T0 + 60) == 0
+    assert engine.stats()["duplicate_titles"] == 2
+
+
+def test_min_count_filters_one_off_terms(monkeypatch):
+    monkeypatch.setattr(ke, "KEYWORD_MIN_COUNT", 2)
+    engine = KeywordEngine(now=T0)
+    engine.ingest(["singular oddity", "common topic one", "common topic two"], now=T0)
+    top = engine.top(10, now=T0)
+    # Terms below the minimum only follow, as single words ranked by frequency
+    assert top[0]["term"] == "common topic" and top[0]["count"] == 2
+    assert {entry["term"] for entry in top[1:]} == {"singular", "oddity", "one", "two"}
+
+
+TRENDING_TITLES = [
+    "I Built a Secret Underground Base",
+    "Taylor Swift - Fortnight (Lyric Video)",
+    "Lakers vs Celtics Game 7 Highlights",
+    "We Tried Every Fast Food Burger",
+    "iPhone 16 Pro Max Unboxing",
+    "Minecraft Hardcore Day 100",
+    "SpaceX Starship Flight Test Recap",
+    "Gordon Ramsay Reacts to Viral Recipes",
+    "Marvel Studios Thunderbolts Teaser",
+    "Why Nobody Buys Electric Cars",
+    "MrBeast Gives Away Island",
+    "Premier League Goals of the Week",
+    "Cooking Steak in a Volcano",
+    "NASA Moon Mission Briefing",
+    "Fortnight Dance Challenge Compilation",
+]
+
+
+def test_a_single_small_feed_still_yields_topics():
+    engine = KeywordEngine(now=T0)
+    engine.ingest(TRENDING_TITLES, now=T0)
+    terms = engine.top_terms(12, now=T0)
+    assert len(terms) == 12
+    # The only word in two titles leads; the rest are single content words
+    assert terms[0] == "fortnight"
+    assert all(" " not in term and term not in ke.STOPWORDS for term in terms)
+
+
+def test_terms_at_the_minimum_count_survive_decay():
+    engine = KeywordEngine(now=T0)
+    engine.ingest(["solar eclipse tonight", "solar eclipse guide"], now=T0)
+    assert engine.top_terms(1, now=T0 + 60) == ["solar eclipse"]
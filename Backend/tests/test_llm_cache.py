@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import llm_cache as lc
+from app.utils.llm_cache import LLMResponseCache, llm_cache_key
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(lc, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+class Generator:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return f"answer {self.calls}"
+
+
+def test_key_ignores_whitespace_but_not_config():
+    messages = [{"role": "user", "content": "What  is\nAI?"}]
+    assert llm_cache_key(messages) == llm_cache_key([{"role": "user", "content": "What is AI?"}])
+    assert llm_cache_key(messages) != llm_cache_key(messages, {"temperature": 0.1})
+    assert llm_cache_key(messages, model="a") != llm_cache_key(messages, model="b")
+
+
+def test_fresh_hit_then_miss_after_ttl(clock):
+    cache = LLMResponseCache()
+    generate = Generator()
+
+    async def run():
+        first = await cache.get_or_generate("k", generate, ttl=10)
+        clock.now += 5
+        hit = await cache.get_or_generate("k", generate, ttl=10)
+        clock.now += 10
+        expired = await cache.get_or_generate("k", generate, ttl=10)
+        return first, hit, expired
+
+    assert asyncio.run(run()) == ("answer 1", "answer 1", "answer 2")
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_stale_entries_are_served_while_one_refresh_runs(clock):
+    cache = LLMResponseCache()
+    generate = Generator(delay=0.01)
+
+    async def run():
+        await cache.get_or_generate("k", generate, ttl=10, stale_ttl=60)
+        clock.now += 30
+        stale = await asyncio.gather(*(cache.get_or_generate("k", generate, ttl=10, stale_ttl=60) for _ in range(3)))
+        await asyncio.sleep(0.05)
+        refreshed = await cache.get_or_generate("k", generate, ttl=10, stale_ttl=60)
+        return stale, refreshed
+
+    stale, refreshed = asyncio.run(run())
+    assert stale == ["answer 1"] * 3
+    assert refreshed == "answer 2"
+    assert generate.calls == 2
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_failures_are_not_cached(clock):
+    cache = LLMResponseCache()
+    generate = Generator()
+    generate.fail = True
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_generate("k", generate, ttl=10)
+        generate.fail = False
+        return await cache.get_or_generate("k", generate, ttl=10)
+
+    assert asyncio.run(run()) == "answer 2"
+
+
+def test_lru_evicts_the_least_recently_used(clock):
+    cache = LLMResponseCache(max_entries=2)
+    generate = Generator()
+
+    async def run():
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_generate(key, generate, ttl=10)
+
+    asyncio.run(run())
+    assert list(cache._entries) == ["a", "c"]
+
+
+def test_concurrent_misses_share_one_call():
+    flight = SingleFlight()
+    generate = Generator(delay=0.01)
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", generate) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["answer 1"] * 5
+    assert generate.calls == 1
+    assert flight.stats() == {"leaders": 1, "followers": 4, "in_flight": 0}
+
+
+def test_cancelling_one_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    generate = Generator(delay=0.05)
+
+    async def run():
+        leader = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        assert leader.cancelled()
+        return result
+
+    assert asyncio.run(run()) == "answer 1"
+    assert generate.calls == 1
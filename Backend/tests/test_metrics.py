@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Histogram, generate_latest
+
+from app.route import stats_routes
+from app.utils.metrics import STAGE_DURATION, STAGE_FAILURES, _CacheCollector, stage, timed
+
+
+def _value(metric, suffix, **labels):
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name.endswith(suffix) and sample.labels == labels:
+                return sample.value
+    return 0.0
+
+
+def test_stage_decorator_times_sync_and_async_calls_and_counts_failures():
+    @stage("test_sync")
+    def fetch(ok):
+        return [1] if ok else {"error": "quota"}
+
+    @stage("test_async")
+    async def infer():
+        raise RuntimeError("model crashed")
+
+    fetch(True)
+    fetch(False)
+    try:
+        asyncio.run(infer())
+    except RuntimeError:
+        pass
+
+    assert _value(STAGE_DURATION, "_count", stage="test_sync") == 2
+    assert _value(STAGE_FAILURES, "_total", stage="test_sync") == 1
+    assert _value(STAGE_DURATION, "_count", stage="test_async") == 1
+    assert _value(STAGE_FAILURES, "_total", stage="test_async") == 1
+    assert asyncio.iscoroutinefunction(infer) and fetch.__name__ == "fetch"
+
+
+def test_timed_observes_into_the_given_histogram():
+    registry = CollectorRegistry()
+    histogram = Histogram("test_op_seconds", "test", ["operation"], registry=registry)
+
+    @timed(histogram, operation="lookup")
+    def lookup():
+        return None
+
+    lookup()
+    assert 'test_op_seconds_count{operation="lookup"} 1.0' in generate_latest(registry).decode()
+
+
+def test_cache_collector_reads_stats_at_scrape_time():
+    registry = CollectorRegistry()
+    collector = _CacheCollector()
+    counters = {"hits": 3, "stale_hits": 1, "misses": 4, "hit_ratio": 0.5, "entries": 9}
+    collector.add("llm", lambda: counters)
+    registry.register(collector)
+    counters["hits"] = 5
+    output = generate_latest(registry).decode()
+    assert 'sentiant_cache_lookups_total{cache="llm",result="hits"} 5.0' in output
+    assert 'sentiant_cache_lookups_total{cache="llm",result="misses"} 4.0' in output
+    assert 'sentiant_cache_hit_ratio{cache="llm"} 0.5' in output
+    assert "entries" not in output
+
+
+def test_metrics_route_serves_prometheus_text():
+    app = FastAPI()
+    app.include_router(stats_routes.router)
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "sentiant_stage_duration_seconds" in response.text
+    assert 'sentiant_cache_hit_ratio{cache="sentiment"}' in response.text
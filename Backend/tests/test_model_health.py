@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import model_health as mh
+from app.utils.model_health import ModelHealthRegistry, parse_retry_after
+
+MODELS = ["primary", "secondary", "tertiary"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(mh, "time", SimpleNamespace(monotonic=lambda: clock.now, time=lambda: clock.now))
+    return clock
+
+
+def test_circuit_opens_after_repeated_failures_and_probes_when_half_open(clock):
+    registry = ModelHealthRegistry()
+    for _ in range(mh.CIRCUIT_FAILURE_THRESHOLD):
+        registry.record_failure("primary", error="timeout")
+    assert registry.snapshot()["primary"]["state"] == mh.OPEN
+    assert registry.pick(MODELS) == "secondary"
+
+    clock.now += mh.CIRCUIT_OPEN_SECONDS
+    # Open time elapsed: the model is tried again as a half-open probe
+    assert registry.pick(["primary"]) == "primary"
+    assert registry.snapshot()["primary"]["state"] == mh.HALF_OPEN
+    # While the probe is out, other requests avoid the model
+    assert registry.pick(MODELS) == "secondary"
+
+    registry.record_failure("primary", error="timeout")
+    snapshot = registry.snapshot()["primary"]
+    assert snapshot["state"] == mh.OPEN
+    assert snapshot["open_for"] == pytest.approx(2 * mh.CIRCUIT_OPEN_SECONDS)
+
+    clock.now += 2 * mh.CIRCUIT_OPEN_SECONDS
+    registry.pick(["primary"])
+    registry.record_success("primary", latency=0.5)
+    assert registry.is_healthy("primary")
+    assert registry.pick(MODELS) == "primary"
+
+
+def test_rate_limits_cool_a_model_down_for_retry_after(clock):
+    registry = ModelHealthRegistry()
+    registry.record_failure("primary", status_code=429, retry_after=20)
+    assert not registry.is_healthy("primary")
+    assert registry.pick(MODELS) == "secondary"
+    clock.now += 21
+    registry.record_success("primary")
+    assert registry.pick(MODELS) == "primary"
+
+
+def test_all_unavailable_returns_the_one_recovering_soonest(clock):
+    registry = ModelHealthRegistry()
+    registry.record_failure("primary", status_code=429, retry_after=60)
+    registry.record_failure("secondary", status_code=429, retry_after=10)
+    registry.record_failure("tertiary", status_code=503, retry_after=30)
+    assert registry.pick(MODELS) == "secondary"
+    assert registry.pick(MODELS, exclude={"secondary"}) == "tertiary"
+    assert registry.pick(MODELS, exclude=set(MODELS)) is None
+
+
+def test_latency_ewma_and_percentiles(clock):
+    registry = ModelHealthRegistry()
+    registry.record_success("primary", latency=1.0)
+    registry.record_success("primary", latency=2.0)
+    assert registry.snapshot()["primary"]["latency_ewma_ms"] == int((1.0 + mh.LATENCY_EWMA_ALPHA * 1.0) * 1000)
+    for latency in (3.0, 4.0, 5.0):
+        registry.observe_latency("primary", latency)
+    assert registry.latency_percentile("primary", 50) == 3.0
+    assert registry.latency_percentile("primary", 100) == 5.0
+    assert registry.latency_percentile("primary", 95, min_samples=10) is None
+
+
+def test_markedly_slower_models_are_ranked_after_faster_ones(clock):
+    registry = ModelHealthRegistry()
+    registry.record_success("primary", latency=10.0)
+    registry.record_success("secondary", latency=1.0)
+    assert registry.pick(MODELS[:2]) == "secondary"
+    registry.record_success("primary", latency=1.0)
+    for _ in range(20):
+        registry.record_success("primary", latency=1.0)
+    assert registry.pick(MODELS[:2]) == "primary"
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,122 @@
+import asyncio
+
+from app.utils.near_dedup import NearDuplicateIndex, normalize_text, simhash
+
+SHARED = "this phone has the best battery life i have ever seen in a flagship and the screen is gorgeous too"
+OTHER = "the camera struggles badly in low light compared to last year model and the software feels slow"
+
+
+def _positive(texts):
+    return [{"label": "POSITIVE", "score": 0.9} for _ in texts]
+
+
+def test_normalize_strips_case_urls_and_punctuation():
+    assert normalize_text("Great video!! https://youtu.be/x  WOW") == "great video wow"
+
+
+def test_simhash_is_stable_and_close_for_near_duplicates():
+    words = normalize_text(SHARED).split()
+    edited = normalize_text(SHARED.replace("gorgeous", "stunning")).split()
+    assert simhash(words) == simhash(list(words))
+    assert bin(simhash(words) ^ simhash(edited)).count("1") <= 7
+
+
+def test_assign_groups_exact_and_near_duplicates():
+    index = NearDuplicateIndex()
+    first = index.assign(SHARED)
+    assert index.assign(SHARED.upper() + "!!!") == first
+    assert index.assign(SHARED.replace("gorgeous", "stunning")) == first
+    assert index.assign(OTHER) != first
+    stats = index.stats()
+    assert stats["clusters"] == 2
+    assert stats["exact_duplicates"] == 1
+    assert stats["near_duplicates"] == 1
+
+
+def test_short_texts_only_match_exactly():
+    index = NearDuplicateIndex()
+    assert index.assign("love it") != index.assign("hate it")
+
+
+def test_collapse_counts_duplicates_in_first_seen_order():
+    index = NearDuplicateIndex()
+    items = [{"text": SHARED}, {"text": OTHER}, {"text": SHARED + "."}, {"title": "no text"}]
+    representatives, stats = index.collapse(items)
+    assert [item.get("text") for item in representatives] == [SHARED, OTHER, None]
+    assert representatives[0]["count"] == 2
+    assert "count" not in representatives[1]
+    assert stats == {"comments_before_dedup": 4, "duplicates_collapsed": 1}
+
+
+def test_analyze_classifies_each_cluster_once():
+    index = NearDuplicateIndex()
+    calls = []
+
+    async def batch(texts):
+        calls.append(list(texts))
+        return _positive(texts)
+
+    async def run():
+        first = await index.analyze([SHARED, OTHER, SHARED], batch)
+        second = await index.analyze([SHARED.upper()], batch)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls == [[SHARED, OTHER]]
+    assert len(first) == 3 and second[0]["label"] == "POSITIVE"
+    # Every caller gets its own copy
+    assert first[0] is not first[2]
+
+
+def test_follower_survives_leader_cancellation():
+    index = NearDuplicateIndex()
+    calls = []
+
+    async def run():
+        leader_started = asyncio.Event()
+
+        async def hanging(texts):
+            calls.append(("leader", list(texts)))
+            leader_started.set()
+            await asyncio.Event().wait()
+
+        async def slow(texts):
+            calls.append(("follower", list(texts)))
+            # The leader is cancelled while this source is still classifying its own clusters
+            await asyncio.sleep(0.05)
+            return _positive(texts)
+
+        leader = asyncio.create_task(index.analyze([SHARED], hanging))
+        await leader_started.wait()
+        follower = asyncio.create_task(index.analyze([SHARED, OTHER], slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        assert leader.cancelled()
+        return result
+
+    result = asyncio.run(run())
+    assert [r["label"] for r in result] == ["POSITIVE", "POSITIVE"]
+    assert calls == [("leader", [SHARED]), ("follower", [OTHER]), ("follower", [SHARED])]
+
+
+def test_cancelled_follower_leaves_leader_untouched():
+    index = NearDuplicateIndex()
+
+    async def run():
+        release = asyncio.Event()
+
+        async def gated(texts):
+            await release.wait()
+            return _positive(texts)
+
+        leader = asyncio.create_task(index.analyze([SHARED], gated))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(index.analyze([SHARED], gated))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await leader
+
+    assert asyncio.run(run())[0]["label"] == "POSITIVE"
@@ -0,0 +1,166 @@
+import json
+import time
+
+from postgrest.exceptions import APIError
+
+from app.services.persistence import PostWriteBehindQueue, _file_lock, _is_permanent
+
+
+class FlakyInsert:
+    def __init__(self, rejected=()):
+        self.failing = False
+        self.rejected = set(rejected)
+        self.rows = []
+        self.calls = 0
+
+    def __call__(self, posts):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError("supabase unavailable")
+        if any(post["content"] in self.rejected for post in posts):
+            raise APIError({"code": "23502", "message": "null value in column violates not-null constraint"})
+        self.rows.extend(posts)
+
+
+def _queue(tmp_path, insert, **kwargs):
+    options = dict(
+        batch_size=2, flush_interval=0.01, max_buffer=10, spill_path=str(tmp_path / "spill.jsonl"),
+        dead_letter_path=str(tmp_path / "dead.jsonl"), retry_backoff=0, insert=insert,
+    )
+    return PostWriteBehindQueue(**{**options, **kwargs})
+
+
+def _posts(n, start=0):
+    return [{"content": f"post {i}"} for i in range(start, start + n)]
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_failed_batches_spill_and_replay_once_writes_recover(tmp_path):
+    insert = FlakyInsert()
+    queue = _queue(tmp_path, insert)
+    insert.failing = True
+    queue.enqueue(_posts(4))
+    queue._flush([(time.monotonic(), post) for post in _posts(4)])
+    assert queue.stats()["spill_pending"]
+    insert.failing = False
+    queue._replay_spill()
+    assert [row["content"] for row in insert.rows] == [f"post {i}" for i in range(4)]
+    assert not queue.stats()["spill_pending"]
+
+
+def test_overflow_spills_instead_of_blocking(tmp_path):
+    insert = FlakyInsert()
+    queue = _queue(tmp_path, insert)
+    queue.enqueue(_posts(12))
+    with open(queue.spill_path) as f:
+        assert [json.loads(line)["post"]["content"] for line in f] == ["post 10", "post 11"]
+    assert queue.stats()["pending"] == 10
+
+
+def test_replaying_file_left_by_a_crash_is_recovered(tmp_path):
+    insert = FlakyInsert()
+    queue = _queue(tmp_path, insert)
+    with open(queue.replay_path, "w") as f:
+        for post in _posts(3):
+            f.write(json.dumps(post) + "\n")
+    queue.start()
+    try:
+        _wait(lambda: len(insert.rows) == 3)
+    finally:
+        queue.stop()
+    assert not queue.stats()["spill_pending"]
+
+
+def test_replay_is_skipped_while_another_process_replays(tmp_path):
+    insert = FlakyInsert()
+    queue = _queue(tmp_path, insert)
+    queue._spill([(0, post) for post in _posts(2)])
+    with _file_lock(queue.spill_path + ".replay.lock"):
+        queue._replay_spill()
+        assert insert.rows == []
+    queue._replay_spill()
+    assert len(insert.rows) == 2
+
+
+def test_stop_spills_what_could_not_be_written(tmp_path):
+    insert = FlakyInsert()
+    insert.failing = True
+    queue = _queue(tmp_path, insert)
+    queue.start()
+    queue.enqueue(_posts(3))
+    queue.stop()
+    insert.failing = False
+    queue._replay_spill()
+    assert sorted(row["content"] for row in insert.rows) == [f"post {i}" for i in range(3)]
+
+
+def _dead(queue):
+    with open(queue.dead_letter_path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_errors_are_classified_as_permanent_or_transient():
+    assert _is_permanent(APIError({"code": "23505", "message": "duplicate key"}))
+    assert _is_permanent(APIError({"code": "PGRST204", "message": "column not found"}))
+    assert _is_permanent(APIError({"code": "400", "message": "bad request"}))
+    assert not _is_permanent(APIError({"code": "PGRST001", "message": "connection error"}))
+    assert not _is_permanent(APIError({"code": "503", "message": "unavailable"}))
+    assert not _is_permanent(APIError({"code": "429", "message": "too many requests"}))
+    assert not _is_permanent(ConnectionError("reset"))
+
+
+def test_rejected_rows_are_isolated_and_dead_lettered(tmp_path):
+    insert = FlakyInsert(rejected={"post 2"})
+    queue = _queue(tmp_path, insert, batch_size=8)
+    queue._flush([(time.monotonic(), post) for post in _posts(8)])
+    assert sorted(row["content"] for row in insert.rows) == [f"post {i}" for i in range(8) if i != 2]
+    assert [entry["post"]["content"] for entry in _dead(queue)] == ["post 2"]
+    assert "not-null" in _dead(queue)[0]["error"]
+    assert not queue.stats()["spill_pending"]
+    assert queue.stats()["dead_lettered"] == 1
+
+
+def test_rows_failing_too_often_are_dead_lettered(tmp_path):
+    insert = FlakyInsert()
+    insert.failing = True
+    queue = _queue(tmp_path, insert, max_attempts=3)
+    queue._spill([(0, post) for post in _posts(2)])
+    for _ in range(3):
+        queue._replay_spill()
+    assert not queue.stats()["spill_pending"]
+    assert [entry["attempts"] for entry in _dead(queue)] == [3, 3]
+
+
+def test_replay_streams_batches_and_keeps_the_rest_after_a_failure(tmp_path):
+    insert = FlakyInsert()
+    queue = _queue(tmp_path, insert)
+    with open(queue.spill_path, "w") as f:
+        # A bare post from an older spill file, a line cut short by a crash, then current records
+        f.write(json.dumps({"content": "legacy"}) + "\n")
+        f.write('{"attempts": 0, "po\n')
+        for post in _posts(5):
+            f.write(json.dumps({"attempts": 0, "post": post}) + "\n")
+    original = insert.__call__
+
+    def fail_third_batch(posts):
+        if insert.calls == 2:
+            insert.calls += 1
+            raise RuntimeError("supabase unavailable")
+        original(posts)
+
+    queue._insert = fail_third_batch
+    queue._replay_spill()
+    assert [row["content"] for row in insert.rows] == ["legacy", "post 0", "post 1"]
+    with open(queue.spill_path) as f:
+        left = [json.loads(line) for line in f]
+    # The failed batch is retried with one more attempt; later lines are copied back as they were
+    assert [(record["attempts"], record["post"]["content"]) for record in left] == [
+        (1, "post 2"), (1, "post 3"), (0, "post 4"),
+    ]
+    assert [entry["post"] for entry in _dead(queue)] == [{"spill_line": '{"attempts": 0, "po'}]
@@ -0,0 +1,63 @@
+from collections import Counter
+
+from app.services.prompt_builder import (
+    build_comment_prompt,
+    chunk_comments,
+    estimate_tokens,
+    format_comment,
+    stratified_sample,
+    truncate_to_tokens,
+)
+
+
+def _comments(labels):
+    return [
+        {"text": f"comment {i} " + "word " * 20, "sentiment": {"label": label, "score": 0.9}}
+        for i, label in enumerate(labels)
+    ]
+
+
+def test_truncate_cuts_on_a_word_boundary():
+    text, truncated = truncate_to_tokens("alpha beta gamma delta", 3)
+    assert truncated and text == "alpha beta…"
+    assert truncate_to_tokens("short", 3) == ("short", False)
+
+
+def test_format_comment_marks_collapsed_duplicates():
+    line, _ = format_comment({"text": "same", "sentiment": {"label": "NEGATIVE", "score": 0.5}, "count": 3})
+    assert "(posted 3 times)" in line and "NEGATIVE" in line
+
+
+def test_everything_fits_within_budget():
+    comments = _comments(["POSITIVE", "NEGATIVE"] * 5)
+    prompt, stats = build_comment_prompt("HEADER\n", comments, "\nFOOTER", token_budget=10000)
+    assert stats["comments_included"] == 10 and stats["comments_dropped"] == 0
+    assert prompt.startswith("HEADER\n") and prompt.endswith("\nFOOTER")
+
+
+def test_over_budget_samples_within_budget_keeping_label_shares():
+    comments = _comments(["POSITIVE"] * 60 + ["NEGATIVE"] * 30 + ["NEUTRAL"] * 10)
+    prompt, stats = build_comment_prompt("H", comments, "F", token_budget=800)
+    assert stats["estimated_tokens"] <= 800
+    assert estimate_tokens(prompt) <= 800 + 2
+    assert 0 < stats["comments_included"] < 100
+    included = Counter(line.split("Sentiment: ")[1].split(" ")[0] for line in prompt.split("\n- Comment")[1:])
+    assert included["POSITIVE"] > included["NEGATIVE"] > included["NEUTRAL"] >= 1
+
+
+def test_stratified_sample_allocation():
+    items = _comments(["POSITIVE"] * 6 + ["NEGATIVE"] * 3 + ["NEUTRAL"])
+    chosen = stratified_sample(items, 5)
+    assert chosen == sorted(chosen) and len(chosen) == 5
+    labels = Counter(items[i]["sentiment"]["label"] for i in chosen)
+    assert labels == {"POSITIVE": 3, "NEGATIVE": 1, "NEUTRAL": 1}
+    assert stratified_sample(items, 20) == list(range(10))
+    assert stratified_sample(items, 0) == []
+
+
+def test_chunks_stay_within_their_budget_in_order():
+    comments = _comments(["POSITIVE"] * 12)
+    per_comment = estimate_tokens(format_comment(comments[0])[0])
+    chunks = chunk_comments(comments, chunk_tokens=per_comment * 5)
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+    assert [item for chunk in chunks for item in chunk] == comments
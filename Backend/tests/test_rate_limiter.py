@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import rate_limiter as rl
+from app.utils.rate_limiter import RateLimitExceeded, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rl, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def test_reserve_grants_then_waits_then_rejects(clock):
+    bucket = TokenBucket(capacity=10, window=10)  # one unit per second
+    assert bucket.reserve(10, max_wait=0) == (True, 0.0)
+    # Short of tokens: granted with a wait, and the bucket goes negative
+    assert bucket.reserve(2, max_wait=5) == (True, 2.0)
+    assert bucket.tokens == -2
+    # Too long a wait: rejected, nothing reserved
+    granted, wait = bucket.reserve(5, max_wait=5)
+    assert not granted and wait == pytest.approx(7.0)
+    assert bucket.tokens == -2
+    clock.now += 4
+    assert bucket.reserve(2, max_wait=0) == (True, 0.0)
+    assert bucket.stats()["rejected"] == 1
+
+
+def test_throttle_halves_the_rate_and_pauses_until_retry_after(clock):
+    bucket = TokenBucket(capacity=10, window=10)
+    bucket.on_throttle(retry_after=30)
+    assert bucket.scale == 0.5
+    assert bucket.tokens == 0
+    granted, wait = bucket.reserve(1, max_wait=60)
+    # 30 s paused, then one unit at half rate
+    assert granted and wait == pytest.approx(32.0)
+    # No refill while paused
+    clock.now += 20
+    bucket._refill(clock.now)
+    assert bucket.tokens == -1
+    bucket.on_throttle()
+    bucket.on_throttle()
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.scale == rl.AIMD_MIN_SCALE
+
+
+def test_success_restores_the_rate_step_by_step(clock):
+    bucket = TokenBucket(capacity=10, window=10)
+    bucket.on_throttle()
+    for _ in range(5):
+        bucket.on_success()
+    assert bucket.scale == pytest.approx(0.75)
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.scale == 1.0
+
+
+def test_acquire_sleeps_for_reserved_units_and_raises_past_max_wait(clock, monkeypatch):
+    monkeypatch.setitem(rl.UPSTREAM_LIMITS, "reddit", {"capacity": 2, "window": 2})
+    limiter = RateLimiter()
+    limiter.acquire("reddit", "search", count=2)
+    limiter.acquire("reddit", "search", max_wait=5)
+    assert clock.slept == [1.0]
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        limiter.acquire("reddit", "search", count=10, max_wait=1)
+    assert excinfo.value.retry_after == pytest.approx(10.0)
+
+
+def test_acquire_refuses_to_block_the_event_loop():
+    limiter = RateLimiter()
+
+    async def on_loop():
+        with pytest.raises(RuntimeError):
+            limiter.acquire("reddit", "search")
+        await limiter.acquire_async("reddit", "search")
+
+    asyncio.run(on_loop())
+    assert limiter.stats()["reddit"]["granted"] == 1
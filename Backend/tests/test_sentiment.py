@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from app.services import sentiment
+from app.utils.sentiment_cache import sentiment_cache
+
+
+def test_cache_io_runs_off_the_event_loop(monkeypatch):
+    threads = []
+    get_many, put_many = sentiment_cache.get_many, sentiment_cache.put_many
+
+    def recording_get(keys):
+        threads.append(threading.current_thread())
+        return get_many(keys)
+
+    def recording_put(items):
+        threads.append(threading.current_thread())
+        put_many(items)
+
+    async def infer(texts):
+        return [{"label": "NEGATIVE", "score": 0.7} for _ in texts]
+
+    monkeypatch.setattr(sentiment_cache, "get_many", recording_get)
+    monkeypatch.setattr(sentiment_cache, "put_many", recording_put)
+    monkeypatch.setattr(sentiment, "_infer_batch_async", infer)
+    monkeypatch.setattr(sentiment, "SENTIMENT_CACHE_ENABLED", True)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        first = await sentiment.analyze_sentiment_batch_async(["offload test", "offload test"])
+        second = await sentiment.analyze_sentiment_batch_async(["offload test"])
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert [r["label"] for r in first + second] == ["NEGATIVE"] * 3
+    assert len(threads) == 4
+    assert all(thread is not loop_thread for thread in threads)
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.services import trending
+from app.services.trending import TrendingRefresher
+
+TITLES = ["Solar eclipse tonight live", "Solar eclipse viewing guide", "Eclipse glasses sold out"]
+
+
+class FakeFetch:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+def test_cold_start_failure_is_not_cached_as_a_snapshot(monkeypatch):
+    fetch = FakeFetch((None, None), (TITLES, None))
+    monkeypatch.setattr(trending, "fetch_trending_titles", fetch)
+    refresher = TrendingRefresher(interval=300, retry_interval=60)
+
+    async def run():
+        first = await refresher.get()
+        # Within the retry delay requests do not hit the upstreams again
+        second = await refresher.get()
+        assert fetch.calls == 1
+        refresher._retry_at = 0.0
+        third = await refresher.get()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first["topics"] == [] and first["snapshot_age"] is None
+    assert second == first
+    assert "solar eclipse" in third["topics"] and third["snapshot_age"] is not None
+    stats = refresher.stats()
+    assert stats["refreshes"] == 1 and stats["refresh_failures"] == 1
+
+
+def test_background_task_retries_quickly_until_it_gets_titles(monkeypatch):
+    fetch = FakeFetch((None, None), (None, []), (None, TITLES))
+    monkeypatch.setattr(trending, "fetch_trending_titles", fetch)
+    refresher = TrendingRefresher(interval=300, retry_interval=0.01)
+
+    async def run():
+        refresher.start()
+        for _ in range(200):
+            if refresher.age() is not None:
+                break
+            await asyncio.sleep(0.01)
+        await refresher.stop()
+        return await refresher.get()
+
+    snapshot = asyncio.run(run())
+    assert fetch.calls == 3
+    assert "solar eclipse" in snapshot["reddit"]
+
+
+def test_failed_refresh_keeps_the_previous_snapshot(monkeypatch):
+    fetch = FakeFetch((TITLES, TITLES), (None, None))
+    monkeypatch.setattr(trending, "fetch_trending_titles", fetch)
+    refresher = TrendingRefresher(interval=300)
+
+    async def run():
+        first = await refresher.refresh()
+        second = await refresher.refresh()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second is first and first["topics"]